@@ -1,8 +1,66 @@
-from flask import Flask, request, render_template
+import os
+import json
+import time
+import random
+from flask import Flask, request, render_template, jsonify, g
 from src.pipeline.predict_pipeline import CustomData
-from src.pipeline.predict_pipeline import PredictPipeline
+from src.pipeline.predict_pipeline import PredictPipeline, BatchTooLarge
+from src.pipeline.micro_batching import MicroBatcher, MicroBatcherConfig
+from src.pipeline.predict_pipeline import model_registry, prediction_cache
+from src.pipeline.service_metrics import service_metrics, registry_collector, cache_collector, CONTENT_TYPE, \
+                                        requests_total, requests_in_flight, request_seconds, phase_seconds, predicted_rows_total
+from src.logger import logging
 
 app = Flask(__name__)
+app.config["MAX_BATCH_SIZE"] = int(os.environ.get("MAX_BATCH_SIZE", 10000))
+# request bodies (JSON batches and CSV uploads) beyond this are rejected with 413 before they are read
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", 16 * 1024 ** 2))
+
+# artifacts are cached per worker process by the model registry
+pred_pipeline = PredictPipeline()
+
+# optional coalescing of concurrent single-record /predict calls into vectorized batches
+micro_batcher = None
+if os.environ.get("MICRO_BATCHING", "0") == "1":
+    micro_batcher = MicroBatcher(pred_pipeline, MicroBatcherConfig(
+        max_latency_ms=float(os.environ.get("MICRO_BATCH_MAX_LATENCY_MS", 5.0)),
+        max_batch_size=int(os.environ.get("MICRO_BATCH_MAX_SIZE", 64))))
+
+# model load events are read from the registry when /metrics is scraped
+service_metrics.add_collector(registry_collector(model_registry))
+service_metrics.add_collector(cache_collector(prediction_cache))
+
+# a sample of requests is logged as JSON (src.logger writes records from a background thread)
+request_log_sample_rate = float(os.environ.get("REQUEST_LOG_SAMPLE_RATE", 0.01))
+request_logger = logging.getLogger("prediction_requests")
+
+
+def log_request_sample(**fields):
+    if random.random() < request_log_sample_rate:
+        request_logger.info(json.dumps({"endpoint": request.endpoint, **fields}, default=str))
+
+
+def phase(endpoint, name):
+    return phase_seconds.labels(endpoint=endpoint, phase=name).time()
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    requests_in_flight.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unmatched"
+    requests_total.labels(endpoint=endpoint, method=request.method, status=response.status_code).inc()
+    request_seconds.labels(endpoint=endpoint).observe(time.perf_counter() - g.request_start)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    requests_in_flight.dec()
 
 
 @app.route("/")
@@ -15,25 +73,109 @@ def predict():
     if request.method == "GET":
         return render_template("home.html")
     else:
-        custom_data = CustomData(
-            gender=request.form.get("gender"),
-            race_ethnicity=request.form.get("ethnicity"),
-            parental_level_of_education=request.form.get("parental_level_of_education"),
-            lunch=request.form.get("lunch"),
-            test_preparation_course=request.form.get("test_preparation_course"),
-            reading_score=request.form.get("reading_score"),
-            writing_score=request.form.get("writing_score")
-            )
-        df_data = custom_data.get_data_as_df()
-        print(df_data)
-
-        pred_pipeline = PredictPipeline()
-        prediction = pred_pipeline.predict(df_data)
-
-        prediction_message = f"Predicted Math Score: {prediction}"
-
-        return render_template("home.html", prediction_message=prediction_message)
-    
+        with phase("predict", "parse"):
+            custom_data = CustomData(
+                gender=request.form.get("gender"),
+                race_ethnicity=request.form.get("ethnicity"),
+                parental_level_of_education=request.form.get("parental_level_of_education"),
+                lunch=request.form.get("lunch"),
+                test_preparation_course=request.form.get("test_preparation_course"),
+                reading_score=request.form.get("reading_score"),
+                writing_score=request.form.get("writing_score")
+                )
+            record = custom_data.get_data_as_dict()
+
+        with phase("predict", "cache"):
+            # one snapshot of the preprocessor and model for the whole request
+            artifacts = pred_pipeline.artifacts()
+            cache_key, prediction = pred_pipeline.lookup(record, artifacts)
+        if prediction is None and micro_batcher is not None:
+            # transform and predict run together in the batch worker, so both count as predict here
+            with phase("predict", "predict"):
+                prediction = micro_batcher.predict(record)
+            pred_pipeline.remember(cache_key, prediction)
+        elif prediction is None:
+            with phase("predict", "transform"):
+                transformed_data = pred_pipeline.transform_record(record, artifacts)
+            with phase("predict", "predict"):
+                prediction = int(pred_pipeline.predict_transformed(transformed_data, artifacts)[0])
+            pred_pipeline.remember(cache_key, prediction)
+        predicted_rows_total.labels(endpoint="predict").inc()
+
+        with phase("predict", "render"):
+            prediction_message = f"Predicted Math Score: {prediction}"
+            response = render_template("home.html", prediction_message=prediction_message)
+
+        log_request_sample(record=record, prediction=prediction,
+                           elapsed_seconds=round(time.perf_counter() - g.request_start, 6))
+        return response
+
+
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify(error=f"Request body exceeds the maximum of {app.config['MAX_CONTENT_LENGTH']} bytes."), 413
+
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    max_batch_size = app.config["MAX_BATCH_SIZE"]
+    with phase("predict_batch", "parse"):
+        # records come either as a JSON list (optionally under "records") or as an uploaded CSV file
+        if "file" in request.files:
+            records = request.files["file"]
+        else:
+            payload = request.get_json(silent=True)
+            records = payload.get("records") if isinstance(payload, dict) else payload
+            if not isinstance(records, list):
+                return jsonify(error="Expected a JSON list of records or a CSV file upload."), 400
+            # checked before any frame is built
+            if len(records) > max_batch_size:
+                return jsonify(error=f"Batch of {len(records)} records exceeds the maximum of {max_batch_size}."), 413
+
+        try:
+            df_data = pred_pipeline.records_to_df(records, max_rows=max_batch_size)
+        except BatchTooLarge as err:
+            return jsonify(error=str(err)), 413
+        except ValueError as err:
+            return jsonify(error=str(err)), 400
+
+    predictions = []
+    if len(df_data):
+        try:
+            artifacts = pred_pipeline.artifacts()
+            with phase("predict_batch", "transform"):
+                transformed_data = pred_pipeline.transform(df_data, artifacts)
+            with phase("predict_batch", "predict"):
+                predictions = pred_pipeline.predict_transformed(transformed_data, artifacts).astype(int).tolist()
+        except Exception as err:
+            # the records were validated, so this is a server-side failure; answer JSON like the rest of the route
+            logging.info(f"Batch prediction failed: {err}")
+            return jsonify(error="Prediction failed."), 500
+    predicted_rows_total.labels(endpoint="predict_batch").inc(len(predictions))
+
+    with phase("predict_batch", "render"):
+        response = jsonify(predictions=predictions, count=len(predictions))
+
+    log_request_sample(rows=len(predictions), elapsed_seconds=round(time.perf_counter() - g.request_start, 6))
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return service_metrics.render(), 200, {"Content-Type": CONTENT_TYPE}
+
+
+@app.route("/predict/micro-batching", methods=["GET"])
+def micro_batching_metrics():
+    if micro_batcher is None:
+        return jsonify(enabled=False)
+    return jsonify(enabled=True, **micro_batcher.metrics())
+
+
+@app.route("/predict/cache", methods=["GET"])
+def prediction_cache_metrics():
+    return jsonify(enabled=prediction_cache.enabled, **prediction_cache.stats())
+
 
 if __name__ == "__main__":
     # app.run(debug=True) # development environment
@@ -0,0 +1,273 @@
+# JSON prediction API as a plain ASGI application (run with `uvicorn asgi_app:app`).
+# Same feature contract as CustomData in app.py; predictions run on a bounded thread or
+# process pool so the event loop keeps accepting requests, and requests beyond the pool's
+# capacity are rejected with 503 instead of queueing without limit.
+import os
+import json
+import math
+import time
+import asyncio
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.pipeline.predict_pipeline import CustomData, PredictPipeline, feature_columns, numeric_feature_columns, \
+                                         model_registry, prediction_cache
+from src.pipeline.service_metrics import service_metrics, registry_collector, cache_collector, CONTENT_TYPE, \
+                                        requests_total, requests_in_flight, request_seconds, phase_seconds, predicted_rows_total
+from src.components.dataset_schema import CATEGORIES
+from src.logger import logging
+
+
+@dataclass
+class AsyncServerConfig:
+    pool: str = os.environ.get("ASYNC_POOL", "thread")  # "thread" or "process"
+    max_workers: int = int(os.environ.get("ASYNC_MAX_WORKERS", os.cpu_count() or 1))
+    # predictions allowed to wait for a free worker; anything beyond is rejected with 503
+    max_queue: int = int(os.environ.get("ASYNC_MAX_QUEUE", 64))
+    predict_timeout: float = float(os.environ.get("ASYNC_PREDICT_TIMEOUT", 10.0))
+    max_batch_size: int = int(os.environ.get("MAX_BATCH_SIZE", 10000))
+    max_body_bytes: int = 16 * 1024 ** 2
+
+
+# one pipeline per process: the event loop's threads share it, process-pool workers build their own
+_pipeline = None
+
+
+def _get_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = PredictPipeline()
+    return _pipeline
+
+
+def _predict_one(record):
+    return _get_pipeline().predict_record(record)
+
+
+def _predict_many(records):
+    return _get_pipeline().predict_batch(records)
+
+
+def _warm_worker():
+    _get_pipeline().warm()
+
+
+class BadRequest(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_record(payload):
+    """Validate one JSON object against the CustomData contract and return its feature dict."""
+    if not isinstance(payload, dict):
+        raise BadRequest("Expected a JSON object of features.")
+    missing = [column for column in feature_columns if column not in payload]
+    if missing:
+        raise BadRequest(f"Missing feature columns: {missing}", status=422)
+
+    features = {}
+    for column in feature_columns:
+        value = payload[column]
+        if column in numeric_feature_columns:
+            # numbers or numeric strings; null, booleans and NaN/inf would only fail inside the model
+            try:
+                if isinstance(value, bool):
+                    raise ValueError
+                value = float(value)
+                if not math.isfinite(value):
+                    raise ValueError
+            except (TypeError, ValueError):
+                raise BadRequest(f"Feature '{column}' must be a finite number, got {value!r}.", status=422)
+        elif not isinstance(value, str):
+            raise BadRequest(f"Feature '{column}' must be a string, got {value!r}.", status=422)
+        elif value not in CATEGORIES[column]:
+            # the fitted encoder rejects categories it was not trained on
+            raise BadRequest(f"Feature '{column}' must be one of {CATEGORIES[column]}, got {value!r}.", status=422)
+        features[column] = value
+    return CustomData(**features).get_data_as_dict()
+
+
+class PredictionApp:
+    def __init__(self, config=None):
+        self.server_config = AsyncServerConfig() if config is None else config
+        self.executor = None
+        self.pending = 0  # predictions submitted and not yet finished
+        service_metrics.add_collector(registry_collector(model_registry))
+        # with a process pool the cache lives in the workers, so these gauges stay at zero
+        service_metrics.add_collector(cache_collector(prediction_cache))
+
+    @property
+    def capacity(self):
+        return self.server_config.max_workers + self.server_config.max_queue
+
+    def start(self):
+        config = self.server_config
+        if config.pool == "process":
+            self.executor = ProcessPoolExecutor(max_workers=config.max_workers, initializer=_warm_worker)
+        elif config.pool == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=config.max_workers, thread_name_prefix="predict")
+            _warm_worker()
+        else:
+            raise ValueError(f"Unknown pool: {config.pool}")
+        logging.info(f"Async prediction server started ({config.pool} pool, {config.max_workers} workers, "
+                     f"capacity {self.capacity}).")
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    async def run_prediction(self, function, payload):
+        # backpressure: the event loop is single threaded, so this check-and-increment cannot race
+        if self.pending >= self.capacity:
+            raise BadRequest("Prediction pool is saturated, retry later.", status=503)
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            future = executor.submit(function, payload)
+        except BrokenProcessPool:
+            self.pending -= 1
+            self._replace_pool(executor)
+            raise BadRequest("Prediction worker crashed, retry later.", status=503)
+        except BaseException:
+            self.pending -= 1
+            raise
+        # the slot is released when the work itself finishes (or is cancelled before it starts),
+        # not when the request gives up waiting, so timed-out work still counts against capacity
+        future.add_done_callback(lambda _: self._release_soon(loop))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.server_config.predict_timeout)
+        except asyncio.TimeoutError:
+            raise BadRequest("Prediction timed out.", status=504)
+        except BrokenProcessPool:
+            self._replace_pool(executor)
+            raise BadRequest("Prediction worker crashed, retry later.", status=503)
+
+    def _replace_pool(self, executor):
+        # a worker died (or a result could not be sent back); every later submit to that pool
+        # fails, so start a new one unless another request already did
+        if self.executor is not executor:
+            return
+        logging.info("Process pool is broken, starting a new one.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        self.start()
+
+    def _release(self):
+        self.pending -= 1
+
+    def _release_soon(self, loop):
+        # done-callbacks run on the worker thread; pending is only touched on the event loop
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # the loop has shut down
+
+    async def predict(self, body):
+        with phase_seconds.labels(endpoint="asgi_predict", phase="parse").time():
+            record = parse_record(json.loads(body))
+        with phase_seconds.labels(endpoint="asgi_predict", phase="predict").time():
+            prediction = await self.run_prediction(_predict_one, record)
+        predicted_rows_total.labels(endpoint="asgi_predict").inc()
+        return 200, {"prediction": prediction}
+
+    async def predict_batch(self, body):
+        with phase_seconds.labels(endpoint="asgi_predict_batch", phase="parse").time():
+            payload = json.loads(body)
+            records = payload.get("records") if isinstance(payload, dict) else payload
+            if not isinstance(records, list):
+                raise BadRequest("Expected a JSON list of records.")
+            if len(records) > self.server_config.max_batch_size:
+                raise BadRequest(f"Batch of {len(records)} records exceeds the maximum of "
+                                 f"{self.server_config.max_batch_size}.", status=413)
+            records = [parse_record(record) for record in records]
+        predictions = []
+        if records:
+            with phase_seconds.labels(endpoint="asgi_predict_batch", phase="predict").time():
+                predictions = await self.run_prediction(_predict_many, records)
+        predicted_rows_total.labels(endpoint="asgi_predict_batch").inc(len(predictions))
+        return 200, {"predictions": predictions, "count": len(predictions)}
+
+    async def health(self, body):
+        return 200, {"status": "ok", "pending": self.pending, "capacity": self.capacity}
+
+    routes = {("POST", "/predict"): ("asgi_predict", predict),
+              ("POST", "/predict/batch"): ("asgi_predict_batch", predict_batch),
+              ("GET", "/health"): ("asgi_health", health)}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.handle_http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    self.start()
+                except Exception as err:
+                    await send({"type": "lifespan.startup.failed", "message": str(err)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def read_body(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > self.server_config.max_body_bytes:
+                raise BadRequest("Request body too large.", status=413)
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    async def handle_http(self, scope, receive, send):
+        start = time.perf_counter()
+        status = 500
+        method, path = scope["method"], scope["path"]
+        endpoint, handler = self.routes.get((method, path), ("unmatched", None))
+        if self.executor is None and handler is not None:
+            # servers without lifespan support start the pool on the first request
+            self.start()
+
+        requests_in_flight.inc()
+        try:
+            if path == "/metrics" and method == "GET":
+                endpoint = "asgi_metrics"
+                status, body, content_type = 200, service_metrics.render().encode(), CONTENT_TYPE
+            else:
+                try:
+                    if handler is None:
+                        raise BadRequest("Not found.", status=404)
+                    status, payload = await handler(self, await self.read_body(receive))
+                except BadRequest as err:
+                    status, payload = err.status, {"error": str(err)}
+                except json.JSONDecodeError:
+                    status, payload = 400, {"error": "Request body is not valid JSON."}
+                except Exception as err:
+                    logging.info(f"Prediction failed: {err}")
+                    status, payload = 500, {"error": "Prediction failed."}
+                with phase_seconds.labels(endpoint=endpoint, phase="render").time():
+                    body, content_type = json.dumps(payload).encode(), "application/json"
+
+            headers = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+            if status == 503:
+                headers.append((b"retry-after", b"1"))
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+        finally:
+            requests_in_flight.dec()
+            requests_total.labels(endpoint=endpoint, method=method, status=status).inc()
+            request_seconds.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+
+
+app = PredictionApp()
@@ -0,0 +1,182 @@
+"""Load test the Flask form route against the ASGI JSON route.
+
+    python -m benchmarks.load_test --concurrency 1,16,64 --duration 10
+
+Both servers are started from the current directory (which must hold trained ./artifacts):
+Flask's threaded server for app.py and uvicorn for asgi_app.py, with the prediction cache
+turned off unless --cache is given. Pass --flask-url/--asgi-url to test servers that are
+already running instead. Requests cycle through --records random records, so a server's
+prediction cache does not answer all of them from a single entry.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+from urllib.parse import urlencode, urlsplit
+
+from src.components.dataset_schema import CATEGORIES, NUMERIC_FEATURE_COLUMNS, SCORE_RANGE
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def random_records(n_records, seed=0):
+    rng = np.random.default_rng(seed)
+    low, high = SCORE_RANGE
+    return [{**{column: str(rng.choice(vocabulary)) for column, vocabulary in CATEGORIES.items()},
+             **{column: int(rng.integers(low, high + 1)) for column in NUMERIC_FEATURE_COLUMNS}}
+            for _ in range(n_records)]
+
+
+def flask_request(host, record):
+    # the Flask form names ethnicity differently from the CustomData field
+    form = dict(record, ethnicity=record["race_ethnicity"])
+    del form["race_ethnicity"]
+    body = urlencode(form).encode()
+    return (f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+
+
+def asgi_request(host, record):
+    body = json.dumps(record).encode()
+    return (f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server.")
+    status = int(status_line.split()[1])
+    length, close = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+        elif name.lower() == "connection" and value.strip().lower() == "close":
+            close = True
+    await reader.readexactly(length)
+    return status, close
+
+
+async def _client(url, requests, offset, deadline, latencies, statuses):
+    parts = urlsplit(url)
+    reader = writer = None
+    sent = offset
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+            start = time.perf_counter()
+            writer.write(requests[sent % len(requests)])
+            sent += 1
+            await writer.drain()
+            status, close = await _read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if close:
+                writer.close()
+                writer = None
+        except (ConnectionError, OSError, asyncio.IncompleteReadError):
+            statuses["connection_error"] = statuses.get("connection_error", 0) + 1
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, requests, concurrency, duration):
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + duration
+    # clients start at different records so concurrent requests differ too
+    offsets = [i * len(requests) // concurrency for i in range(concurrency)]
+    await asyncio.gather(*(_client(url, requests, offset, deadline, latencies, statuses) for offset in offsets))
+    latencies = np.asarray(latencies) * 1e3
+    ok = statuses.get(200, 0)
+    return {"concurrency": concurrency, "requests": len(latencies), "ok": ok,
+            "rejected": statuses.get(503, 0), "statuses": {str(key): value for key, value in statuses.items()},
+            "requests_per_second": ok / duration,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}.")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server did not listen on port {port}.")
+
+
+def start_servers(cache=False):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, REQUEST_LOG_SAMPLE_RATE="0", PREDICTION_CACHE="1" if cache else "0")
+    flask_port, asgi_port = _free_port(), _free_port()
+    flask_server = subprocess.Popen([sys.executable, "-c",
+                                     f"from app import app; app.run(host='127.0.0.1', port={flask_port}, threaded=True)"],
+                                    env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    asgi_server = subprocess.Popen([sys.executable, "-m", "uvicorn", "asgi_app:app", "--host", "127.0.0.1",
+                                    "--port", str(asgi_port), "--log-level", "warning", "--no-access-log"],
+                                   env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_for_port(flask_port, flask_server)
+    _wait_for_port(asgi_port, asgi_server)
+    return [flask_server, asgi_server], f"http://127.0.0.1:{flask_port}", f"http://127.0.0.1:{asgi_port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,16,64")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--flask-url")
+    parser.add_argument("--asgi-url")
+    parser.add_argument("--records", type=int, default=1000, help="distinct random records to send")
+    parser.add_argument("--cache", action="store_true", help="keep the prediction cache on in the started servers")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    servers = []
+    flask_url, asgi_url = args.flask_url, args.asgi_url
+    if flask_url is None or asgi_url is None:
+        servers, flask_url, asgi_url = start_servers(cache=args.cache)
+    records = random_records(args.records)
+
+    results = []
+    try:
+        for concurrency in [int(level) for level in args.concurrency.split(",")]:
+            for name, url, request in [("flask", flask_url, flask_request), ("asgi", asgi_url, asgi_request)]:
+                host = urlsplit(url).netloc
+                result = asyncio.run(run_load(url, [request(host, record) for record in records], concurrency, args.duration))
+                results.append({"server": name, **result})
+                print(f"{name:6} concurrency={concurrency:<4} {result['requests_per_second']:>9.1f} req/s  "
+                      f"p50={result['p50_ms']:.2f}ms  p99={result['p99_ms']:.2f}ms  "
+                      f"rejected={result['rejected']}  statuses={result['statuses']}")
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
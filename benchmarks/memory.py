@@ -0,0 +1,109 @@
+# Memory held by each serving worker when a large model is loaded per worker, preloaded in the
+# parent before fork, or memory-mapped from the compiled artifact. Linux only (/proc/<pid>/smaps_rollup).
+import os
+import gc
+import sys
+import time
+import numpy as np
+
+from src.components.data_transformation import DataTransformation, features_and_label
+from src.pipeline.compiled_inference import compile_model, save_compiled, load_compiled, CompiledModel
+
+
+def _result(scale, name, value, unit, better="lower", **extra):
+    return {"suite": "memory", "scale": scale, "name": name, "value": value, "unit": unit, "better": better, **extra}
+
+
+def process_memory(pid):
+    """Rss, Pss and unique (private) bytes of a process from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def _run_workers(mode, model_path, X, n_workers):
+    """Fork `n_workers` children that load (per `mode`) and use the model, then measure them all at once."""
+    model = None
+    if mode == "preload":
+        model = CompiledModel(load_compiled(model_path))
+        gc.freeze()
+
+    pids, ready_pipes, release_pipes = [], [], []
+    for _ in range(n_workers):
+        ready_read, ready_write = os.pipe()
+        release_read, release_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker_model = model
+                if mode != "preload":
+                    worker_model = CompiledModel(load_compiled(model_path, mmap=mode == "mmap"))
+                worker_model.predict(X)
+                os.write(ready_write, b"1")
+                os.read(release_read, 1)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+        ready_pipes.append(ready_read)
+        release_pipes.append(release_write)
+
+    for ready_read in ready_pipes:
+        os.read(ready_read, 1)
+    memory = [process_memory(pid) for pid in pids]
+    for release_write in release_pipes:
+        os.write(release_write, b"1")
+    for pid in pids:
+        os.waitpid(pid, 0)
+    if mode == "preload":
+        gc.unfreeze()
+    return memory
+
+
+def bench_memory(scale, train_path, test_path, n_workers=4, n_estimators=100, max_train_rows=20_000,
+                 artifact_path=os.path.join("artifacts", "memory_bench_regressor.joblib"),
+                 streaming_rows=1_000_000, chunk_size=500_000):
+    """Fit a RandomForest of fully grown trees (the largest model ModelSearching can select) and
+    compare per-worker memory across the three loading modes.
+
+    Above `streaming_rows` the data is transformed in chunks into memory-mapped files, as in
+    the training suite, so only the rows the model is fitted on are read into memory.
+    """
+    if not sys.platform.startswith("linux"):
+        return []
+    from sklearn.ensemble import RandomForestRegressor
+
+    transformation = DataTransformation()
+    if scale > streaming_rows:
+        transformation.tranformation_config.chunk_size = chunk_size
+    train_data, test_data = transformation.initiate_transformation(train_path, test_path)
+    Xtrain, ytrain = features_and_label(train_data.iloc[:max_train_rows])
+    Xtest, _ = features_and_label(test_data.iloc[:1000])
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=0, n_jobs=-1)
+    model.fit(Xtrain, ytrain)
+    train_rows = len(ytrain)
+    save_compiled(compile_model(model), artifact_path)
+    X = np.asarray(Xtest)
+    del model, train_data, test_data, Xtrain, ytrain
+    gc.collect()
+
+    results = [_result(scale, "model_bytes", os.path.getsize(artifact_path), "bytes",
+                       n_estimators=n_estimators, train_rows=train_rows)]
+    baseline_uss = None
+    for mode in ("per_worker", "preload", "mmap"):
+        # let freed pages from the previous mode settle before measuring
+        time.sleep(0.2)
+        memory = _run_workers(mode, artifact_path, X, n_workers)
+        uss = float(np.mean([worker["uss"] for worker in memory]))
+        pss = sum(worker["pss"] for worker in memory)
+        baseline_uss = uss if baseline_uss is None else baseline_uss
+        results += [_result(scale, f"{mode}/worker_unique_bytes", uss, "bytes", n_workers=n_workers),
+                    _result(scale, f"{mode}/workers_total_pss_bytes", pss, "bytes", n_workers=n_workers),
+                    _result(scale, f"{mode}/worker_savings_bytes", baseline_uss - uss, "bytes", better="higher",
+                            n_workers=n_workers)]
+    os.remove(artifact_path)
+    return results
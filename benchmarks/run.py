@@ -0,0 +1,149 @@
+"""Benchmark the training stages and the prediction service on synthetic data.
+
+    python -m benchmarks.run --scales 1k,100k
+    python -m benchmarks.run --scales 1k --baseline benchmarks/results/before.json
+
+Results are written as JSON. With --baseline, every metric that got worse by more
+than --threshold (relative) is reported and the exit code is 1. The startup suite
+also fails the run when the first prediction in a fresh process exceeds
+STARTUP_BUDGET_SECONDS or when importing app loads a heavy module (see
+benchmarks/startup.py); its `-X importtime` digest is written next to the results.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from benchmarks.synthetic import generate_synthetic_csv, parse_scale
+from benchmarks.startup import budget_violations
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def run(scales, n_iter, cv, suites, workdir=None, digest_path=None):
+    # imported here so the benchmark's own startup cost stays out of the measurements
+    from benchmarks.training import bench_training
+    from benchmarks.serving import bench_serving
+    from benchmarks.startup import bench_startup
+    from benchmarks.memory import bench_memory
+
+    results = []
+    cwd = os.getcwd()
+    for scale in scales:
+        n_rows = parse_scale(scale)
+        scale_dir = tempfile.mkdtemp(prefix=f"bench_{scale}_", dir=workdir)
+        # artifacts use relative paths, so each scale runs in its own directory
+        os.chdir(scale_dir)
+        try:
+            source_path = generate_synthetic_csv(os.path.join(scale_dir, "source.csv"), n_rows)
+            # serving and startup run against the artifacts the training suite writes
+            training_results = bench_training(source_path, n_rows, n_iter=n_iter, cv=cv)
+            if "training" in suites:
+                results += training_results
+            if "serving" in suites:
+                results += bench_serving(os.path.join("artifacts", "test_data.csv"), n_rows)
+            if "startup" in suites:
+                results += bench_startup(n_rows, scale_dir, digest_path=digest_path)
+            if "memory" in suites:
+                results += bench_memory(n_rows, os.path.join("artifacts", "train_data.csv"),
+                                        os.path.join("artifacts", "test_data.csv"))
+        finally:
+            os.chdir(cwd)
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return the metrics that regressed by more than `threshold` relative to `baseline`.
+
+    Results without a status are "ok". A metric that was ok in the baseline and is not
+    anymore is a regression; values are only compared when both runs are ok.
+    """
+    previous = {(result["suite"], result["scale"], result["name"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["suite"], result["scale"], result["name"]))
+        if old is None:
+            continue
+        status, old_status = result.get("status", "ok"), old.get("status", "ok")
+        if status != "ok":
+            if old_status == "ok":
+                regressions.append({**result, "baseline": old["value"], "baseline_status": old_status, "change": None})
+            continue
+        if old_status != "ok" or not old["value"]:
+            continue
+        change = (result["value"] - old["value"]) / old["value"]
+        worse = change > threshold if result["better"] == "lower" else change < -threshold
+        if worse:
+            regressions.append({**result, "baseline": old["value"], "change": change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1k,100k", help="comma separated row counts, e.g. 1k,100k,10M")
+    parser.add_argument("--suites", default="training,serving,startup,memory")
+    parser.add_argument("--n-iter", type=int, default=2, help="search candidates per estimator family")
+    parser.add_argument("--cv", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "results",
+                                                         time.strftime("%Y%m%d_%H%M%S") + ".json"))
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--workdir", help="where synthetic data and artifacts are written (default: system temp)")
+    args = parser.parse_args(argv)
+
+    scales = args.scales.split(",")
+    suites = args.suites.split(",")
+    digest_path = os.path.splitext(args.output)[0] + ".importtime.json"
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    results = run(scales, args.n_iter, args.cv, suites, workdir=args.workdir, digest_path=digest_path)
+
+    report = {"meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "git_commit": _git_commit(),
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "cpu_count": os.cpu_count(),
+                       "scales": scales, "n_iter": args.n_iter, "cv": args.cv},
+              "results": results}
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for result in results:
+        status = "" if result.get("status", "ok") == "ok" else f"  [{result['status']}: {result.get('error', '')}]"
+        print(f"{result['suite']:8} {result['scale']:>10} {result['name']:45} {result['value']:>14.4f} {result['unit']}{status}")
+    print(f"Results written to {args.output}")
+
+    failed = False
+    for violation in budget_violations(results):
+        print(f"STARTUP BUDGET {violation}")
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            if regression["change"] is None:
+                print(f"REGRESSION {regression['suite']} {regression['scale']} {regression['name']}: "
+                      f"status {regression['baseline_status']} -> {regression['status']} ({regression.get('error', '')})")
+                continue
+            print(f"REGRESSION {regression['suite']} {regression['scale']} {regression['name']}: "
+                  f"{regression['baseline']:.4f} -> {regression['value']:.4f} ({regression['change']:+.1%})")
+        failed = failed or bool(regressions)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
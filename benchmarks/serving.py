@@ -0,0 +1,81 @@
+# Load time, predict latency and Flask throughput for the prediction service.
+import io
+import time
+import importlib
+import contextlib
+import numpy as np
+
+from src.pipeline.predict_pipeline import ModelRegistry, PredictPipeline, feature_columns
+from src.components.datastore import read_dataset
+
+
+def _result(scale, name, value, unit, better, **extra):
+    return {"suite": "serving", "scale": scale, "name": name, "value": value, "unit": unit, "better": better, **extra}
+
+
+def _latency_results(scale, name, seconds):
+    seconds = np.asarray(seconds)
+    return [_result(scale, f"{name}/p50", float(np.percentile(seconds, 50)) * 1e6, "us", "lower"),
+            _result(scale, f"{name}/p99", float(np.percentile(seconds, 99)) * 1e6, "us", "lower")]
+
+
+def bench_serving(test_path, n_rows, n_single=2000, batch_sizes=(100, 10_000), n_requests=500):
+    """Benchmark serving against the artifacts in ./artifacts (written by the training suite)."""
+    results = []
+    test_data = read_dataset(test_path)
+    records = test_data[feature_columns].head(max(n_single, max(batch_sizes))).to_dict("records")
+
+    # cold load through a fresh registry
+    registry = ModelRegistry()
+    pipeline = PredictPipeline(registry=registry)
+    start = time.perf_counter()
+    pipeline.predict_record(records[0])
+    results.append(_result(n_rows, "load_and_first_predict", time.perf_counter() - start, "s", "lower"))
+    load_seconds = sum(stats["total_load_seconds"] for stats in registry.stats().values())
+    results.append(_result(n_rows, "artifact_load", load_seconds, "s", "lower", artifacts=sorted(registry.stats())))
+
+    # single-row latency, compiled record path and DataFrame path
+    single = []
+    for record in records[:n_single]:
+        start = time.perf_counter()
+        pipeline.predict_record(record)
+        single.append(time.perf_counter() - start)
+    results += _latency_results(n_rows, "predict_record", single)
+
+    single_df = []
+    for record in records[:min(n_single, 500)]:
+        start = time.perf_counter()
+        pipeline.predict_batch([record])
+        single_df.append(time.perf_counter() - start)
+    results += _latency_results(n_rows, "predict_batch_single_row", single_df)
+
+    for batch_size in batch_sizes:
+        batch = (records * (batch_size // len(records) + 1))[:batch_size]
+        start = time.perf_counter()
+        pipeline.predict_batch(batch)
+        seconds = time.perf_counter() - start
+        results.append(_result(n_rows, f"predict_batch/{batch_size}/rows_per_second", batch_size / seconds, "rows/s", "higher"))
+
+    # end-to-end through Flask's test client (the app resolves ./artifacts like a real worker)
+    app_module = importlib.import_module("app")
+    client = app_module.app.test_client()
+    form = [{"gender": record["gender"], "ethnicity": record["race_ethnicity"],
+             "parental_level_of_education": record["parental_level_of_education"],
+             "lunch": record["lunch"], "test_preparation_course": record["test_preparation_course"],
+             "reading_score": record["reading_score"], "writing_score": record["writing_score"]}
+            for record in records[:n_requests]]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for data in form:
+            client.post("/predict", data=data)
+    results.append(_result(n_rows, "flask_predict/requests_per_second", len(form) / (time.perf_counter() - start),
+                           "req/s", "higher"))
+
+    batch = records[:min(1000, len(records))]
+    start = time.perf_counter()
+    for _ in range(10):
+        client.post("/predict/batch", json=batch)
+    results.append(_result(n_rows, "flask_predict_batch/rows_per_second", 10 * len(batch) / (time.perf_counter() - start),
+                           "rows/s", "higher"))
+
+    return results
@@ -0,0 +1,92 @@
+# Cold start of the serving process: `import app` time, time to the first prediction,
+# and a digest of `python -X importtime`, checked against a startup budget.
+import os
+import sys
+import json
+import subprocess
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules the compiled serving path must not import at startup
+HEAVY_MODULES = ("sklearn", "scipy", "pandas", "joblib", "matplotlib", "seaborn")
+
+FIRST_PREDICTION = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().post("/predict", data={
+    "gender": "female", "ethnicity": "group B", "parental_level_of_education": "bachelor's degree",
+    "lunch": "standard", "test_preparation_course": "none", "reading_score": "72", "writing_score": "74"})
+assert response.status_code == 200, response.status_code
+print(json.dumps({"import_seconds": imported - start, "first_prediction_seconds": time.perf_counter() - start}))
+"""
+
+
+def _result(scale, name, value, unit, better="lower", **extra):
+    return {"suite": "startup", "scale": scale, "name": name, "value": value, "unit": unit, "better": better, **extra}
+
+
+def _python(args, cwd):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    return subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+
+
+def importtime_digest(cwd, module="app", top_n=15):
+    """Parse `python -X importtime -c 'import <module>'` into self/cumulative times per module."""
+    stderr = _python(["-X", "importtime", "-c", f"import {module}"], cwd).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip())) // 2,
+                        "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+
+    top_level = {}
+    for entry in modules:
+        package = entry["module"].split(".")[0]
+        top_level[package] = top_level.get(package, 0) + entry["self_us"]
+
+    return {"total_us": sum(entry["self_us"] for entry in modules),
+            "n_modules": len(modules),
+            "heavy_modules": sorted({entry["module"].split(".")[0] for entry in modules} & set(HEAVY_MODULES)),
+            "top_cumulative": sorted(modules, key=lambda entry: entry["cumulative_us"], reverse=True)[:top_n],
+            "top_packages_self_us": dict(sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:top_n])}
+
+
+def bench_startup(scale, workdir, n_runs=5, budget_seconds=None, digest_path=None):
+    """Cold start in fresh interpreters from `workdir`, which must hold trained ./artifacts.
+
+    Every run is a new process, so the OS file cache is warm but nothing is imported yet.
+    """
+    budget_seconds = float(os.environ.get("STARTUP_BUDGET_SECONDS", 1.5)) if budget_seconds is None else budget_seconds
+    runs = [json.loads(_python(["-c", FIRST_PREDICTION], workdir).stdout.strip().splitlines()[-1]) for _ in range(n_runs)]
+    import_seconds = float(np.median([run["import_seconds"] for run in runs]))
+    first_prediction_seconds = float(np.median([run["first_prediction_seconds"] for run in runs]))
+
+    digest = importtime_digest(workdir)
+    if digest_path is not None:
+        with open(digest_path, "w") as f:
+            json.dump(digest, f, indent=2)
+
+    return [_result(scale, "import_app", import_seconds, "s"),
+            _result(scale, "first_prediction", first_prediction_seconds, "s",
+                    budget_seconds=budget_seconds, within_budget=first_prediction_seconds <= budget_seconds),
+            _result(scale, "importtime_total", digest["total_us"] / 1e6, "s",
+                    n_modules=digest["n_modules"], heavy_modules=digest["heavy_modules"],
+                    top_packages_self_us=digest["top_packages_self_us"])]
+
+
+def budget_violations(results):
+    """Startup results that break the budget or pull heavy modules into the serving import."""
+    violations = []
+    for result in results:
+        if result["suite"] != "startup":
+            continue
+        if result.get("within_budget") is False:
+            violations.append(f"{result['name']} took {result['value']:.3f}s, over the {result['budget_seconds']}s budget")
+        if result.get("heavy_modules"):
+            violations.append(f"importing app loads {', '.join(result['heavy_modules'])}")
+    return violations
@@ -0,0 +1,38 @@
+# Synthetic datasets with the stud.csv schema, at any scale.
+import os
+import numpy as np
+import pandas as pd
+
+STUD_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "notebooks", "data", "stud.csv")
+SCORE_COLUMNS = ["math_score", "reading_score", "writing_score"]
+
+
+def generate_synthetic_csv(path, n_rows, chunk_size=1_000_000, noise=3, random_state=0, source_path=STUD_CSV):
+    """Write `n_rows` rows to `path` by bootstrapping stud.csv rows and jittering the scores.
+
+    Rows are generated and appended one chunk at a time, so 10M-row datasets never
+    sit in memory. The output is deterministic for a given seed.
+    """
+    seed_data = pd.read_csv(source_path)
+    rng = np.random.default_rng(random_state)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    written = 0
+    while written < n_rows:
+        size = min(chunk_size, n_rows - written)
+        chunk = seed_data.iloc[rng.integers(0, len(seed_data), size)].reset_index(drop=True)
+        jitter = rng.integers(-noise, noise + 1, size=(size, len(SCORE_COLUMNS)))
+        chunk[SCORE_COLUMNS] = np.clip(chunk[SCORE_COLUMNS].to_numpy() + jitter, 0, 100)
+        chunk.to_csv(path, mode="w" if written == 0 else "a", header=written == 0, index=False)
+        written += size
+
+    return path
+
+
+def parse_scale(scale):
+    """'1k' -> 1000, '100k' -> 100000, '10M' -> 10000000."""
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    suffix = scale[-1].lower()
+    if suffix in multipliers:
+        return int(float(scale[:-1]) * multipliers[suffix])
+    return int(scale)
@@ -0,0 +1,65 @@
+# Timings for each TrainingPipeline stage, and for each estimator family in ModelSearching.
+import os
+import time
+import joblib
+import warnings
+
+from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+from src.components.data_transformation import DataTransformation, features_and_label
+from src.components.model_searching import ModelSearching
+from src.pipeline.compiled_inference import export_compiled_model
+
+
+def _result(scale, name, value, unit="s", better="lower", **extra):
+    return {"suite": "training", "scale": scale, "name": name, "value": value, "unit": unit, "better": better, **extra}
+
+
+def bench_training(source_path, n_rows, n_iter=2, cv=3, streaming_rows=1_000_000, chunk_size=500_000,
+                   search_max_rows=100_000):
+    """Run ingestion, transformation and a per-family search in the current directory.
+
+    Above `streaming_rows`, ingestion and transformation use the chunked streaming mode.
+    The search stage is run on at most `search_max_rows` training rows, and the best
+    family's model is saved to ./artifacts for the serving suite.
+    """
+    results = []
+    streaming = n_rows > streaming_rows
+
+    ingestion = DataIngestion(DataIngestionConfig(source_data_path=source_path,
+                                                  chunk_size=chunk_size if streaming else None))
+    start = time.perf_counter()
+    train_path, test_path = ingestion.initiate_ingestion()
+    results.append(_result(n_rows, "ingestion", time.perf_counter() - start, streaming=streaming))
+
+    transformation = DataTransformation()
+    if streaming:
+        transformation.tranformation_config.chunk_size = chunk_size
+    start = time.perf_counter()
+    train_data, test_data = transformation.initiate_transformation(train_path, test_path)
+    results.append(_result(n_rows, "transformation", time.perf_counter() - start, streaming=streaming))
+
+    Xtrain, ytrain = features_and_label(train_data)
+    Xtest, ytest = features_and_label(test_data)
+    Xtrain, ytrain = Xtrain[:search_max_rows], ytrain[:search_max_rows]
+
+    warnings.filterwarnings("ignore")
+    search = ModelSearching()
+    searched = []
+    for name, estimator_config in search.seeded_estimators().items():
+        start = time.perf_counter()
+        # a failed search is timed up to the error, so its value is not comparable to a finished one
+        extra = {"status": "ok"}
+        try:
+            searched += search.serial_search({name: estimator_config}, Xtrain, ytrain, Xtest, ytest, cv=cv, n_iter=n_iter)
+        except Exception as err:
+            extra = {"status": "failed", "error": str(err)}
+        results.append(_result(n_rows, f"search/{name}", time.perf_counter() - start,
+                               search_rows=len(ytrain), n_iter=n_iter, cv=cv, **extra))
+
+    if searched:
+        best = max(searched, key=lambda result: result["validation_score"])
+        os.makedirs(os.path.dirname(search.model_config.model_path), exist_ok=True)
+        joblib.dump(best["best_estimator"], search.model_config.model_path)
+        export_compiled_model(best["best_estimator"], Xtest, search.model_config.compiled_model_path)
+
+    return results
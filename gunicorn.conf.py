@@ -0,0 +1,17 @@
+# gunicorn settings, read automatically when gunicorn starts from the project directory
+import os
+import gc
+
+# Load the app and its artifacts once in the master before the workers fork (PRELOAD_APP=0 turns
+# this off). Workers then share the model's pages copy-on-write instead of each holding a copy.
+preload_app = os.environ.get("PRELOAD_APP", "1") == "1"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from src.pipeline.predict_pipeline import PredictPipeline
+    loaded = PredictPipeline().warm()
+    server.log.info(f"Preloaded artifacts before forking workers: {sorted(loaded)}")
+    # keep the collector from touching (and so copying) the preloaded objects in each worker
+    gc.freeze()
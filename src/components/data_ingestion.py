@@ -1,5 +1,6 @@
 import os
 import sys
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
 from sklearn.model_selection import train_test_split
@@ -7,29 +8,136 @@ from sklearn.model_selection import train_test_split
 # logging and exception
 from src.logger import logging
 from src.exception import CustomException
+from src.instrumentation import instrumented, record_counts, data_bytes
+
+# typed artifact formats
+from src.components.datastore import save_frame, path_for_format, require_format, \
+                                    SplitSubset, save_split_indices, load_split_indices
+from src.pipeline.stage_cache import path_hash
+from src.components.streaming import hash_split_mask
+from src.components.dataset_schema import read_dtypes, apply_schema
 
 @dataclass
 class DataIngestionConfig:
+    source_data_path: str = os.path.join("notebooks", "data", "stud.csv")
     raw_data_path: str = os.path.join("artifacts", "raw_data.csv")
     train_data_path: str = os.path.join("artifacts", "train_data.csv")
     test_data_path: str = os.path.join("artifacts", "test_data.csv")
+    # "csv", "parquet", "feather" or "npy" (column arrays plus a schema sidecar)
+    artifact_format: str = "csv"
+    # also write CSV copies when the artifact format is not csv
+    export_csv: bool = False
+    # "copies" writes train/test datasets, "indices" writes the raw data once plus split row indices
+    split_mode: str = "copies"
+    split_path: str = os.path.join("artifacts", "split_indices.npz")
+    test_size: float = 0.2
+    random_state: int = 42
+    # rows per chunk for streaming ingestion; None reads the source in one go
+    chunk_size: int = None
+
+    def __post_init__(self):
+        require_format(self.artifact_format)
+        self.raw_data_path = path_for_format(self.raw_data_path, self.artifact_format)
+        self.train_data_path = path_for_format(self.train_data_path, self.artifact_format)
+        self.test_data_path = path_for_format(self.test_data_path, self.artifact_format)
 
 
 class DataIngestion:
-    def __init__(self):
-        self.ingestion_config = DataIngestionConfig()
+    def __init__(self, config=None):
+        self.ingestion_config = DataIngestionConfig() if config is None else config
+
+    def output_paths(self):
+        # what initiate_ingestion hands to DataTransformation
+        if self.ingestion_config.split_mode == "indices":
+            return (SplitSubset(self.ingestion_config.split_path, "train"),
+                    SplitSubset(self.ingestion_config.split_path, "test"))
+        return (self.ingestion_config.train_data_path, self.ingestion_config.test_data_path)
+
+    def artifact_paths(self):
+        # every file or directory initiate_ingestion writes
+        config = self.ingestion_config
+        datasets = [config.raw_data_path]
+        if config.split_mode == "indices":
+            paths = datasets + [config.split_path]
+        else:
+            datasets += [config.train_data_path, config.test_data_path]
+            paths = list(datasets)
+        if config.export_csv and config.artifact_format != "csv":
+            paths += [path_for_format(path, "csv") for path in datasets]
+        return paths
+
+    def split_indices(self, n_rows):
+        # splitting positions gives the same permutation as splitting the frame itself
+        return train_test_split(np.arange(n_rows), test_size=self.ingestion_config.test_size,
+                                random_state=self.ingestion_config.random_state)
+
+    def verify_split(self, split_path=None):
+        """Check that the stored split indices regenerate identically from their seed and parameters."""
+        train_index, test_index, metadata = load_split_indices(split_path or self.ingestion_config.split_path)
+        if path_hash(metadata["raw_data_path"]) != metadata["raw_data_hash"]:
+            return False
+        expected_train, expected_test = train_test_split(np.arange(metadata["n_rows"]),
+                                                         test_size=metadata["test_size"],
+                                                         random_state=metadata["random_state"])
+        return np.array_equal(train_index, expected_train) and np.array_equal(test_index, expected_test)
+
+    def initiate_streaming_ingestion(self):
+        """Read the source in chunks and route each row to train or test by a hash of its content.
+
+        Peak memory is bounded by the chunk size. The split is deterministic but is not
+        the same row assignment as the in-memory train_test_split.
+        """
+        logging.info("Starting streaming Data Ingestion Pipeline")
+        try:
+            config = self.ingestion_config
+            if config.artifact_format != "csv" or config.split_mode != "copies":
+                raise ValueError("Streaming ingestion writes csv train/test copies only.")
+
+            logging.info("Creating datastore...")
+            os.makedirs(os.path.dirname(config.train_data_path), exist_ok=True)
+            logging.info("Datastore successfully created.")
+
+            logging.info(f"Streaming the dataset in chunks of {config.chunk_size} rows...")
+            counts = {"raw": 0, "train": 0, "test": 0}
+            tmp_paths = {"raw": config.raw_data_path + ".tmp",
+                         "train": config.train_data_path + ".tmp",
+                         "test": config.test_data_path + ".tmp"}
+            # categoricals are parsed into categories; hashing them gives the same split as strings
+            for i, chunk in enumerate(pd.read_csv(config.source_data_path, chunksize=config.chunk_size, dtype=read_dtypes())):
+                test_mask = hash_split_mask(chunk, config.test_size, config.random_state)
+                for name, frame in [("raw", chunk), ("train", chunk[~test_mask]), ("test", chunk[test_mask])]:
+                    frame.to_csv(tmp_paths[name], mode="w" if i == 0 else "a", header=i == 0, index=False)
+                    counts[name] += len(frame)
+
+            # publish the datasets only once every chunk is written
+            for name, path in [("raw", config.raw_data_path), ("train", config.train_data_path), ("test", config.test_data_path)]:
+                os.replace(tmp_paths[name], path)
+            logging.info(f"Data successfully streamed into datastore ({counts['train']} train, {counts['test']} test rows).")
+            record_counts(rows=counts["raw"], bytes=os.path.getsize(config.source_data_path))
+
+            logging.info("Data Ingestion Completed😁.")
+
+            return self.output_paths()
 
+        except Exception as error:
+            raise CustomException(error, sys)
+
+    @instrumented("data_ingestion")
     def initiate_ingestion(self):
+        if self.ingestion_config.chunk_size is not None:
+            return self.initiate_streaming_ingestion()
+
         logging.info("Starting Data Ingestion Pipeline")
         try:
             # ingest dataset from sources (local, databases, APIs, etc.)
             logging.info("Reading the dataset as dataframe...")
-            data = pd.read_csv("notebooks\data\stud.csv")
+            data = apply_schema(pd.read_csv(self.ingestion_config.source_data_path, dtype=read_dtypes()))
+            record_counts(rows=len(data), bytes=data_bytes(data))
             logging.info("Data successfully read.")
             
             # split into train and test data
             logging.info("Splitting the data...")
-            train_data, test_data = train_test_split(data, test_size=0.2, random_state=42) # as split in the model training notebook
+            train_index, test_index = self.split_indices(len(data)) # as split in the model training notebook
             logging.info("Data successfully splitted.")
 
             # make artifact directory
@@ -39,18 +147,38 @@ class DataIngestion:
 
             # save train and test data into a datastore (artifacts directory) for the next components to use
             logging.info("Saving data into datastore...")
-            data.to_csv(self.ingestion_config.raw_data_path, index=False, header=True)
-            train_data.to_csv(self.ingestion_config.train_data_path, index=False, header=True)
-            test_data.to_csv(self.ingestion_config.test_data_path, index=False, header=True)
+            artifact_format = self.ingestion_config.artifact_format
+            save_frame(data, self.ingestion_config.raw_data_path, fmt=artifact_format)
+            frames = [(data, self.ingestion_config.raw_data_path)]
+            if self.ingestion_config.split_mode == "indices":
+                save_split_indices(self.ingestion_config.split_path, self.ingestion_config.raw_data_path,
+                                   train_index, test_index,
+                                   n_rows=len(data),
+                                   test_size=self.ingestion_config.test_size,
+                                   random_state=self.ingestion_config.random_state,
+                                   raw_data_hash=path_hash(self.ingestion_config.raw_data_path))
+                if not self.verify_split():
+                    raise ValueError("Stored split indices do not regenerate identically.")
+            elif self.ingestion_config.split_mode == "copies":
+                train_data, test_data = data.iloc[train_index], data.iloc[test_index]
+                save_frame(train_data, self.ingestion_config.train_data_path, fmt=artifact_format)
+                save_frame(test_data, self.ingestion_config.test_data_path, fmt=artifact_format)
+                frames += [(train_data, self.ingestion_config.train_data_path),
+                           (test_data, self.ingestion_config.test_data_path)]
+            else:
+                raise ValueError(f"Unknown split mode: {self.ingestion_config.split_mode}")
             logging.info("Data successfully saved into datastore.")
 
+            if self.ingestion_config.export_csv and artifact_format != "csv":
+                logging.info("Exporting CSV copies...")
+                for frame, path in frames:
+                    save_frame(frame, path_for_format(path, "csv"), fmt="csv")
+                logging.info("CSV copies exported.")
+
             # log if succesfully
             logging.info("Data Ingestion Completed😁.")
 
-            return (
-                self.ingestion_config.train_data_path,
-                self.ingestion_config.test_data_path
-                )
+            return self.output_paths()
         
         except Exception as error:
             raise CustomException(error, sys)
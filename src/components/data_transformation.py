@@ -11,7 +11,7 @@ from sklearn.impute import SimpleImputer
 from sklearn.compose import ColumnTransformer
 
 # config creation modules
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 # pickling into file
 import joblib
@@ -20,21 +20,69 @@ import joblib
 # logging and exception
 from src.logger import logging
 from src.exception import CustomException
+from src.instrumentation import instrumented, record_counts, data_bytes
+
+# typed artifact formats
+from src.components.datastore import read_dataset
+from src.components.dataset_schema import LABEL_COLUMN, NUMERIC_FEATURE_COLUMNS, CATEGORICAL_COLUMNS, read_dtypes, apply_schema
+
+# out-of-core fitting
+from src.components.streaming import StreamingPreprocessorFitter
+
+# sklearn-free export of the fitted preprocessor for serving
+from src.pipeline.compiled_inference import compile_preprocessor, CompiledPreprocessor, save_compiled, load_compiled, dump_joblib
 
 @dataclass
 class DataTransformationConfig:
     preprocessor_path: str = os.path.join("artifacts", "preprocessor.joblib")
+    compiled_preprocessor_path: str = os.path.join("artifacts", "compiled_preprocessor.joblib")
+    # streaming mode: rows per chunk, and .npy outputs written chunk by chunk
+    chunk_size: int = None
+    median_sample_size: int = 100_000
+    transformed_train_path: str = os.path.join("artifacts", "transformed_train.npy")
+    transformed_test_path: str = os.path.join("artifacts", "transformed_test.npy")
+    # "dataframe" (features and label in one dense frame), "csr" (sparse features) or "float32";
+    # the latter two return TransformedData with the label held separately
+    output_format: str = "dataframe"
+
+
+@dataclass
+class TransformedData:
+    X: object  # scipy CSR matrix or NumPy array
+    y: np.ndarray
+    feature_names: list = field(default_factory=list)
+
+
+def features_and_label(data):
+    """Split a stage hand-off into (X, y) without copying TransformedData features."""
+    if isinstance(data, TransformedData):
+        return data.X, data.y
+    return data.values[:, :-1], data.values[:, -1].ravel()
+
+
+def feature_memory_report(X, categorical_cardinalities):
+    """Bytes held by X compared with a dense float64 matrix of the same shape."""
+    n_rows, n_columns = X.shape
+    if hasattr(X, "indptr"):
+        stored_bytes = X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    else:
+        stored_bytes = X.nbytes
+    dense_bytes = n_rows * n_columns * np.dtype(np.float64).itemsize
+    return {"rows": n_rows, "columns": n_columns,
+            "categorical_cardinalities": categorical_cardinalities,
+            "dense_float64_bytes": dense_bytes, "stored_bytes": stored_bytes,
+            "savings_ratio": dense_bytes / stored_bytes if stored_bytes else None}
 
 class DataTransformation:
     def __init__(self):
         self.tranformation_config = DataTransformationConfig()
 
-    def instantiate_preprocessor(self):
         # define features and labels
-        self.label = ["math_score"]
-        self.numerical_features = ["reading_score", "writing_score"]
-        self.categorical_features = ["gender", "race_ethnicity", "parental_level_of_education", "lunch", "test_preparation_course"]
-        
+        self.label = [LABEL_COLUMN]
+        self.numerical_features = list(NUMERIC_FEATURE_COLUMNS)
+        self.categorical_features = list(CATEGORICAL_COLUMNS)
+
+    def instantiate_preprocessor(self):
         # create preprocessor pipelines
         numerical_pipeline = Pipeline(steps=[("imputer", SimpleImputer(strategy="median")),
                                              ("scaler", StandardScaler())])
@@ -42,15 +90,113 @@ class DataTransformation:
         categorical_pipeline = Pipeline(steps=[("cat_imputer", SimpleImputer(strategy="most_frequent")),
                                              ("encoder", OneHotEncoder())])
         
-        # combine pipelines into transformer
+        # combine pipelines into transformer (csr output keeps the one-hot block sparse)
+        sparse_threshold = 1.0 if self.tranformation_config.output_format == "csr" else 0.3
         preprocessor = ColumnTransformer(transformers=[
             ("numerical_pipeline", numerical_pipeline, self.numerical_features),
             ("categorical_pipeline", categorical_pipeline, self.categorical_features)
-        ])
+        ], sparse_threshold=sparse_threshold)
 
         return preprocessor
-    
+
+    def export_compiled_preprocessor(self, preprocessor, X, transformed_X):
+        """Save the preprocessor as plain arrays/dicts if its NumPy transform matches sklearn exactly."""
+        compiled_path = self.tranformation_config.compiled_preprocessor_path
+        try:
+            params = compile_preprocessor(preprocessor)
+            compiled_X = CompiledPreprocessor(params).transform(X)
+        except (ValueError, KeyError) as err:
+            logging.info(f"Preprocessor cannot be compiled ({err}); serving will use sklearn.")
+            compiled_X = None
+
+        if hasattr(transformed_X, "toarray"):
+            transformed_X = transformed_X.toarray()
+        if compiled_X is None or not np.array_equal(compiled_X, transformed_X):
+            if compiled_X is not None:
+                logging.info("Compiled preprocessor output differs from sklearn; not exporting it.")
+            # never leave a stale compiled artifact next to a new preprocessor
+            if os.path.exists(compiled_path):
+                os.remove(compiled_path)
+            return None
+
+        save_compiled(params, compiled_path)
+        logging.info("Compiled preprocessor successfully saved.")
+        return compiled_path
+
+    def _count_rows(self, path):
+        return sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=self.tranformation_config.chunk_size))
+
+    def _transform_to_npy(self, compiled_preprocessor, source_path, output_path):
+        # fill a preallocated, memory-mapped .npy file chunk by chunk
+        n_rows = self._count_rows(source_path)
+        output = np.lib.format.open_memmap(output_path + ".tmp", mode="w+", dtype=np.float64,
+                                           shape=(n_rows, compiled_preprocessor.n_features + len(self.label)))
+        start = 0
+        for chunk in pd.read_csv(source_path, chunksize=self.tranformation_config.chunk_size, dtype=read_dtypes()):
+            chunk = apply_schema(chunk)
+            stop = start + len(chunk)
+            output[start:stop, :-len(self.label)] = compiled_preprocessor.transform(chunk)
+            output[start:stop, -len(self.label):] = chunk[self.label].to_numpy(dtype=np.float64)
+            start = stop
+        output.flush()
+        del output
+        os.replace(output_path + ".tmp", output_path)
+        return n_rows
+
+    def load_transformed_data(self):
+        """Memory-map the streaming transformation outputs as (train, test) DataFrames."""
+        compiled_preprocessor = CompiledPreprocessor(load_compiled(self.tranformation_config.compiled_preprocessor_path))
+        columns = compiled_preprocessor.feature_names + self.label
+        return tuple(pd.DataFrame(np.load(path, mmap_mode="r"), columns=columns, copy=False)
+                     for path in (self.tranformation_config.transformed_train_path,
+                                  self.tranformation_config.transformed_test_path))
+
+    def initiate_streaming_transformation(self, train_path, test_path):
+        """Fit the preprocessor with incremental statistics over train chunks, then transform
+        train and test chunk by chunk into memory-mapped .npy files.
+
+        Only the compiled preprocessor is produced (there is no fitted sklearn object), so a
+        stale sklearn preprocessor artifact is removed.
+        """
+        logging.info("Starting streaming data transformation...")
+        try:
+            preprocessor = self.instantiate_preprocessor()
+            (numerical_name, _, _), (categorical_name, _, _) = preprocessor.transformers
+            chunk_size = self.tranformation_config.chunk_size
+
+            logging.info(f"Fitting preprocessor statistics in chunks of {chunk_size} rows...")
+            fitter = StreamingPreprocessorFitter(self.numerical_features, self.categorical_features,
+                                                 numerical_name=numerical_name, categorical_name=categorical_name,
+                                                 median_sample_size=self.tranformation_config.median_sample_size)
+            for chunk in pd.read_csv(train_path, chunksize=chunk_size, dtype=read_dtypes()):
+                fitter.partial_fit(apply_schema(chunk))
+            params = fitter.params()
+            compiled_preprocessor = CompiledPreprocessor(params)
+            logging.info(f"Preprocessor statistics fitted on {fitter.n_rows} rows.")
+
+            logging.info("Transforming train and test data chunk by chunk...")
+            n_rows = self._transform_to_npy(compiled_preprocessor, train_path, self.tranformation_config.transformed_train_path)
+            n_rows += self._transform_to_npy(compiled_preprocessor, test_path, self.tranformation_config.transformed_test_path)
+            record_counts(rows=n_rows, bytes=os.path.getsize(train_path) + os.path.getsize(test_path))
+            logging.info("Transformation completed successfully.")
+
+            logging.info("Saving compiled preprocessor into datastore...")
+            save_compiled(params, self.tranformation_config.compiled_preprocessor_path)
+            if os.path.exists(self.tranformation_config.preprocessor_path):
+                os.remove(self.tranformation_config.preprocessor_path)
+            logging.info("Compiled preprocessor successfully saved.")
+
+            logging.info("Data transformation completed.")
+
+            return self.load_transformed_data()
+
+        except Exception as err:
+            raise CustomException(err, sys)
+
+    @instrumented("data_transformation")
     def initiate_transformation(self, train_path, test_path):
+        if self.tranformation_config.chunk_size is not None:
+            return self.initiate_streaming_transformation(train_path, test_path)
         
         # starting transformation
         logging.info("Starting data transformation...")
@@ -62,8 +208,9 @@ class DataTransformation:
             
             # read data
             logging.info("Reading train and test data from datastore.")
-            train_data = pd.read_csv(train_path)
-            test_data = pd.read_csv(test_path)
+            train_data = apply_schema(read_dataset(train_path, dtype=read_dtypes()))
+            test_data = apply_schema(read_dataset(test_path, dtype=read_dtypes()))
+            record_counts(rows=len(train_data) + len(test_data), bytes=data_bytes(train_data) + data_bytes(test_data))
             logging.info("Data read successfully.")
             
             # separate features and labels
@@ -78,17 +225,40 @@ class DataTransformation:
             preprocessor = preprocessor.fit(Xtrain)
             transformed_Xtrain = preprocessor.transform(Xtrain)
             transformed_Xtest = preprocessor.transform(Xtest)
-
-            # combine transformed features and label
-            transformed_train_data = np.c_[transformed_Xtrain, ytrain]
-            transformed_test_data = np.c_[transformed_Xtest, ytest]
             logging.info("Fitting and transformation completed successfully.")
 
             # save fitted preprocessor into datastore(artifacts)
             logging.info("Saving preprocessor into datastore...")
-            joblib.dump(preprocessor, filename=self.tranformation_config.preprocessor_path)
+            dump_joblib(preprocessor, self.tranformation_config.preprocessor_path)
             logging.info("Preprocessor successfully saved.")
 
+            # export the compiled (pure NumPy) preprocessor, checked for parity on the test split
+            logging.info("Exporting compiled preprocessor...")
+            self.export_compiled_preprocessor(preprocessor, Xtest, transformed_Xtest)
+
+            output_format = self.tranformation_config.output_format
+            if output_format in ("csr", "float32"):
+                # keep features as produced (sparse or compact) and the label in its own array
+                if output_format == "float32":
+                    transformed_Xtrain = np.asarray(transformed_Xtrain, dtype=np.float32)
+                    transformed_Xtest = np.asarray(transformed_Xtest, dtype=np.float32)
+                feature_names = preprocessor.get_feature_names_out().tolist()
+                encoder = preprocessor.named_transformers_["categorical_pipeline"]["encoder"]
+                cardinalities = {column: len(categories) for column, categories in zip(self.categorical_features, encoder.categories_)}
+                report = feature_memory_report(transformed_Xtrain, cardinalities)
+                logging.info(f"Transformed train features ({output_format}): {report}")
+
+                logging.info("Data transformation completed.")
+                # labels are held as compact integers, models get them as float64 like the dataframe format
+                return (TransformedData(transformed_Xtrain, ytrain.to_numpy(dtype=np.float64).ravel(), feature_names),
+                        TransformedData(transformed_Xtest, ytest.to_numpy(dtype=np.float64).ravel(), feature_names))
+            elif output_format != "dataframe":
+                raise ValueError(f"Unknown output format: {output_format}")
+
+            # combine transformed features and label
+            transformed_train_data = np.c_[transformed_Xtrain, ytrain]
+            transformed_test_data = np.c_[transformed_Xtest, ytest]
+
             # data transformation completed
             logging.info("Data transformation completed.")
 
@@ -0,0 +1,87 @@
+# Declared schema of the student performance dataset.
+# Categorical columns are held as pandas categories over a fixed vocabulary and the 0-100 scores
+# as unsigned bytes, instead of Python strings and int64 (one byte per value instead of a string
+# object or eight bytes), and the one-hot encoding can index category codes directly.
+# pandas is imported where it is needed, so the serving path can use the declarations without it.
+import functools
+import numpy as np
+
+# logging
+from src.logger import logging
+
+# fixed vocabularies, in the sorted order OneHotEncoder gives them
+CATEGORIES = {
+    "gender": ["female", "male"],
+    "race_ethnicity": ["group A", "group B", "group C", "group D", "group E"],
+    "parental_level_of_education": ["associate's degree", "bachelor's degree", "high school",
+                                    "master's degree", "some college", "some high school"],
+    "lunch": ["free/reduced", "standard"],
+    "test_preparation_course": ["completed", "none"],
+}
+CATEGORICAL_COLUMNS = list(CATEGORIES)
+SCORE_COLUMNS = ["math_score", "reading_score", "writing_score"]
+SCORE_RANGE = (0, 100)
+LABEL_COLUMN = "math_score"
+NUMERIC_FEATURE_COLUMNS = [column for column in SCORE_COLUMNS if column != LABEL_COLUMN]
+FEATURE_COLUMNS = CATEGORICAL_COLUMNS + NUMERIC_FEATURE_COLUMNS
+
+
+def read_dtypes():
+    """dtype argument for pd.read_csv: categoricals are parsed straight into categories.
+
+    Scores are parsed with the default integer type and narrowed by apply_schema, since
+    pandas parses out-of-range values into small integer types by wrapping them around.
+    """
+    return {column: "category" for column in CATEGORICAL_COLUMNS}
+
+
+@functools.lru_cache(maxsize=None)
+def _vocabulary_dtype(column):
+    import pandas as pd
+    return pd.CategoricalDtype(CATEGORIES[column])
+
+
+def categorical_dtype(column, observed=()):
+    """The column's vocabulary, followed by any observed values outside it (sorted)."""
+    import pandas as pd
+
+    vocabulary = CATEGORIES[column]
+    extra = sorted({value for value in observed if not pd.isna(value)} - set(vocabulary), key=str)
+    if not extra:
+        return _vocabulary_dtype(column)
+    logging.info(f"Column '{column}' has values outside its vocabulary {extra}; appending them.")
+    return pd.CategoricalDtype(vocabulary + extra)
+
+
+def compact_scores(values):
+    """Narrow a score column to uint8, or nullable UInt8 when it has missing values.
+
+    Columns with fractional or out-of-range scores are returned as float64 unchanged.
+    """
+    import pandas as pd
+
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        values = pd.to_numeric(values)
+    array = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    missing = np.isnan(array)
+    present = array[~missing]
+    low, high = SCORE_RANGE
+    if not (np.all((present >= low) & (present <= high)) and np.all(present == np.floor(present))):
+        return values.astype(np.float64)
+    if missing.any():
+        return values.astype("UInt8")
+    return values.astype(np.uint8)
+
+
+def apply_schema(df):
+    """Give the schema columns present in `df` their declared dtypes, in place; returns `df`."""
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            values = df[column]
+            observed = values.cat.categories if hasattr(values, "cat") else values.unique()
+            dtype = categorical_dtype(column, observed)
+            df[column] = values.cat.set_categories(dtype.categories) if hasattr(values, "cat") else values.astype(dtype)
+    for column in SCORE_COLUMNS:
+        if column in df.columns:
+            df[column] = compact_scores(df[column])
+    return df
@@ -0,0 +1,177 @@
+# Typed, columnar hand-off between pipeline stages.
+# csv      - text, kept for export and inspection
+# parquet  - columnar, compressed (needs pyarrow)
+# feather  - columnar, uncompressed Arrow IPC (needs pyarrow)
+# npy      - a directory with one .npy file per column plus a schema.json sidecar,
+#            readable with memory-mapping and no extra dependencies
+import os
+import json
+import shutil
+import importlib.util
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+FORMAT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather", "npy": ""}
+SCHEMA_FILE = "schema.json"
+# formats that need an optional dependency, and the module providing it
+FORMAT_DEPENDENCIES = {"parquet": "pyarrow", "feather": "pyarrow"}
+
+
+def path_for_format(path, fmt):
+    """Swap the extension of an artifact path for the one used by `fmt`."""
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Unknown artifact format '{fmt}', expected one of {sorted(FORMAT_EXTENSIONS)}.")
+    return os.path.splitext(path)[0] + FORMAT_EXTENSIONS[fmt]
+
+
+def require_format(fmt):
+    """Fail early, with an install hint, when `fmt` needs a dependency that is not installed."""
+    module = FORMAT_DEPENDENCIES.get(fmt)
+    if module is not None and importlib.util.find_spec(module) is None:
+        raise ImportError(f"The '{fmt}' artifact format needs {module}, which is not installed (pip install {module}).")
+
+
+def infer_format(path):
+    if os.path.isdir(path) and os.path.exists(os.path.join(path, SCHEMA_FILE)):
+        return "npy"
+    extension = os.path.splitext(path)[1]
+    for fmt, fmt_extension in FORMAT_EXTENSIONS.items():
+        if fmt_extension and extension == fmt_extension:
+            return fmt
+    raise ValueError(f"Cannot infer the artifact format of '{path}'.")
+
+
+def _save_npy(df, path):
+    # write into a temporary directory and swap it in, so readers never see a partial dataset
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    schema = {"n_rows": len(df), "columns": []}
+    for i, column in enumerate(df.columns):
+        values = df[column]
+        filename = f"{i}.npy"
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+            # strings are stored as integer codes into a vocabulary held in the schema
+            categorical = values.astype("category")
+            np.save(os.path.join(tmp_path, filename), categorical.cat.codes.to_numpy())
+            schema["columns"].append({"name": column, "file": filename, "kind": "category",
+                                      "categories": categorical.cat.categories.tolist(),
+                                      "as_category": isinstance(values.dtype, pd.CategoricalDtype)})
+        elif isinstance(values.dtype, pd.api.extensions.ExtensionDtype) and hasattr(values.dtype, "numpy_dtype"):
+            # nullable (masked) columns such as UInt8 scores are stored as their values, with missing
+            # entries zeroed, plus a boolean mask, so both stay plain arrays that can be memory-mapped
+            mask_filename = f"{i}.mask.npy"
+            np.save(os.path.join(tmp_path, filename), values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=0))
+            np.save(os.path.join(tmp_path, mask_filename), values.isna().to_numpy())
+            schema["columns"].append({"name": column, "file": filename, "kind": "masked",
+                                      "mask": mask_filename, "dtype": str(values.dtype)})
+        else:
+            np.save(os.path.join(tmp_path, filename), values.to_numpy())
+            schema["columns"].append({"name": column, "file": filename, "kind": "numeric",
+                                      "dtype": str(values.dtype)})
+
+    with open(os.path.join(tmp_path, SCHEMA_FILE), "w") as f:
+        json.dump(schema, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_arrays(path, mmap_mode="r"):
+    """Return (schema, {column: array}) for an npy dataset, memory-mapped by default.
+
+    Categorical columns are returned as their codes, and masked columns as their values
+    (missing entries zeroed; the column's "mask" file marks them).
+    """
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    arrays = {column["name"]: np.load(os.path.join(path, column["file"]), mmap_mode=mmap_mode)
+              for column in schema["columns"]}
+    return schema, arrays
+
+
+def _load_npy(path, mmap_mode=None):
+    schema, arrays = load_arrays(path, mmap_mode=mmap_mode)
+    data = {}
+    for column in schema["columns"]:
+        values = arrays[column["name"]]
+        if column["kind"] == "category":
+            values = pd.Categorical.from_codes(values, categories=column["categories"])
+            if not column["as_category"]:
+                values = np.asarray(values, dtype=object)
+        elif column["kind"] == "masked":
+            mask = np.load(os.path.join(path, column["mask"]), mmap_mode=mmap_mode)
+            values = pd.api.types.pandas_dtype(column["dtype"]).construct_array_type()(values, mask)
+        data[column["name"]] = values
+    return pd.DataFrame(data)
+
+
+def save_frame(df, path, fmt=None):
+    fmt = infer_format(path) if fmt is None else fmt
+    require_format(fmt)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if fmt == "csv":
+        df.to_csv(path, index=False, header=True)
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt == "feather":
+        df.reset_index(drop=True).to_feather(path)
+    elif fmt == "npy":
+        _save_npy(df, path)
+    else:
+        raise ValueError(f"Unknown artifact format '{fmt}'.")
+    return path
+
+
+def load_frame(path, fmt=None, mmap_mode=None, dtype=None):
+    # dtype types CSV columns at parse time; the other formats keep the dtypes they were saved with
+    fmt = infer_format(path) if fmt is None else fmt
+    require_format(fmt)
+    if fmt == "csv":
+        return pd.read_csv(path, dtype=dtype)
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    if fmt == "feather":
+        return pd.read_feather(path)
+    if fmt == "npy":
+        return _load_npy(path, mmap_mode=mmap_mode)
+    raise ValueError(f"Unknown artifact format '{fmt}'.")
+
+
+@dataclass(frozen=True)
+class SplitSubset:
+    """One side ("train" or "test") of a split stored as row indices into the raw dataset."""
+    split_path: str
+    subset: str
+
+
+def save_split_indices(split_path, raw_data_path, train_index, test_index, **split_params):
+    # int32 indices halve the footprint whenever the row count allows it
+    dtype = np.int32 if split_params["n_rows"] < 2 ** 31 else np.int64
+    metadata = {"raw_data_path": raw_data_path, **split_params}
+    os.makedirs(os.path.dirname(split_path) or ".", exist_ok=True)
+    with open(split_path, "wb") as f:
+        np.savez(f, train=np.asarray(train_index, dtype=dtype), test=np.asarray(test_index, dtype=dtype),
+                 metadata=np.array(json.dumps(metadata)))
+    return split_path
+
+
+def load_split_indices(split_path):
+    with np.load(split_path) as split:
+        return split["train"], split["test"], json.loads(str(split["metadata"]))
+
+
+def read_dataset(source, mmap_mode=None, dtype=None):
+    """Load a dataset from an artifact path, or through the indices of a SplitSubset."""
+    if not isinstance(source, SplitSubset):
+        return load_frame(source, mmap_mode=mmap_mode, dtype=dtype)
+
+    train_index, test_index, metadata = load_split_indices(source.split_path)
+    raw_data = load_frame(metadata["raw_data_path"], mmap_mode=mmap_mode, dtype=dtype)
+    if len(raw_data) != metadata["n_rows"]:
+        raise ValueError(f"Raw dataset has {len(raw_data)} rows but the split was made on {metadata['n_rows']}.")
+
+    index = train_index if source.subset == "train" else test_index
+    return raw_data.iloc[index]
@@ -0,0 +1,365 @@
+# Incremental retraining on rows appended to the source dataset.
+# After every full training the pipeline saves the source offset it covered, streaming
+# preprocessor statistics and (for linear models) normal-equation sums. An update then reads
+# only the appended rows and refreshes the preprocessor statistics from them. Linear models are
+# refitted exactly from the updated sums; RandomForest/GradientBoosting grow more trees on the
+# new rows with warm_start.
+# A full search is only needed when the holdout score degrades past a threshold.
+import os
+import io
+import sys
+import copy
+import hashlib
+import warnings
+import numpy as np
+import pandas as pd
+import joblib
+from dataclasses import dataclass
+
+# logging and exception
+from src.logger import logging
+from src.exception import CustomException
+from src.instrumentation import instrumented, record_counts
+
+from src.components.datastore import read_dataset
+from src.components.dataset_schema import read_dtypes, apply_schema
+from src.components.data_transformation import DataTransformation
+from src.components.streaming import StreamingPreprocessorFitter, hash_split_mask
+from src.pipeline.compiled_inference import CompiledPreprocessor, save_compiled, load_compiled, export_compiled_model, dump_joblib, \
+                                             save_serving_manifest, file_hash
+
+# evaluation
+from sklearn.metrics import r2_score
+
+# bytes before the covered offset that must be unchanged for an append to be trusted
+PREFIX_CHECK_BYTES = 64 * 1024
+
+TREE_MODELS = ("DecisionTreeRegressor", "RandomForestRegressor", "GradientBoostingRegressor", "AdaBoostRegressor")
+# tree ensembles that can grow more trees on new rows
+WARM_START_MODELS = ("RandomForestRegressor", "GradientBoostingRegressor")
+
+
+@dataclass
+class IncrementalTrainingConfig:
+    state_path: str = os.path.join("artifacts", "incremental_state.joblib")
+    model_path: str = os.path.join("artifacts", "regressor.joblib")
+    compiled_model_path: str = os.path.join("artifacts", "compiled_regressor.joblib")
+    preprocessor_path: str = os.path.join("artifacts", "preprocessor.joblib")
+    compiled_preprocessor_path: str = os.path.join("artifacts", "compiled_preprocessor.joblib")
+    manifest_path: str = os.path.join("artifacts", "serving_manifest.json")
+    # share of the new rows held out to validate the updated model
+    validation_size: float = 0.2
+    random_state: int = 42
+    # run a full search when the holdout R2 falls this far below the score of the last full training
+    degradation_threshold: float = 0.05
+    # fewer holdout rows than this are too noisy to judge degradation
+    min_validation_rows: int = 20
+    # trees added per update to RandomForest/GradientBoosting models
+    warm_start_estimators: int = 10
+    chunk_size: int = 100_000
+
+
+def _raw_params(params):
+    # the same preprocessor without scaling, so numeric features stay in input units
+    raw_params = copy.deepcopy(params)
+    for block in raw_params["blocks"]:
+        if block["kind"] == "numeric":
+            block["mean"] = np.zeros(len(block["columns"]))
+            block["scale"] = np.ones(len(block["columns"]))
+    return raw_params
+
+
+def numeric_scaling(params):
+    """(output column, mean, scale) of every scaled numeric feature of compiled preprocessor params."""
+    scaling, offset = [], 0
+    for block in params["blocks"]:
+        if block["kind"] == "numeric":
+            scaling += [(offset + j, block["mean"][j], block["scale"][j]) for j in range(len(block["columns"]))]
+            offset += len(block["columns"])
+        else:
+            offset += sum(len(categories) for categories in block["categories"])
+    return scaling
+
+
+def _categories(params):
+    return {column: list(categories) for block in params["blocks"] if block["kind"] == "onehot"
+            for column, categories in zip(block["columns"], block["categories"])}
+
+
+def keep_scaling(params, scaling_params):
+    """`params` with the numeric means and scales of `scaling_params`.
+
+    Tree splits depend only on the order of each feature, so tree models keep the scaling they
+    were trained with while the imputation and category statistics move on.
+    """
+    params = copy.deepcopy(params)
+    scaling_blocks = [block for block in scaling_params["blocks"] if block["kind"] == "numeric"]
+    for block, scaling_block in zip([block for block in params["blocks"] if block["kind"] == "numeric"], scaling_blocks):
+        block["mean"] = np.array(scaling_block["mean"], dtype=np.float64)
+        block["scale"] = np.array(scaling_block["scale"], dtype=np.float64)
+    return params
+
+
+def solve_linear(model, gram, moment, params):
+    """Least-squares coefficients of `model` (a fitted LinearRegression) from the sums
+    [1, x]'[1, x] and [1, x]'y over raw features, expressed in the scaling of `params`.
+
+    Matches LinearRegression's minimum-norm solution on centered data.
+    """
+    # [1, raw features] @ transform = [1, scaled features]
+    transform = np.eye(gram.shape[0])
+    for index, mean, scale in numeric_scaling(params):
+        transform[0, index + 1] = -mean / scale
+        transform[index + 1, index + 1] = 1.0 / scale
+    gram = transform.T @ gram @ transform
+    moment = transform.T @ moment
+
+    if model.fit_intercept:
+        n_rows = gram[0, 0]
+        x_mean, y_mean = gram[0, 1:] / n_rows, moment[0] / n_rows
+        centered_gram = gram[1:, 1:] - n_rows * np.outer(x_mean, x_mean)
+        centered_moment = moment[1:] - n_rows * x_mean * y_mean
+        coef = np.linalg.pinv(centered_gram, rcond=1e-10, hermitian=True) @ centered_moment
+        intercept = y_mean - x_mean @ coef
+    else:
+        coef = np.linalg.pinv(gram[1:, 1:], rcond=1e-10, hermitian=True) @ moment[1:]
+        intercept = 0.0
+
+    updated = copy.deepcopy(model)
+    updated.coef_ = coef
+    updated.intercept_ = float(intercept)
+    return updated
+
+
+class IncrementalTraining:
+    def __init__(self, config=None):
+        self.incremental_config = IncrementalTrainingConfig() if config is None else config
+        self.transformation = DataTransformation()
+        self.label = self.transformation.label[0]
+
+    @staticmethod
+    def _prefix_hash(path, offset):
+        with open(path, "rb") as f:
+            f.seek(max(offset - PREFIX_CHECK_BYTES, 0))
+            return hashlib.sha256(f.read(min(offset, PREFIX_CHECK_BYTES))).hexdigest()
+
+    def _model_fingerprint(self):
+        # the preprocessor statistics and model the state's sums and baseline were computed for
+        config = self.incremental_config
+        return file_hash(config.compiled_preprocessor_path), file_hash(config.model_path)
+
+    def _iter_frames(self, source):
+        if isinstance(source, str) and source.endswith(".csv"):
+            for chunk in pd.read_csv(source, chunksize=self.incremental_config.chunk_size, dtype=read_dtypes()):
+                yield apply_schema(chunk)
+        else:
+            yield apply_schema(read_dataset(source, dtype=read_dtypes()))
+
+    def _new_fitter(self):
+        (numerical_name, _, _), (categorical_name, _, _) = self.transformation.instantiate_preprocessor().transformers
+        return StreamingPreprocessorFitter(self.transformation.numerical_features, self.transformation.categorical_features,
+                                           numerical_name=numerical_name, categorical_name=categorical_name,
+                                           median_sample_size=self.transformation.tranformation_config.median_sample_size,
+                                           random_state=self.incremental_config.random_state)
+
+    def _linear_sums(self, params, frame):
+        design = CompiledPreprocessor(_raw_params(params)).transform(frame)
+        design = np.c_[np.ones(len(design)), design]
+        target = frame[self.label].to_numpy(dtype=np.float64)
+        return design.T @ design, design.T @ target
+
+    def _score(self, model, params, frame):
+        X = CompiledPreprocessor(params).transform(frame)
+        return float(r2_score(frame[self.label].to_numpy(dtype=np.float64), model.predict(X)))
+
+    def _save_state(self, state):
+        path = self.incremental_config.state_path
+        joblib.dump(state, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def load_state(self):
+        path = self.incremental_config.state_path
+        return joblib.load(path) if os.path.exists(path) else None
+
+    @instrumented("incremental_state")
+    def initialize_state(self, source_path, source_offset, train_path, test_path):
+        """Record what the last full training covered, so later updates read only appended rows."""
+        logging.info("Initializing incremental training state...")
+        config = self.incremental_config
+        try:
+            if not os.path.exists(config.compiled_preprocessor_path):
+                # the statistics are kept in the compiled preprocessor's form
+                logging.info("No compiled preprocessor; incremental training is unavailable for this model.")
+                if os.path.exists(config.state_path):
+                    os.remove(config.state_path)
+                return None
+
+            # a run that changed neither the covered source rows nor the model keeps its state,
+            # so it costs no passes over the training data
+            state = self.load_state()
+            model_fingerprint = self._model_fingerprint()
+            prefix_hash = self._prefix_hash(source_path, source_offset)
+            if (state is not None and state["source_path"] == os.path.abspath(source_path)
+                    and state["offset"] == source_offset and state["prefix_hash"] == prefix_hash
+                    and state.get("model_fingerprint") == model_fingerprint):
+                logging.info("Incremental state already covers this training, keeping it.")
+                return state
+
+            params = load_compiled(config.compiled_preprocessor_path)
+            model = joblib.load(config.model_path)
+            fitter = self._new_fitter()
+            linear_sums = None
+            n_rows = 0
+            for frame in self._iter_frames(train_path):
+                fitter.partial_fit(frame)
+                n_rows += len(frame)
+                if type(model).__name__ == "LinearRegression":
+                    gram, moment = self._linear_sums(params, frame)
+                    linear_sums = (gram, moment) if linear_sums is None else (linear_sums[0] + gram, linear_sums[1] + moment)
+            record_counts(rows=n_rows)
+
+            baseline_score = self._score(model, params, apply_schema(read_dataset(test_path, dtype=read_dtypes())))
+            state = {"source_path": os.path.abspath(source_path),
+                     "columns": pd.read_csv(source_path, nrows=0).columns.tolist(),
+                     "offset": source_offset,
+                     "prefix_hash": prefix_hash,
+                     "model_fingerprint": model_fingerprint,
+                     "rows_trained": n_rows,
+                     "model_kind": type(model).__name__,
+                     "baseline_score": baseline_score,
+                     "fitter": fitter,
+                     "linear_sums": linear_sums,
+                     "updates": []}
+            self._save_state(state)
+            logging.info(f"Incremental state saved ({n_rows} training rows, baseline R2 {baseline_score:.4f}).")
+            return state
+
+        except Exception as err:
+            raise CustomException(err, sys)
+
+    def read_new_rows(self, state):
+        """Rows appended to the source since the state was saved, and the offset after them.
+
+        Returns (None, None) when the covered part of the source was rewritten.
+        """
+        path = state["source_path"]
+        offset = state["offset"]
+        if os.path.getsize(path) < offset or self._prefix_hash(path, offset) != state["prefix_hash"]:
+            return None, None
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        # a row still being written is left for the next update
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return pd.DataFrame(columns=state["columns"]), offset
+        new_rows = pd.read_csv(io.BytesIO(data[:end]), header=None, names=state["columns"], dtype=read_dtypes())
+        return apply_schema(new_rows), offset + end
+
+    def _full_search(self, reason, **details):
+        logging.info(f"Full search required: {reason}.")
+        return {"status": "full_search_required", "reason": reason, **details}
+
+    @instrumented("incremental_training")
+    def initiate_incremental_training(self):
+        """Update the preprocessor and model from appended rows.
+
+        Returns a report whose status is "up_to_date", "updated" or "full_search_required"
+        (nothing is saved in the last case).
+        """
+        logging.info("Starting incremental training...")
+        config = self.incremental_config
+        try:
+            state = self.load_state()
+            if state is None:
+                return self._full_search("no incremental state from a previous full training")
+
+            new_rows, new_offset = self.read_new_rows(state)
+            if new_rows is None:
+                return self._full_search("the source dataset was rewritten, not appended to")
+            if len(new_rows) == 0:
+                logging.info("No new rows since the last training.")
+                return {"status": "up_to_date"}
+            record_counts(rows=len(new_rows))
+            logging.info(f"Read {len(new_rows)} new rows.")
+
+            old_params = load_compiled(config.compiled_preprocessor_path)
+            unseen = {column: sorted(set(new_rows[column].dropna()) - set(categories))
+                      for column, categories in _categories(old_params).items()}
+            unseen = {column: values for column, values in unseen.items() if values}
+            if unseen:
+                # new categories add one-hot features the current model has never seen
+                return self._full_search("new categories", unseen_categories=unseen)
+
+            holdout_mask = hash_split_mask(new_rows, config.validation_size, config.random_state)
+            train_rows, holdout_rows = new_rows[~holdout_mask], new_rows[holdout_mask]
+
+            # preprocessor statistics are updated from the new rows only
+            fitter = state["fitter"]
+            if len(train_rows):
+                fitter.partial_fit(train_rows)
+            new_params = fitter.params()
+            if _categories(new_params) != _categories(old_params):
+                return self._full_search("the category vocabulary changed")
+
+            model = joblib.load(config.model_path)
+            kind = type(model).__name__
+            previous_score = self._score(model, old_params, holdout_rows) if len(holdout_rows) >= 2 else None
+
+            linear_sums = state["linear_sums"]
+            warnings.filterwarnings("ignore")
+            if kind == "LinearRegression" and linear_sums is not None:
+                if len(train_rows):
+                    gram, moment = self._linear_sums(new_params, train_rows)
+                    linear_sums = (linear_sums[0] + gram, linear_sums[1] + moment)
+                model = solve_linear(model, *linear_sums, new_params)
+                action = "linear_refit"
+            elif kind in TREE_MODELS:
+                new_params = keep_scaling(new_params, old_params)
+                action = "statistics_only"
+                if kind in WARM_START_MODELS and len(train_rows):
+                    Xtrain = CompiledPreprocessor(new_params).transform(train_rows)
+                    model.set_params(warm_start=True, n_estimators=model.n_estimators + config.warm_start_estimators)
+                    model.fit(Xtrain, train_rows[self.label].to_numpy(dtype=np.float64))
+                    model.set_params(warm_start=False)
+                    action = "warm_start"
+            else:
+                return self._full_search(f"{kind} cannot be updated incrementally")
+
+            report = {"new_rows": len(new_rows), "train_rows": len(train_rows), "holdout_rows": len(holdout_rows),
+                      "model_kind": kind, "action": action, "baseline_score": state["baseline_score"],
+                      "previous_score": previous_score, "score": None}
+            if len(holdout_rows) >= config.min_validation_rows:
+                report["score"] = self._score(model, new_params, holdout_rows)
+                if state["baseline_score"] - report["score"] > config.degradation_threshold:
+                    return self._full_search(f"holdout R2 {report['score']:.4f} is more than {config.degradation_threshold} "
+                                             f"below the baseline {state['baseline_score']:.4f}", **report)
+            else:
+                logging.info(f"Only {len(holdout_rows)} holdout rows, skipping the degradation check.")
+
+            logging.info("Saving updated preprocessor and model...")
+            save_compiled(new_params, config.compiled_preprocessor_path)
+            # the sklearn preprocessor still holds the old statistics
+            if os.path.exists(config.preprocessor_path):
+                os.remove(config.preprocessor_path)
+            dump_joblib(model, config.model_path)
+            X_check = CompiledPreprocessor(new_params).transform(holdout_rows if len(holdout_rows) else train_rows)
+            export_compiled_model(model, X_check, config.compiled_model_path)
+            save_serving_manifest(config.manifest_path, preprocessor=config.preprocessor_path,
+                                  compiled_preprocessor=config.compiled_preprocessor_path,
+                                  model=config.model_path, compiled_model=config.compiled_model_path)
+
+            state.update({"offset": new_offset,
+                          "prefix_hash": self._prefix_hash(state["source_path"], new_offset),
+                          "model_fingerprint": self._model_fingerprint(),
+                          "rows_trained": state["rows_trained"] + len(train_rows),
+                          "fitter": fitter,
+                          "linear_sums": linear_sums})
+            state["updates"].append(report)
+            self._save_state(state)
+            logging.info(f"Incremental training completed: {report}")
+
+            return {"status": "updated", **report}
+
+        except Exception as err:
+            raise CustomException(err, sys)
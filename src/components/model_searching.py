@@ -1,97 +1,246 @@
 # Basic import
 import os
 import sys
+import time
 import joblib
 import warnings
 import pandas as pd
 
 
 # exception and logging
-from src.logger import logging
+from src.logger import logging, RUN_ID
 from src.exception import CustomException
+from src.instrumentation import instrumented, record_counts, data_bytes
+
+# stage hand-off
+from src.components.data_transformation import features_and_label
+
+# sklearn-free export of the fitted model for serving
+from src.pipeline.compiled_inference import export_compiled_model, dump_joblib
 
 # modeling
 from sklearn.linear_model import LinearRegression
 
 # configurations
 from dataclasses import dataclass
-from src.models_configs import estimators_configurations
+from src.components.parallel_search import ParallelSearch
+from src.components.trial_store import TrialStore, TrialStoreConfig
+from src.components.model_selection import ModelSelection
 
 # hyperparameter tuning functions
+from sklearn.base import clone
 from sklearn.model_selection import RandomizedSearchCV, \
                                     cross_val_score, \
                                     cross_val_predict
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (enables HalvingRandomSearchCV)
+from sklearn.model_selection import HalvingRandomSearchCV
 
 @dataclass
 class ModelSearchingConfig:
     model_path: str = os.path.join("artifacts", "regressor.joblib")
+    compiled_model_path: str = os.path.join("artifacts", "compiled_regressor.joblib")
     metrics_path: str = os.path.join("artifacts", "metrics.csv")
     search_result_path: str = os.path.join("artifacts", "search_results.joblib")
+    # lists the preprocessor and model servers load together (written by TrainingPipeline)
+    manifest_path: str = os.path.join("artifacts", "serving_manifest.json")
+    n_jobs: int = 1  # worker processes for the search, -1 uses every core
+    random_state: int = 42
+    # "random" runs a full RandomizedSearchCV per family, "halving" runs successive halving
+    search_mode: str = "random"
+    halving_factor: int = 3
+    halving_resource: str = "n_samples"  # or "n_estimators" for the ensemble families
+    halving_min_estimators: int = 10
+    halving_max_estimators: int = 100
+    max_fits: int = None       # total fit budget across all families (halving mode)
+    max_seconds: float = None  # wall-clock budget; families not started in time are skipped (halving mode)
+    # every cross-validation fit of a random search is recorded here and reused by reruns, None disables it
+    trial_store_path: str = TrialStoreConfig.store_path
 
 
 class ModelSearching:
     def __init__(self):
         self.model_config = ModelSearchingConfig()
+        self.selection = ModelSelection()
+
+    def seeded_estimators(self):
+        # fix every estimator's random_state so serial and parallel searches fit identical models
+        estimators = {}
+        # imported here: the configurations load every estimator family and scipy.stats
+        from src.models_configs import estimators_configurations
+        for estimator_name, estimator_config in estimators_configurations.items():
+            estimator = clone(estimator_config["estimator"])
+            if "random_state" in estimator.get_params():
+                estimator.set_params(random_state=self.model_config.random_state)
+            estimators[estimator_name] = {"estimator": estimator, "params": estimator_config["params"]}
+        return estimators
+
+    def serial_search(self, estimators, Xtrain, ytrain, Xtest, ytest, cv=5, n_iter=30):
+        results = []
+        for i, (estimator_name, estimator_config ) in enumerate(estimators.items()):
+            start = time.perf_counter()
+            random_search = RandomizedSearchCV(
+                estimator=estimator_config["estimator"],
+                param_distributions=estimator_config["params"],
+                n_iter=n_iter,  # number of combinations to try for each model
+                cv=cv,
+                refit=True,
+                # scoring="neg_root_mean_squared_error",
+                random_state=self.model_config.random_state
+                )
+
+            random_search.fit(Xtrain, ytrain)
+            wall_seconds = time.perf_counter() - start
+
+            # append necessary details
+            results.append({"name": estimator_name,
+                            "best_estimator": random_search.best_estimator_,
+                            "validation_score": random_search.best_score_,
+                            "test_score": random_search.score(Xtest, ytest),
+                            "cv_results": random_search.cv_results_,
+                            "fit_seconds": random_search.cv_results_["mean_fit_time"].sum() * random_search.n_splits_ + random_search.refit_time_,
+                            "wall_seconds": wall_seconds})
+            logging.info(f"{estimator_name} searched in {wall_seconds:.2f}s.")
+
+        return results
+
+    def resumable_search(self, estimators, Xtrain, ytrain, Xtest, ytest, cv=5, n_iter=30, n_jobs=1):
+        # same candidates and folds as serial_search, but every fit is checkpointed in the trial store
+        logging.info(f"Running resumable search with trials stored in {self.model_config.trial_store_path}...")
+        trial_store = TrialStore(TrialStoreConfig(store_path=self.model_config.trial_store_path))
+        run_id = trial_store.start_run(log_run_id=RUN_ID, search_mode="random", n_iter=n_iter, cv=cv, n_jobs=n_jobs)
+        try:
+            parallel_search = ParallelSearch(n_jobs=n_jobs, random_state=self.model_config.random_state,
+                                             trial_store=trial_store, run_id=run_id)
+            results = parallel_search.search(estimators, Xtrain, ytrain, Xtest, ytest, cv=cv, n_iter=n_iter)
+            best = max(results, key=lambda result: result["validation_score"])
+            trial_store.finish_run(run_id, best_family=best["name"], best_score=best["validation_score"])
+            return results
+        except BaseException:
+            # interrupted runs stay queryable, and their finished trials are reused by the next run
+            trial_store.finish_run(run_id, status="interrupted")
+            raise
+        finally:
+            trial_store.close()
+
+    def _halving_candidates(self, n_families, cv, n_iter):
+        # without a fit budget every family starts with n_iter candidates
+        if self.model_config.max_fits is None:
+            return n_iter
+        # each rung keeps 1/factor of the candidates, so a search costs about cv * n * factor / (factor - 1) fits
+        factor = self.model_config.halving_factor
+        fits_per_family = self.model_config.max_fits / n_families
+        return max(factor, int(fits_per_family / (cv * factor / (factor - 1))))
+
+    def halving_search(self, estimators, Xtrain, ytrain, Xtest, ytest, cv=5, n_iter=30, n_jobs=1):
+        n_candidates = self._halving_candidates(len(estimators), cv, n_iter)
+        logging.info(f"Successive halving with {n_candidates} initial candidates per family.")
+
+        results = []
+        search_start = time.perf_counter()
+        for estimator_name, estimator_config in estimators.items():
+            elapsed = time.perf_counter() - search_start
+            if self.model_config.max_seconds is not None and elapsed >= self.model_config.max_seconds:
+                logging.info(f"Time budget of {self.model_config.max_seconds}s spent, skipping {estimator_name}.")
+                continue
 
-    def initiate_model_search(self, train_data, test_data, cv=5, n_iter=30):
+            params = dict(estimator_config["params"])
+            # "exhaust" sizes the first rung so the last one trains on the full training set
+            resource_kwargs = {"resource": "n_samples", "min_resources": "exhaust"}
+            if self.model_config.halving_resource == "n_estimators" and "n_estimators" in estimator_config["estimator"].get_params():
+                # the resource cannot also be a searched parameter
+                params.pop("n_estimators", None)
+                resource_kwargs = {"resource": "n_estimators",
+                                   "min_resources": self.model_config.halving_min_estimators,
+                                   "max_resources": self.model_config.halving_max_estimators}
+
+            start = time.perf_counter()
+            halving_search = HalvingRandomSearchCV(
+                estimator=estimator_config["estimator"],
+                param_distributions=params,
+                n_candidates=n_candidates,
+                factor=self.model_config.halving_factor,
+                cv=cv,
+                refit=True,
+                n_jobs=n_jobs,
+                random_state=self.model_config.random_state,
+                **resource_kwargs
+                )
+
+            halving_search.fit(Xtrain, ytrain)
+            wall_seconds = time.perf_counter() - start
+
+            results.append({"name": estimator_name,
+                            "best_estimator": halving_search.best_estimator_,
+                            "validation_score": halving_search.best_score_,
+                            "test_score": halving_search.score(Xtest, ytest),
+                            "cv_results": halving_search.cv_results_,
+                            "fit_seconds": halving_search.cv_results_["mean_fit_time"].sum() * halving_search.n_splits_ + halving_search.refit_time_,
+                            "wall_seconds": wall_seconds})
+            logging.info(f"{estimator_name} searched in {wall_seconds:.2f}s over {halving_search.n_iterations_} rungs "
+                         f"({len(halving_search.cv_results_['params']) * halving_search.n_splits_} fits).")
+
+        if not results:
+            raise ValueError("Search budget left no estimator family searched.")
+
+        return results
+
+    @instrumented("model_search")
+    def initiate_model_search(self, train_data, test_data, cv=5, n_iter=30, n_jobs=None, search_mode=None):
         
         logging.info("Starting model searching...")
         
         try:
-            # Separate into features and labels
-            Xtrain = train_data.values[:, :-1]
-            ytrain = train_data.values[:, -1].ravel()
-
-            Xtest = test_data.values[:, :-1]
-            ytest = test_data.values[:, -1].ravel()
-
-            model_names = []
-            validation_scores = []
-            test_scores = []
+            # Separate into features and labels (TransformedData features are used as-is, sparse or not)
+            Xtrain, ytrain = features_and_label(train_data)
+            Xtest, ytest = features_and_label(test_data)
 
             # tuning model
             warnings.filterwarnings("ignore")
-            for i, (estimator_name, estimator_config ) in enumerate(estimators_configurations.items()):
-                random_search = RandomizedSearchCV(
-                    estimator=estimator_config["estimator"],
-                    param_distributions=estimator_config["params"],
-                    n_iter=n_iter,  # number of combinations to try for each model
-                    cv=cv,
-                    refit=True,
-                    # scoring="neg_root_mean_squared_error",
-                    random_state=42
-                    )
-                
-                random_search.fit(Xtrain, ytrain)
-                
-                val_score = random_search.best_score_
-
-                test_score = random_search.score(Xtest, ytest)
-
-                # append necessary details
-                model_names.append(estimator_name)
-                validation_scores.append(val_score)
-                test_scores.append(test_score)
+            n_jobs = self.model_config.n_jobs if n_jobs is None else n_jobs
+            search_mode = self.model_config.search_mode if search_mode is None else search_mode
+            record_counts(rows=Xtrain.shape[0], bytes=data_bytes(Xtrain), search_mode=search_mode, n_jobs=n_jobs, n_iter=n_iter, cv=cv)
+            estimators = self.seeded_estimators()
+            if search_mode == "halving":
+                search_results = self.halving_search(estimators, Xtrain, ytrain, Xtest, ytest, cv=cv, n_iter=n_iter, n_jobs=n_jobs)
+            elif search_mode != "random":
+                raise ValueError(f"Unknown search mode: {search_mode}")
+            elif self.model_config.trial_store_path is not None:
+                search_results = self.resumable_search(estimators, Xtrain, ytrain, Xtest, ytest, cv=cv, n_iter=n_iter, n_jobs=n_jobs)
+            elif n_jobs == 1:
+                search_results = self.serial_search(estimators, Xtrain, ytrain, Xtest, ytest, cv=cv, n_iter=n_iter)
+            else:
+                logging.info("Running parallel search...")
+                parallel_search = ParallelSearch(n_jobs=n_jobs, random_state=self.model_config.random_state)
+                search_results = parallel_search.search(estimators, Xtrain, ytrain, Xtest, ytest, cv=cv, n_iter=n_iter)
 
             logging.info("Collecting and saving metrics")
             # collect results as dataframe
-            metrics = pd.DataFrame(data={"validation_scores": validation_scores, "test_scores": test_scores},
-                                    index=model_names)
-            
-            best_score = metrics["validation_scores"].max()
+            metrics = pd.DataFrame(data={"validation_scores": [result["validation_score"] for result in search_results],
+                                         "test_scores": [result["test_score"] for result in search_results],
+                                         "fit_seconds": [result["fit_seconds"] for result in search_results],
+                                         "wall_seconds": [result["wall_seconds"] for result in search_results]},
+                                    index=[result["name"] for result in search_results])
             
             # saving metrics into datastore
             metrics.to_csv(self.model_config.metrics_path, index=True, header=True)
             logging.info("Metrics successfully saved.")
 
+            # pick the model to serve from each family's best, weighing its serving costs
+            selected_result = self.selection.initiate_model_selection(search_results, Xtest)
+            best_score = selected_result["validation_score"]
+
             # writing model into datastore(artifacts)
             logging.info("Saving model to datastore...")
-            joblib.dump(random_search.best_estimator_, self.model_config.model_path)
+            dump_joblib(selected_result["best_estimator"], self.model_config.model_path)
             logging.info("Model successfully saved.")
 
+            # export the compiled model, checked for parity against sklearn on the test split
+            logging.info("Exporting compiled model...")
+            export_compiled_model(selected_result["best_estimator"], Xtest, self.model_config.compiled_model_path)
+
             # write search results into datastore
             logging.info("Saving search results...")
-            joblib.dump(random_search.cv_results_, filename=self.model_config.search_result_path) # saving the entire random search
+            dump_joblib(selected_result["cv_results"], self.model_config.search_result_path) # saving the entire random search
             # joblib.dump(random_search.cv_results_, filename=self.model_config.search_result_path) # saving only the result
             logging.info("Search result saved.")
 
@@ -0,0 +1,175 @@
+# Latency- and size-aware choice among the best model of each searched family.
+# Every finalist is measured the way it would be served (the compiled model when it passes
+# the parity check, sklearn otherwise): single-row and batch predict latency, serialized size
+# and the memory it takes once loaded. A selection policy then picks the model to save, and
+# the measurements are written to a leaderboard.
+import os
+import sys
+import time
+import joblib
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+# logging and exception
+from src.logger import logging
+from src.exception import CustomException
+from src.instrumentation import stage
+
+from src.pipeline.compiled_inference import CompiledModel, compile_with_parity, save_compiled, load_compiled
+
+POLICIES = ("best_score", "latency_slo", "pareto")
+
+
+@dataclass
+class ModelSelectionConfig:
+    leaderboard_path: str = os.path.join("artifacts", "leaderboard.csv")
+    # "best_score" keeps the highest validation score, "latency_slo" the best score whose single-row
+    # p99 latency meets the SLO, "pareto" the fastest Pareto-optimal model within score_tolerance of the best
+    policy: str = os.environ.get("MODEL_SELECTION_POLICY", "best_score")
+    p99_slo_ms: float = float(os.environ.get("MODEL_SELECTION_P99_SLO_MS", 5.0))
+    max_model_bytes: int = None  # optional size budget for "latency_slo"
+    score_tolerance: float = float(os.environ.get("MODEL_SELECTION_SCORE_TOLERANCE", 0.005))
+    n_single: int = 300  # single-row predictions timed per finalist
+    batch_rows: int = 1000
+    n_batches: int = 5
+
+
+def serving_model(model, X):
+    """("compiled", CompiledModel) when the compiled model matches sklearn on X, else ("sklearn", model)."""
+    params = compile_with_parity(model, X)
+    if params is None:
+        return "sklearn", model, None
+    return "compiled", CompiledModel(params), params
+
+
+def _saved_size_and_memory(runtime, model, params):
+    # bytes on disk, and bytes still allocated after loading the artifact into a fresh object
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "model.joblib")
+        if runtime == "compiled":
+            save_compiled(params, path)
+        else:
+            joblib.dump(model, path)
+        size = os.path.getsize(path)
+
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        loaded = load_compiled(path) if runtime == "compiled" else joblib.load(path)
+        memory = tracemalloc.get_traced_memory()[0] - before
+        if not tracing:
+            tracemalloc.stop()
+        del loaded
+    return size, memory
+
+
+def measure_serving_costs(model, X, n_single=300, batch_rows=1000, n_batches=5):
+    """Predict latency (transformed features in, predictions out), size and memory of a fitted model."""
+    runtime, predictor, params = serving_model(model, X)
+    n_rows = X.shape[0]
+
+    # a few untimed calls first, so lazy initialization is not counted
+    for i in range(min(5, n_rows)):
+        predictor.predict(X[i:i + 1])
+    single = []
+    for i in range(n_single):
+        row = X[i % n_rows:i % n_rows + 1]
+        start = time.perf_counter()
+        predictor.predict(row)
+        single.append(time.perf_counter() - start)
+
+    batch = X[np.arange(batch_rows) % n_rows]
+    batches = []
+    for _ in range(n_batches):
+        start = time.perf_counter()
+        predictor.predict(batch)
+        batches.append(time.perf_counter() - start)
+    batch_seconds = float(np.median(batches))
+
+    serialized_bytes, memory_bytes = _saved_size_and_memory(runtime, model, params)
+    single = np.asarray(single) * 1e3
+    return {"serving_runtime": runtime,
+            "single_p50_ms": float(np.percentile(single, 50)),
+            "single_p99_ms": float(np.percentile(single, 99)),
+            "batch_ms": batch_seconds * 1e3,
+            "batch_rows_per_second": batch_rows / batch_seconds if batch_seconds > 0 else None,
+            "serialized_bytes": serialized_bytes,
+            "memory_bytes": memory_bytes}
+
+
+def pareto_front(leaderboard):
+    """Boolean mask of models no other model beats on score, p99 latency and size at once."""
+    score = leaderboard["validation_score"].to_numpy()
+    latency = leaderboard["single_p99_ms"].to_numpy()
+    size = leaderboard["serialized_bytes"].to_numpy()
+    front = np.ones(len(leaderboard), dtype=bool)
+    for i in range(len(leaderboard)):
+        no_worse = (score >= score[i]) & (latency <= latency[i]) & (size <= size[i])
+        better = (score > score[i]) | (latency < latency[i]) | (size < size[i])
+        front[i] = not np.any(no_worse & better)
+    return front
+
+
+class ModelSelection:
+    def __init__(self, config=None):
+        self.selection_config = ModelSelectionConfig() if config is None else config
+
+    def leaderboard(self, search_results, Xtest):
+        config = self.selection_config
+        rows = []
+        for result in search_results:
+            with stage("model_selection_measure", family=result["name"]):
+                costs = measure_serving_costs(result["best_estimator"], Xtest, n_single=config.n_single,
+                                              batch_rows=config.batch_rows, n_batches=config.n_batches)
+            logging.info(f"{result['name']} serves with {costs['serving_runtime']}: "
+                         f"p99 {costs['single_p99_ms']:.3f}ms, {costs['serialized_bytes']} bytes.")
+            rows.append({"family": result["name"],
+                         "validation_score": result["validation_score"],
+                         "test_score": result["test_score"],
+                         "fit_seconds": result["fit_seconds"],
+                         **costs})
+        leaderboard = pd.DataFrame(rows).set_index("family")
+        leaderboard["pareto"] = pareto_front(leaderboard)
+        return leaderboard
+
+    def select(self, leaderboard):
+        """Family chosen by the configured policy."""
+        config = self.selection_config
+        if config.policy == "best_score":
+            return leaderboard["validation_score"].idxmax()
+
+        if config.policy == "latency_slo":
+            eligible = leaderboard["single_p99_ms"] <= config.p99_slo_ms
+            if config.max_model_bytes is not None:
+                eligible &= leaderboard["serialized_bytes"] <= config.max_model_bytes
+            if not eligible.any():
+                logging.info(f"No model meets the {config.p99_slo_ms}ms p99 SLO, selecting the fastest one.")
+                return leaderboard["single_p99_ms"].idxmin()
+            return leaderboard.loc[eligible, "validation_score"].idxmax()
+
+        if config.policy == "pareto":
+            good_enough = leaderboard["validation_score"] >= leaderboard["validation_score"].max() - config.score_tolerance
+            candidates = leaderboard[leaderboard["pareto"] & good_enough]
+            return candidates.sort_values(["single_p99_ms", "serialized_bytes"]).index[0]
+
+        raise ValueError(f"Unknown model selection policy: {config.policy} (expected one of {POLICIES})")
+
+    def initiate_model_selection(self, search_results, Xtest):
+        """Measure every family's best model, save the leaderboard and return the selected search result."""
+        logging.info(f"Selecting model with the {self.selection_config.policy} policy...")
+        try:
+            leaderboard = self.leaderboard(search_results, Xtest)
+            selected = self.select(leaderboard)
+            leaderboard["selected"] = leaderboard.index == selected
+            leaderboard = leaderboard.sort_values("validation_score", ascending=False)
+
+            leaderboard.to_csv(self.selection_config.leaderboard_path, index=True, header=True)
+            logging.info(f"Selected {selected}; leaderboard saved to {self.selection_config.leaderboard_path}.")
+            return next(result for result in search_results if result["name"] == selected)
+
+        except Exception as err:
+            raise CustomException(err, sys)
@@ -7,6 +7,13 @@ import pandas as pd
 # exception and logging
 from src.logger import logging
 from src.exception import CustomException
+from src.instrumentation import instrumented, record_counts, data_bytes
+
+# stage hand-off
+from src.components.data_transformation import features_and_label
+
+# sklearn-free export of the fitted model for serving
+from src.pipeline.compiled_inference import export_compiled_model, dump_joblib
 
 # modeling
 from sklearn.linear_model import LinearRegression
@@ -22,6 +29,7 @@ from dataclasses import dataclass
 @dataclass
 class ModelTrainingConfig:
     model_path: str = os.path.join("artifacts", "regressor.joblib")
+    compiled_model_path: str = os.path.join("artifacts", "compiled_regressor.joblib")
     metrics_path: str = os.path.join("artifacts", "metrics.csv")
 
 
@@ -47,16 +55,15 @@ class ModelTraining:
 
         return metrics
 
+    @instrumented("model_training")
     def train_and_evaluate_model(self, train_data, test_data):
         # start training and evaluation
         logging.info("Starting model training and evaluation...")
         try:
-            # Separate into features and labels
-            Xtrain = train_data.values[:, :-1]
-            ytrain = train_data.values[:, -1].ravel()
-
-            Xtest = test_data.values[:, :-1]
-            ytest = test_data.values[:, -1].ravel()
+            # Separate into features and labels (TransformedData features are used as-is, sparse or not)
+            Xtrain, ytrain = features_and_label(train_data)
+            Xtest, ytest = features_and_label(test_data)
+            record_counts(rows=Xtrain.shape[0], bytes=data_bytes(Xtrain))
 
             # train model
             logging.info("Training model...")
@@ -70,9 +77,13 @@ class ModelTraining:
 
             # writing model into datastore(artifacts)
             logging.info("Saving model to datastore...")
-            joblib.dump(self.model, self.model_config.model_path)
+            dump_joblib(self.model, self.model_config.model_path)
             logging.info("Model successfully saved.")
 
+            # export the compiled model, checked for parity against sklearn on the test split
+            logging.info("Exporting compiled model...")
+            export_compiled_model(self.model, Xtest, self.model_config.compiled_model_path)
+
             # saving metrics into datastore
             logging.info("Saving metrics to datastore...")
             test_metrics.to_csv(self.model_config.metrics_path, index=False, header=True)
@@ -0,0 +1,169 @@
+# Basic import
+import os
+import time
+import warnings
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# logging
+from src.logger import logging
+
+# resumable trials
+from src.components.trial_store import data_hash, params_key, search_key
+
+# hyperparameter tuning functions
+from sklearn.base import clone
+from sklearn.model_selection import ParameterSampler, check_cv
+
+# training data shared by every task in a worker process, set once by the pool initializer
+_worker_data = {}
+
+
+def _init_worker(Xtrain, ytrain):
+    warnings.filterwarnings("ignore")
+    _worker_data["X"] = Xtrain
+    _worker_data["y"] = ytrain
+
+
+def _fit_and_score(estimator, params, train_idx, val_idx):
+    X, y = _worker_data["X"], _worker_data["y"]
+    start = time.perf_counter()
+    try:
+        model = clone(estimator).set_params(**params)
+        model.fit(X[train_idx], y[train_idx])
+        score = model.score(X[val_idx], y[val_idx])
+    except Exception:
+        score = np.nan  # same as RandomizedSearchCV's default error_score
+    return score, time.perf_counter() - start
+
+
+def _refit(estimator, params):
+    X, y = _worker_data["X"], _worker_data["y"]
+    start = time.perf_counter()
+    model = clone(estimator).set_params(**params).fit(X, y)
+    return model, time.perf_counter() - start
+
+
+class ParallelSearch:
+    """Randomized search over every estimator family on a single process pool.
+
+    All (family, candidate, fold) fits are scheduled together, so a slow family
+    never leaves cores idle while a fast one finishes. Candidates come from
+    ParameterSampler and folds from check_cv with the same seeds as
+    RandomizedSearchCV, so the selected parameters and scores match the serial search.
+
+    With a TrialStore every fold score is recorded as soon as it finishes and fits
+    already in the store are not scheduled again. With one job the fits run in this
+    process, in order, so even a serial search is checkpointed fit by fit.
+    """
+    def __init__(self, n_jobs=None, random_state=42, trial_store=None, run_id=None):
+        self.n_jobs = os.cpu_count() if n_jobs is None or n_jobs < 0 else n_jobs
+        self.random_state = random_state
+        self.trial_store = trial_store
+        self.run_id = run_id
+
+    def _completed(self, pool, function, tasks):
+        # yields (key, result) as each task finishes, running them in this process without a pool
+        if pool is None:
+            for key, args in tasks:
+                yield key, function(*args)
+            return
+        futures = {pool.submit(function, *args): key for key, args in tasks}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def search(self, estimators, Xtrain, ytrain, Xtest, ytest, cv=5, n_iter=30):
+        folds = list(check_cv(cv).split(Xtrain, ytrain))
+        candidates = {name: list(ParameterSampler(config["params"], n_iter=n_iter, random_state=self.random_state))
+                      for name, config in estimators.items()}
+
+        scores = {name: np.full((len(candidates[name]), len(folds)), np.nan) for name in estimators}
+        fit_times = {name: np.zeros((len(candidates[name]), len(folds))) for name in estimators}
+        fit_seconds = {name: 0.0 for name in estimators}
+        finished_at = {}
+
+        # fits finished by an earlier (possibly interrupted) run of the same search are reused
+        search_keys, stored = {}, {}
+        if self.trial_store is not None:
+            data_key = data_hash(Xtrain, ytrain)
+            for name, config in estimators.items():
+                search_keys[name] = search_key(config["estimator"], data_key, check_cv(cv))
+                stored.update(self.trial_store.completed(search_keys[name]))
+
+        tasks = []
+        reused = 0
+        for name, config in estimators.items():
+            for i, params in enumerate(candidates[name]):
+                trial = params_key(params) if stored else None
+                for k, (train_idx, val_idx) in enumerate(folds):
+                    if (name, trial, k) in stored:
+                        scores[name][i, k], fit_times[name][i, k] = stored[(name, trial, k)]
+                        fit_seconds[name] += fit_times[name][i, k]
+                        reused += 1
+                        continue
+                    tasks.append(((name, i, k), (config["estimator"], params, train_idx, val_idx)))
+
+        start = time.perf_counter()
+        if self.n_jobs > 1:
+            pool = ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker, initargs=(Xtrain, ytrain))
+        else:
+            pool = None
+            _init_worker(Xtrain, ytrain)
+        try:
+            logging.info(f"Scheduled {len(tasks)} cross-validation fits on {self.n_jobs} workers"
+                         f" ({reused} reused from the trial store).")
+            for (name, i, k), (score, seconds) in self._completed(pool, _fit_and_score, tasks):
+                scores[name][i, k], fit_times[name][i, k] = score, seconds
+                fit_seconds[name] += seconds
+                finished_at[name] = time.perf_counter() - start
+                if self.trial_store is not None:
+                    self.trial_store.record(self.run_id, search_keys[name], name, candidates[name][i], k, score, seconds)
+
+            # refit each family's best candidate on the full training data
+            best_indices = {}
+            refits = []
+            for name, config in estimators.items():
+                mean_scores = scores[name].mean(axis=1)
+                if np.all(np.isnan(mean_scores)):
+                    raise ValueError(f"All candidate fits failed for {name}.")
+                best_indices[name] = int(np.nanargmax(mean_scores))
+                refits.append((name, (config["estimator"], candidates[name][best_indices[name]])))
+
+            best_estimators = {}
+            for name, (best_estimator, refit_seconds) in self._completed(pool, _refit, refits):
+                best_estimators[name] = best_estimator
+                fit_seconds[name] += refit_seconds
+                finished_at[name] = time.perf_counter() - start
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            _worker_data.clear()
+
+        results = []
+        for name in estimators:
+            mean_scores = scores[name].mean(axis=1)
+            best_index = best_indices[name]
+            cv_results = {"params": candidates[name],
+                          "mean_fit_time": fit_times[name].mean(axis=1),
+                          "mean_test_score": mean_scores,
+                          "std_test_score": scores[name].std(axis=1),
+                          "rank_test_score": self._rank(mean_scores)}
+            for k in range(len(folds)):
+                cv_results[f"split{k}_test_score"] = scores[name][:, k]
+
+            results.append({"name": name,
+                            "best_estimator": best_estimators[name],
+                            "validation_score": mean_scores[best_index],
+                            "test_score": best_estimators[name].score(Xtest, ytest),
+                            "cv_results": cv_results,
+                            "fit_seconds": fit_seconds[name],
+                            "wall_seconds": finished_at[name]})
+
+        return results
+
+    @staticmethod
+    def _rank(mean_scores):
+        # rank 1 is best, failed (nan) candidates rank last, ties share the lowest rank
+        filled = np.where(np.isnan(mean_scores), -np.inf, mean_scores)
+        order = np.sort(filled)[::-1]
+        return np.searchsorted(-order, -filled, side="left") + 1
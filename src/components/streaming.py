@@ -0,0 +1,149 @@
+# Out-of-core helpers for chunked ingestion and preprocessing.
+# Memory stays bounded by the chunk size plus fixed-size per-column state.
+import numpy as np
+import pandas as pd
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def hash_split_mask(chunk, test_size, random_state):
+    """Boolean mask of rows assigned to the test split.
+
+    The assignment depends only on each row's content and the seed, so it is the
+    same regardless of chunk boundaries or row order.
+    """
+    hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy(dtype=np.uint64)
+    # splitmix64 finalizer, salted with the seed
+    with np.errstate(over="ignore"):
+        mixed = hashes + np.uint64(random_state) * _GOLDEN
+        mixed = (mixed ^ (mixed >> np.uint64(30))) * _MIX_1
+        mixed = (mixed ^ (mixed >> np.uint64(27))) * _MIX_2
+        mixed = mixed ^ (mixed >> np.uint64(31))
+    fraction = (mixed >> np.uint64(11)).astype(np.float64) / float(2 ** 53)
+    return fraction < test_size
+
+
+class RunningStats:
+    """Count, mean and sum of squared deviations per column, merged chunk by chunk (Chan et al.)."""
+    def __init__(self, n_columns):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    def update(self, values):
+        # values is (n_rows, n_columns) with NaN for missing entries
+        count = np.sum(~np.isnan(values), axis=0).astype(np.float64)
+        safe_count = np.where(count > 0, count, 1.0)
+        mean = np.nansum(values, axis=0) / safe_count
+        m2 = np.nansum((values - mean) ** 2, axis=0)
+        self.merge(count, mean, m2)
+
+    def merge(self, count, mean, m2):
+        total = self.count + count
+        safe_total = np.where(total > 0, total, 1.0)
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / safe_total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / safe_total
+        self.count = total
+
+    @property
+    def variance(self):
+        return self.m2 / np.where(self.count > 0, self.count, 1.0)
+
+
+class ReservoirSample:
+    """Uniform fixed-size sample of a column's non-missing values, for approximate medians.
+
+    The median is exact while the column has no more values than the reservoir holds.
+    """
+    def __init__(self, size, random_state):
+        self.size = size
+        self.values = np.empty(0)
+        self.seen = 0
+        self._rng = np.random.default_rng(random_state)
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        free = max(self.size - len(self.values), 0)
+        if free:
+            self.values = np.concatenate([self.values, values[:free]])
+        rest = values[free:]
+        if len(rest):
+            # algorithm R: the t-th value replaces a random slot with probability size / t
+            positions = self.seen + free + np.arange(1, len(rest) + 1)
+            slots = self._rng.integers(0, positions)
+            keep = slots < self.size
+            for slot, value in zip(slots[keep], rest[keep]):
+                self.values[slot] = value
+        self.seen += len(values)
+
+    def median(self):
+        return float(np.median(self.values)) if len(self.values) else np.nan
+
+
+class StreamingPreprocessorFitter:
+    """Incrementally fits the DataTransformation preprocessor (median imputer -> standard
+    scaler for numerical features, most-frequent imputer -> one-hot encoder for categorical
+    features) and emits compiled preprocessor params (see src.pipeline.compiled_inference).
+    """
+    def __init__(self, numerical_features, categorical_features,
+                 numerical_name="numerical_pipeline", categorical_name="categorical_pipeline",
+                 median_sample_size=100_000, random_state=42):
+        self.numerical_features = list(numerical_features)
+        self.categorical_features = list(categorical_features)
+        self.numerical_name = numerical_name
+        self.categorical_name = categorical_name
+        self.stats = RunningStats(len(self.numerical_features))
+        self.missing = np.zeros(len(self.numerical_features))
+        self.samples = [ReservoirSample(median_sample_size, random_state + i)
+                        for i in range(len(self.numerical_features))]
+        self.category_counts = [dict() for _ in self.categorical_features]
+        self.n_rows = 0
+
+    def partial_fit(self, chunk):
+        values = chunk[self.numerical_features].to_numpy(dtype=np.float64)
+        self.stats.update(values)
+        self.missing += np.isnan(values).sum(axis=0)
+        for j, sample in enumerate(self.samples):
+            sample.update(values[:, j])
+
+        for counts, column in zip(self.category_counts, self.categorical_features):
+            for category, count in chunk[column].value_counts(dropna=True).items():
+                # categorical columns also count the vocabulary values absent from the chunk
+                if count:
+                    counts[category] = counts.get(category, 0) + int(count)
+
+        self.n_rows += len(chunk)
+        return self
+
+    def params(self):
+        medians = np.array([sample.median() for sample in self.samples])
+
+        # the scaler is fitted on imputed values, so fold the imputed medians into the moments
+        stats = RunningStats(len(self.numerical_features))
+        stats.merge(self.stats.count, self.stats.mean, self.stats.m2)
+        stats.merge(self.missing, medians, np.zeros(len(medians)))
+        scale = np.sqrt(stats.variance)
+        scale[scale < 10 * np.finfo(np.float64).eps] = 1.0
+
+        # most frequent value, ties broken by the smallest value as SimpleImputer does
+        fills = [min(counts, key=lambda category: (-counts[category], category)) for counts in self.category_counts]
+        categories = [sorted(counts) for counts in self.category_counts]
+
+        feature_names = [f"{self.numerical_name}__{column}" for column in self.numerical_features]
+        for column, column_categories in zip(self.categorical_features, categories):
+            feature_names += [f"{self.categorical_name}__{column}_{category}" for category in column_categories]
+
+        return {"blocks": [{"kind": "numeric",
+                            "columns": self.numerical_features,
+                            "fill": medians,
+                            "mean": stats.mean,
+                            "scale": scale},
+                           {"kind": "onehot",
+                            "columns": self.categorical_features,
+                            "fill": fills,
+                            "categories": categories,
+                            "handle_unknown": "error"}],
+                "feature_names": feature_names}
@@ -0,0 +1,177 @@
+# Persistent store of cross-validation trials.
+# Every (family, params, fold) fit is written to SQLite as soon as it finishes, keyed by a
+# search key that covers the training data, the fold layout and the base estimator. A rerun
+# with the same key reuses finished trials, so an interrupted search resumes where it stopped,
+# and trials from every run can be queried afterwards.
+#
+#     python -m src.components.trial_store --family "Random Forest" --top 10
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    info TEXT
+);
+CREATE TABLE IF NOT EXISTS trials (
+    search_key TEXT NOT NULL,
+    family TEXT NOT NULL,
+    params TEXT NOT NULL,
+    fold INTEGER NOT NULL,
+    score REAL,
+    fit_seconds REAL NOT NULL,
+    run_id TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (search_key, family, params, fold)
+);
+CREATE INDEX IF NOT EXISTS trials_by_family ON trials (family, search_key);
+"""
+
+
+@dataclass
+class TrialStoreConfig:
+    store_path: str = os.path.join("artifacts", "trials.sqlite")
+
+
+def _plain(value):
+    # numpy scalars from scipy.stats samplers serialize as plain numbers
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
+
+
+def params_key(params):
+    """Canonical JSON of a candidate's parameters."""
+    return json.dumps(params, sort_keys=True, default=_plain)
+
+
+def data_hash(*arrays):
+    """Hash of dense or CSR arrays, including their shapes and dtypes."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        parts = [array.data, array.indices, array.indptr] if hasattr(array, "indptr") else [np.asarray(array)]
+        for part in parts:
+            part = np.ascontiguousarray(part)
+            digest.update(f"{part.dtype}{part.shape}".encode())
+            digest.update(part.view(np.uint8).reshape(-1))
+    return digest.hexdigest()
+
+
+def search_key(estimator, data_key, cv_splitter):
+    """Trials can only be reused for the same base estimator, training data and folds."""
+    payload = {"estimator": type(estimator).__name__,
+               "params": json.loads(params_key(estimator.get_params(deep=False))),
+               "data": data_key,
+               "cv": repr(cv_splitter)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class TrialStore:
+    def __init__(self, config=None):
+        self.store_config = TrialStoreConfig() if config is None else config
+        os.makedirs(os.path.dirname(self.store_config.store_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.store_config.store_path, check_same_thread=False)
+        # WAL keeps finished trials durable without a full sync per insert
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    def start_run(self, **info):
+        run_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            self._connection.execute("INSERT INTO runs VALUES (?, ?, NULL, 'running', ?)",
+                                     (run_id, time.time(), json.dumps(info, default=_plain)))
+            self._connection.commit()
+        return run_id
+
+    def finish_run(self, run_id, status="finished", **info):
+        with self._lock:
+            previous = self._connection.execute("SELECT info FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            info = {**json.loads(previous[0] or "{}"), **info} if previous else info
+            self._connection.execute("UPDATE runs SET finished_at = ?, status = ?, info = ? WHERE run_id = ?",
+                                     (time.time(), status, json.dumps(info, default=_plain), run_id))
+            self._connection.commit()
+
+    def completed(self, key):
+        """{(family, params_key, fold): (score, fit_seconds)} of the finished trials for a search key."""
+        with self._lock:
+            rows = self._connection.execute("SELECT family, params, fold, score, fit_seconds FROM trials "
+                                            "WHERE search_key = ?", (key,)).fetchall()
+        # failed fits are stored as NULL and reused as NaN, like RandomizedSearchCV's error_score
+        return {(family, params, fold): (np.nan if score is None else score, fit_seconds)
+                for family, params, fold, score, fit_seconds in rows}
+
+    def record(self, run_id, key, family, params, fold, score, fit_seconds):
+        score = None if score is None or np.isnan(score) else float(score)
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                     (key, family, params_key(params), int(fold), score, float(fit_seconds),
+                                      run_id, time.time()))
+            self._connection.commit()
+
+    def runs(self):
+        with self._lock:
+            return pd.read_sql_query("SELECT * FROM runs ORDER BY started_at", self._connection)
+
+    def trials(self, family=None, run_id=None):
+        """Every stored fit, optionally for one family or the run that computed it."""
+        query, args = "SELECT * FROM trials WHERE 1 = 1", []
+        if family is not None:
+            query, args = query + " AND family = ?", args + [family]
+        if run_id is not None:
+            query, args = query + " AND run_id = ?", args + [run_id]
+        with self._lock:
+            return pd.read_sql_query(query + " ORDER BY finished_at", self._connection, params=args)
+
+    def candidates(self, family=None):
+        """Mean and spread of the fold scores of every stored candidate, best first."""
+        trials = self.trials(family=family)
+        if trials.empty:
+            return trials
+        summary = (trials.groupby(["search_key", "family", "params"])
+                   .agg(folds=("fold", "count"), mean_score=("score", "mean"), std_score=("score", "std"),
+                        fit_seconds=("fit_seconds", "sum"), runs=("run_id", "nunique"), last_finished_at=("finished_at", "max"))
+                   .reset_index())
+        return summary.sort_values("mean_score", ascending=False, na_position="last").reset_index(drop=True)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the best stored search candidates across runs.")
+    parser.add_argument("--store", default=TrialStoreConfig.store_path)
+    parser.add_argument("--family")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    store = TrialStore(TrialStoreConfig(store_path=args.store))
+    runs = store.runs().tail(args.top)
+    candidates = store.candidates(family=args.family).head(args.top)
+    for frame, columns in [(runs, ["started_at", "finished_at"]), (candidates, ["last_finished_at"])]:
+        for column in columns:
+            if column in frame:
+                frame[column] = pd.to_datetime(frame[column], unit="s").dt.strftime("%Y-%m-%d %H:%M:%S")
+    with pd.option_context("display.max_colwidth", 120, "display.width", 200):
+        print(runs.to_string(index=False))
+        print(candidates.drop(columns="search_key", errors="ignore").to_string(index=False))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
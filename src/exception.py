@@ -17,4 +17,16 @@ class CustomException(Exception):
 
     def __str__(self):
         return self.error_message
+
+    def __reduce__(self):
+        # the traceback does not cross process boundaries (e.g. from a ProcessPoolExecutor worker),
+        # so the exception is pickled as its formatted message
+        return (_restore_custom_exception, (self.error_message,))
+
+
+def _restore_custom_exception(error_message):
+    error = CustomException.__new__(CustomException)
+    Exception.__init__(error, error_message)
+    error.error_message = error_message
+    return error
     
\ No newline at end of file
@@ -0,0 +1,214 @@
+# Per-stage instrumentation
+# Each instrumented stage emits one JSON line with its wall time, CPU time, memory
+# figures and the rows/bytes it processed, so runs can be aggregated afterwards.
+# cProfile or tracemalloc can be switched on for individual stages by name.
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import functools
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from src.logger import logging, async_handler, flush_logs
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+
+def _env_list(name):
+    return [item for item in os.environ.get(name, "").split(",") if item]
+
+
+@dataclass
+class InstrumentationConfig:
+    enabled: bool = os.environ.get("STAGE_METRICS", "1") != "0"
+    metrics_path: str = os.path.join("artifacts", "stage_metrics.jsonl")
+    # stage names to run under cProfile / tracemalloc, e.g. PROFILE_STAGES=model_search
+    profile_stages: list = field(default_factory=lambda: _env_list("PROFILE_STAGES"))
+    trace_memory_stages: list = field(default_factory=lambda: _env_list("TRACE_MEMORY_STAGES"))
+    profile_dir: str = os.path.join("artifacts", "profiles")
+    profile_top_n: int = 25
+
+
+instrumentation_config = InstrumentationConfig()
+
+# records go through their own logger so they never mix with the text log, and are written
+# by a background listener like every other log record
+metrics_logger = logging.getLogger("stage_metrics")
+metrics_logger.propagate = False
+metrics_logger.setLevel(logging.INFO)
+
+_handler_lock = threading.Lock()
+_active_stages = contextvars.ContextVar("active_stages", default=())
+_profiler_lock = threading.Lock()  # only one cProfile profiler can run at a time
+
+
+def _metrics_handler():
+    path = os.path.abspath(instrumentation_config.metrics_path)
+    with _handler_lock:
+        for handler in metrics_logger.handlers:
+            if getattr(handler, "log_path", None) == path:
+                return handler
+        # appended whole lines are shared by every process of a run, so the file is never rotated
+        handler = async_handler(path, formatter=logging.Formatter("%(message)s"), max_bytes=0)
+        metrics_logger.addHandler(handler)
+        return handler
+
+
+def peak_rss_bytes():
+    """High-water mark of the process's resident set size, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def rss_bytes():
+    """Current resident set size, or None where unsupported."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def data_bytes(data):
+    """Best-effort in-memory size of a DataFrame, array, sparse matrix or TransformedData."""
+    if hasattr(data, "memory_usage"):
+        return int(data.memory_usage(index=True, deep=True).sum())
+    if hasattr(data, "indptr"):
+        return int(data.data.nbytes + data.indices.nbytes + data.indptr.nbytes)
+    if hasattr(data, "nbytes"):
+        return int(data.nbytes)
+    if hasattr(data, "X") and hasattr(data, "y"):
+        return data_bytes(data.X) + data_bytes(data.y)
+    return None
+
+
+def record_counts(rows=None, bytes=None, **fields):
+    """Add rows/bytes processed (and any extra fields) to the innermost active stage.
+
+    A no-op outside an instrumented stage, so components can call it unconditionally.
+    """
+    stages = _active_stages.get()
+    if not stages:
+        return
+    record = stages[-1]
+    if rows is not None:
+        record["rows"] = (record["rows"] or 0) + int(rows)
+    if bytes is not None:
+        record["bytes"] = (record["bytes"] or 0) + int(bytes)
+    record.update(fields)
+
+
+def _profile_summary(profiler, stage_name):
+    os.makedirs(instrumentation_config.profile_dir, exist_ok=True)
+    profile_path = os.path.join(instrumentation_config.profile_dir,
+                                f"{stage_name.replace('/', '_')}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.prof")
+    profiler.dump_stats(profile_path)
+    stats = pstats.Stats(profile_path)
+    stats.sort_stats("cumulative")
+    top = []
+    for (filename, line, function), (_, calls, _, cumulative, _) in list(stats.stats.items()):
+        top.append({"function": f"{os.path.basename(filename)}:{line}({function})", "calls": calls,
+                    "cumulative_seconds": round(cumulative, 6)})
+    top.sort(key=lambda entry: entry["cumulative_seconds"], reverse=True)
+    return profile_path, top[:instrumentation_config.profile_top_n]
+
+
+def _tracemalloc_summary(snapshot):
+    top = snapshot.statistics("lineno")[:instrumentation_config.profile_top_n]
+    return [{"location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+             "bytes": stat.size, "count": stat.count} for stat in top]
+
+
+@contextmanager
+def stage(name, **fields):
+    """Instrument a block as the stage `name`; extra `fields` are copied into its record.
+
+    Yields the record dict, which the block (or record_counts) can add to.
+    """
+    config = instrumentation_config
+    if not config.enabled:
+        yield {}
+        return
+
+    record = {"stage": name, "pid": os.getpid(), "started_at": time.time(), "status": "ok",
+              "rows": None, "bytes": None, **fields}
+    profiler = None
+    if name in config.profile_stages and _profiler_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+    trace_memory = name in config.trace_memory_stages and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
+
+    token = _active_stages.set(_active_stages.get() + (record,))
+    rss_start, peak_start = rss_bytes(), peak_rss_bytes()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    except BaseException as err:
+        record["status"] = "error"
+        record["error"] = f"{type(err).__name__}: {err}"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall_seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+        _active_stages.reset(token)
+
+        rss_end, peak_end = rss_bytes(), peak_rss_bytes()
+        record.update({"wall_seconds": round(wall_seconds, 6),
+                       # process CPU time, so threads running concurrently are included
+                       "cpu_seconds": round(cpu_seconds, 6),
+                       "rss_bytes": rss_end,
+                       "rss_delta_bytes": None if rss_start is None else rss_end - rss_start,
+                       "peak_rss_bytes": peak_end,
+                       # > 0 only when this stage raised the process high-water mark
+                       "peak_rss_growth_bytes": None if peak_start is None else peak_end - peak_start})
+        if record["rows"] and wall_seconds > 0:
+            record["rows_per_second"] = round(record["rows"] / wall_seconds, 2)
+
+        if profiler is not None:
+            record["profile_path"], record["profile_top"] = _profile_summary(profiler, name)
+            _profiler_lock.release()
+        if trace_memory:
+            _, traced_peak = tracemalloc.get_traced_memory()
+            record["traced_peak_bytes"] = traced_peak
+            record["tracemalloc_top"] = _tracemalloc_summary(tracemalloc.take_snapshot())
+            tracemalloc.stop()
+
+        _metrics_handler()
+        metrics_logger.info(json.dumps(record, default=str))
+
+
+def instrumented(name):
+    """Decorator form of `stage` for functions and methods."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load_stage_metrics(path=None):
+    """Read the JSON-lines records back as a DataFrame for aggregation."""
+    import pandas as pd
+    path = instrumentation_config.metrics_path if path is None else path
+    flush_logs()
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
@@ -1,16 +1,203 @@
 # Logging
+# Records are put on an in-memory queue by the calling thread and written to disk
+# by a background listener in batches, so logging never blocks on file I/O.
+#
+# Environment:
+#   LOG_DIR          - base directory (default ./logs)
+#   LOG_RUN_ID       - run directory name; inherited by child processes so a run shares one
+#                      location (default: timestamp of the first process that imports this module)
+#   LOG_LEVEL        - DEBUG, INFO, WARNING, ... (default INFO)
+#   LOG_MAX_BYTES    - rotate a log file at this size (default 10 MiB)
+#   LOG_BACKUP_COUNT - rotated files kept (default 5)
+#   LOG_QUEUE_SIZE   - records buffered before new ones are dropped (default 100000)
 import os
+import queue
+import atexit
 import logging
+import threading
+import multiprocessing.util
 from datetime import datetime
+from logging.handlers import QueueHandler, RotatingFileHandler
 
-LOG_FILE=f'{datetime.now().strftime("%m_%d_%Y_%H_%M_%S")}.log'
-logs_path = os.path.join(os.getcwd(), "logs" , LOG_FILE)
-os.makedirs(logs_path, exist_ok=True)
+LOG_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
 
-LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
+LOG_DIR = os.environ.get("LOG_DIR", os.path.join(os.getcwd(), "logs"))
+# one directory per run, shared by every process of the run (each process writes its own file in it)
+RUN_ID = os.environ.setdefault("LOG_RUN_ID", datetime.now().strftime("%m_%d_%Y_%H_%M_%S"))
+RUN_PID = os.environ.setdefault("LOG_RUN_PID", str(os.getpid()))
+logs_path = os.path.join(LOG_DIR, RUN_ID)
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-    )
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 ** 2))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 5))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 100_000))
+LOG_BATCH_SIZE = 512
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that leaves flushing to the caller, so a batch of records costs one flush."""
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BatchingQueueListener:
+    """Background thread that writes queued records to its handlers, draining up to `batch_size`
+    waiting records per wake-up and flushing once per batch (like QueueListener with
+    respect_handler_level=True)."""
+    _sentinel = None
+
+    def __init__(self, log_queue, *handlers, batch_size=LOG_BATCH_SIZE):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._write_batches, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write out the records queued so far and stop the thread."""
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+
+    def handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _write_batches(self):
+        log_queue = self.queue
+        while True:
+            batch = [log_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+                log_queue.task_done()
+            for handler in self.handlers:
+                handler.flush()
+            if stop:
+                break
+
+
+_handlers = []
+_handlers_lock = threading.Lock()
+
+
+def log_file_path(name=None):
+    # processes of the same run share the run directory, each writing to its own file so rotation never races
+    name = name or ("main" if str(os.getpid()) == RUN_PID else f"worker_{os.getpid()}")
+    return os.path.join(logs_path, f"{name}.log")
+
+
+def _start_listener(queue_handler):
+    os.makedirs(os.path.dirname(queue_handler.log_path) or ".", exist_ok=True)
+    file_handler = BufferedRotatingFileHandler(queue_handler.log_path, maxBytes=queue_handler.max_bytes,
+                                               backupCount=queue_handler.backup_count, delay=True)
+    file_handler.setFormatter(queue_handler.file_formatter)
+    queue_handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler.listener = BatchingQueueListener(queue_handler.queue, file_handler)
+    queue_handler.listener.start()
+
+
+def async_handler(path=None, formatter=None, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+    """Return a QueueHandler whose records are written to `path` by a background batching listener.
+
+    Without `path` each process writes its own file in the run directory. `max_bytes=0` disables rotation.
+    """
+    queue_handler = DroppingQueueHandler(None)
+    queue_handler.per_process = path is None
+    queue_handler.log_path = log_file_path() if path is None else path
+    queue_handler.file_formatter = formatter or logging.Formatter(LOG_FORMAT)
+    queue_handler.max_bytes = max_bytes
+    queue_handler.backup_count = backup_count
+    _start_listener(queue_handler)
+    with _handlers_lock:
+        _handlers.append(queue_handler)
+    return queue_handler
+
+
+def flush_logs():
+    """Block until every record queued so far has been written."""
+    with _handlers_lock:
+        handlers = list(_handlers)
+    for queue_handler in handlers:
+        if queue_handler.listener.running:
+            queue_handler.queue.join()
+
+
+def stop_listeners():
+    """Write out every queued record and stop the background listeners."""
+    with _handlers_lock:
+        handlers = list(_handlers)
+    for queue_handler in handlers:
+        listener = queue_handler.listener
+        if listener.running:
+            listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _reinit_after_fork():
+    # listener threads do not survive a fork: give each handler a fresh queue and listener in the child
+    for queue_handler in _handlers:
+        if queue_handler.per_process:
+            queue_handler.log_path = log_file_path()
+        _start_listener(queue_handler)
+
+
+def _flush_at_process_exit(_):
+    # forked multiprocessing children leave through os._exit, which skips atexit; their exit
+    # function runs the finalizers registered here instead
+    multiprocessing.util.Finalize(None, stop_listeners, exitpriority=0)
+
+
+def set_level(level):
+    logging.getLogger().setLevel(level.upper() if isinstance(level, str) else level)
+
+
+root_handler = async_handler()
+LOG_FILE_PATH = root_handler.log_path
+logging.getLogger().addHandler(root_handler)
+set_level(LOG_LEVEL)
+atexit.register(stop_listeners)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+# not part of the hook above: multiprocessing clears its finalizer registry in a forked child
+# after os.register_at_fork hooks have run, then calls its own after-fork hooks (keyed on an
+# object that lives as long as the process, here the root handler)
+multiprocessing.util.register_after_fork(root_handler, _flush_at_process_exit)
@@ -0,0 +1,237 @@
+# Offline bulk scoring of CSV/Parquet extracts.
+# The input is read in chunks and each chunk is scored by a process pool worker, which writes
+# its predictions to a numbered part file. Finished parts survive a crash, so a rerun only
+# scores the missing chunks; the parts are then joined in chunk order into the output file.
+#
+#     python -m src.pipeline.batch_scoring extract.csv scores.csv --chunk-size 100000 --workers 8
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+
+# logging and exception
+from src.logger import logging
+from src.exception import CustomException
+from src.instrumentation import stage, record_counts
+
+from src.components.datastore import infer_format, require_format
+from src.components.dataset_schema import read_dtypes, apply_schema
+from src.pipeline.predict_pipeline import PredictPipeline, feature_columns
+
+MANIFEST_FILE = "manifest.json"
+
+
+@dataclass
+class BatchScoringConfig:
+    chunk_size: int = int(os.environ.get("BATCH_SCORING_CHUNK_SIZE", 100_000))
+    n_workers: int = int(os.environ.get("BATCH_SCORING_WORKERS", os.cpu_count() or 1))
+    # input columns copied next to the prediction, None copies every column
+    keep_columns: list = None
+    prediction_column: str = "prediction"
+    # chunks read ahead of the workers, per worker; bounds memory to roughly this many chunks each
+    chunks_in_flight_per_worker: int = 2
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrames of at most `chunk_size` rows from a CSV or Parquet file."""
+    fmt = infer_format(path)
+    if fmt == "csv":
+        for chunk in pd.read_csv(path, chunksize=chunk_size, dtype=read_dtypes()):
+            yield apply_schema(chunk)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield apply_schema(batch.to_pandas())
+    else:
+        raise ValueError(f"Batch scoring reads csv or parquet files, not {fmt}.")
+
+
+# one pipeline per worker process, loaded by the pool initializer
+_pipeline = None
+
+
+def _init_worker():
+    global _pipeline
+    _pipeline = PredictPipeline()
+    _pipeline.warm()
+
+
+def _score_chunk(index, chunk, part_path, keep_columns, prediction_column):
+    start = time.perf_counter()
+    features = PredictPipeline.records_to_df(chunk)
+    artifacts = _pipeline.artifacts()
+    predictions = _pipeline.predict_transformed(_pipeline.transform(features, artifacts), artifacts).astype(int)
+
+    output = chunk if keep_columns is None else chunk[keep_columns]
+    output = output.assign(**{prediction_column: predictions})
+    # the part only becomes visible once complete, so a crash never leaves a truncated part behind
+    tmp_path = part_path + ".tmp"
+    if part_path.endswith(".parquet"):
+        output.to_parquet(tmp_path, index=False)
+    else:
+        output.to_csv(tmp_path, index=False, header=False)
+    os.replace(tmp_path, part_path)
+    return index, len(chunk), time.perf_counter() - start
+
+
+class BatchScoring:
+    def __init__(self, config=None):
+        self.scoring_config = BatchScoringConfig() if config is None else config
+
+    @staticmethod
+    def parts_dir(output_path):
+        return output_path + ".parts"
+
+    def _manifest(self, input_path, output_path):
+        stat = os.stat(input_path)
+        config = self.scoring_config
+        # parts are only reusable for the same input, chunking, output layout and model
+        return {"input_path": os.path.abspath(input_path),
+                "input_signature": [stat.st_mtime_ns, stat.st_size],
+                "output_format": infer_format(output_path),
+                "chunk_size": config.chunk_size,
+                "keep_columns": config.keep_columns,
+                "prediction_column": config.prediction_column,
+                "model_version": list(PredictPipeline().model_version())}
+
+    def _prepare_parts(self, input_path, output_path, resume):
+        parts_dir = self.parts_dir(output_path)
+        manifest = self._manifest(input_path, output_path)
+        manifest_path = os.path.join(parts_dir, MANIFEST_FILE)
+
+        if resume and os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                if json.load(f) == manifest:
+                    return parts_dir
+            logging.info("Input, settings or model changed since the interrupted run, scoring from scratch.")
+
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        os.makedirs(parts_dir)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        return parts_dir
+
+    @staticmethod
+    def _part_path(parts_dir, index, fmt):
+        return os.path.join(parts_dir, f"part-{index:06d}.{fmt}")
+
+    def _merge_parts(self, parts_dir, n_chunks, output_path, columns, fmt):
+        tmp_path = output_path + ".tmp"
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            writer = None
+            try:
+                for index in range(n_chunks):
+                    table = pq.read_table(self._part_path(parts_dir, index, fmt))
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, table.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            pd.DataFrame(columns=columns).to_csv(tmp_path, index=False)
+            with open(tmp_path, "ab") as output:
+                for index in range(n_chunks):
+                    with open(self._part_path(parts_dir, index, fmt), "rb") as part:
+                        shutil.copyfileobj(part, output, 1 << 20)
+        os.replace(tmp_path, output_path)
+
+    def initiate_batch_scoring(self, input_path, output_path, resume=True):
+        """Score every row of `input_path` into `output_path`, keeping the input row order.
+
+        Returns a summary with row counts and rows/sec.
+        """
+        logging.info(f"Starting batch scoring of {input_path}...")
+        config = self.scoring_config
+        try:
+            with stage("batch_scoring", input_path=input_path, n_workers=config.n_workers):
+                start = time.perf_counter()
+                fmt = infer_format(output_path)
+                if fmt not in ("csv", "parquet"):
+                    raise ValueError(f"Batch scoring writes csv or parquet files, not {fmt}.")
+                # fail before any chunk is scored, not when the first part is written
+                require_format(fmt)
+                require_format(infer_format(input_path))
+                os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+                parts_dir = self._prepare_parts(input_path, output_path, resume)
+
+                n_chunks, columns = 0, None
+                skipped_chunks = skipped_rows = scored_rows = 0
+                pending = set()
+                max_pending = config.n_workers * config.chunks_in_flight_per_worker
+
+                def collect():
+                    nonlocal pending, scored_rows
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, n_rows, seconds = future.result()
+                        scored_rows += n_rows
+                        elapsed = time.perf_counter() - start
+                        logging.info(f"Scored chunk {index} ({n_rows} rows in {seconds:.2f}s), "
+                                     f"{scored_rows / elapsed:.0f} rows/sec overall.")
+
+                with ProcessPoolExecutor(max_workers=config.n_workers, initializer=_init_worker) as executor:
+                    for index, chunk in enumerate(read_chunks(input_path, config.chunk_size)):
+                        n_chunks = index + 1
+                        if columns is None:
+                            kept = list(chunk.columns) if config.keep_columns is None else config.keep_columns
+                            columns = kept + [config.prediction_column]
+                        part_path = self._part_path(parts_dir, index, fmt)
+                        if os.path.exists(part_path):
+                            skipped_chunks += 1
+                            skipped_rows += len(chunk)
+                            continue
+                        while len(pending) >= max_pending:
+                            collect()
+                        pending.add(executor.submit(_score_chunk, index, chunk, part_path,
+                                                    config.keep_columns, config.prediction_column))
+                    while pending:
+                        collect()
+
+                if columns is None:
+                    columns = (config.keep_columns or feature_columns) + [config.prediction_column]
+                self._merge_parts(parts_dir, n_chunks, output_path, columns, fmt)
+                shutil.rmtree(parts_dir)
+
+                seconds = time.perf_counter() - start
+                summary = {"input_path": input_path, "output_path": output_path,
+                           "rows": scored_rows + skipped_rows, "scored_rows": scored_rows,
+                           "resumed_rows": skipped_rows, "chunks": n_chunks, "resumed_chunks": skipped_chunks,
+                           "n_workers": config.n_workers, "seconds": round(seconds, 3),
+                           "rows_per_second": round(scored_rows / seconds, 1) if seconds > 0 else None}
+                record_counts(rows=scored_rows, resumed_rows=skipped_rows)
+
+            logging.info(f"Batch scoring finished: {summary}")
+            return summary
+
+        except Exception as err:
+            raise CustomException(err, sys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file with the saved preprocessor and regressor.")
+    parser.add_argument("input_path")
+    parser.add_argument("output_path")
+    parser.add_argument("--chunk-size", type=int, default=BatchScoringConfig.chunk_size)
+    parser.add_argument("--workers", type=int, default=BatchScoringConfig.n_workers)
+    parser.add_argument("--keep-columns", help="comma-separated input columns to copy to the output (default: all)")
+    parser.add_argument("--prediction-column", default=BatchScoringConfig.prediction_column)
+    parser.add_argument("--no-resume", action="store_true", help="discard parts left by an interrupted run")
+    args = parser.parse_args(argv)
+
+    config = BatchScoringConfig(chunk_size=args.chunk_size, n_workers=args.workers,
+                                keep_columns=args.keep_columns.split(",") if args.keep_columns else None,
+                                prediction_column=args.prediction_column)
+    summary = BatchScoring(config).initiate_batch_scoring(args.input_path, args.output_path, resume=not args.no_resume)
+    print(json.dumps(summary, indent=2))
+    return summary
+
+
+if __name__ == "__main__":
+    main()
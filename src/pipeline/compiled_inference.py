@@ -0,0 +1,426 @@
+# Lightweight, scikit-learn free inference artifacts.
+# Fitted sklearn objects are exported to plain NumPy arrays, lists and dicts at
+# training time, and evaluated here with NumPy only at serving time.
+import os
+import json
+import hashlib
+import mmap as mmap_module
+import pickle
+import struct
+import numpy as np
+
+# logging
+from src.logger import logging
+
+
+# Compiled artifact file layout: the pickle stream of the params (protocol 5) with every NumPy
+# array taken out of band, followed by the raw array buffers at 64-byte aligned offsets, then
+# a JSON footer with the offsets. Loading with mmap=True maps the file read-only and builds the
+# arrays directly on the mapped pages, so every process serving the same file shares one copy.
+COMPILED_MAGIC = b"CMPLD001"
+_ALIGNMENT = 64
+
+
+def save_compiled(params, path):
+    buffers = []
+    payload = pickle.dumps(params, protocol=5, buffer_callback=buffers.append)
+
+    # write a temporary file and swap it in: processes that mapped the old file keep its pages
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(COMPILED_MAGIC)
+        layout = {"pickle": [f.tell(), len(payload)], "buffers": []}
+        f.write(payload)
+        for buffer in buffers:
+            raw = buffer.raw()
+            f.write(b"\0" * (-f.tell() % _ALIGNMENT))
+            layout["buffers"].append([f.tell(), raw.nbytes])
+            f.write(raw)
+        footer = json.dumps(layout).encode()
+        f.write(footer)
+        f.write(struct.pack("<Q", len(footer)))
+        f.write(COMPILED_MAGIC)
+    os.replace(tmp_path, path)
+    return path
+
+
+def dump_joblib(obj, path):
+    """joblib.dump through a temporary file, so a serving process never loads a partly written artifact."""
+    import joblib
+    tmp_path = path + ".tmp"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_serving_manifest(manifest_path, **artifact_paths):
+    """Record which preprocessor and model files are served together, with their content hashes.
+
+    Written once a training run has replaced all of them; servers reload the artifacts as one
+    unit when the manifest changes, and only if the files still match it. Missing files are
+    recorded as None. An unchanged manifest is not rewritten, so servers do not reload.
+    """
+    manifest = {name: {"path": path, "sha256": file_hash(path)} if path is not None and os.path.exists(path) else None
+                for name, path in artifact_paths.items()}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                return manifest_path
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def load_compiled(path, mmap=False):
+    """Load compiled params; with `mmap` the arrays are read-only views of the mapped file."""
+    with open(path, "rb") as f:
+        if f.read(len(COMPILED_MAGIC)) != COMPILED_MAGIC:
+            # plain pickle written by earlier versions
+            f.seek(0)
+            return pickle.load(f)
+        if mmap:
+            data = memoryview(mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ))
+        else:
+            f.seek(0)
+            data = memoryview(f.read())
+
+    footer_length, = struct.unpack("<Q", data[-len(COMPILED_MAGIC) - 8:-len(COMPILED_MAGIC)])
+    footer_end = len(data) - len(COMPILED_MAGIC) - 8
+    layout = json.loads(bytes(data[footer_end - footer_length:footer_end]))
+    start, length = layout["pickle"]
+    buffers = [data[offset:offset + nbytes] for offset, nbytes in layout["buffers"]]
+    return pickle.loads(data[start:start + length], buffers=buffers)
+
+
+def compile_preprocessor(preprocessor):
+    """Export a fitted ColumnTransformer of imputer/scaler/one-hot pipelines to plain params.
+
+    Raises ValueError for any step or layout the compiled transform cannot reproduce exactly.
+    """
+    # a sparse ColumnTransformer output holds the same values, the compiled transform returns them dense
+    blocks = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        if transformer == "passthrough" or not hasattr(transformer, "steps"):
+            raise ValueError(f"Transformer '{name}' is not a supported pipeline.")
+
+        columns = list(columns)
+        steps = dict((type(step).__name__, step) for _, step in transformer.steps)
+        unsupported = set(steps) - {"SimpleImputer", "StandardScaler", "OneHotEncoder"}
+        if unsupported:
+            raise ValueError(f"Unsupported steps {sorted(unsupported)} in '{name}'.")
+
+        imputer = steps.get("SimpleImputer")
+        if imputer is not None and getattr(imputer, "add_indicator", False):
+            raise ValueError(f"Imputer missing indicators in '{name}' are not supported.")
+
+        if "OneHotEncoder" in steps:
+            encoder = steps["OneHotEncoder"]
+            if encoder.drop is not None or getattr(encoder, "_infrequent_enabled", False):
+                raise ValueError(f"OneHotEncoder drop/infrequent categories in '{name}' are not supported.")
+            if "StandardScaler" in steps:
+                raise ValueError(f"Scaling one-hot output in '{name}' is not supported.")
+            blocks.append({
+                "kind": "onehot",
+                "columns": columns,
+                "fill": None if imputer is None else imputer.statistics_.tolist(),
+                "categories": [categories.tolist() for categories in encoder.categories_],
+                "handle_unknown": encoder.handle_unknown,
+            })
+        else:
+            scaler = steps.get("StandardScaler")
+            n_columns = len(columns)
+            mean = np.zeros(n_columns)
+            scale = np.ones(n_columns)
+            if scaler is not None and scaler.with_mean:
+                mean = np.asarray(scaler.mean_, dtype=np.float64)
+            if scaler is not None and scaler.with_std:
+                scale = np.asarray(scaler.scale_, dtype=np.float64)
+            blocks.append({
+                "kind": "numeric",
+                "columns": columns,
+                "fill": None if imputer is None else np.asarray(imputer.statistics_, dtype=np.float64),
+                "mean": mean,
+                "scale": scale,
+            })
+
+    return {"blocks": blocks, "feature_names": preprocessor.get_feature_names_out().tolist()}
+
+
+def _is_missing(value):
+    # matches SimpleImputer(missing_values=np.nan): only NaN is missing, None is a category
+    return isinstance(value, float) and value != value
+
+
+class CompiledPreprocessor:
+    """Pure-NumPy equivalent of the fitted DataTransformation preprocessor."""
+    def __init__(self, params):
+        self.params = params
+        self.feature_names = params["feature_names"]
+        self.n_features = len(self.feature_names)
+        self.columns = [column for block in params["blocks"] for column in block["columns"]]
+        self._numeric_columns = {column for block in params["blocks"] if block["kind"] == "numeric"
+                                 for column in block["columns"]}
+
+        # precompute output offsets and category -> output column lookups
+        self._blocks = []
+        offset = 0
+        for block in params["blocks"]:
+            if block["kind"] == "numeric":
+                width = len(block["columns"])
+                self._blocks.append((block, offset, None))
+            else:
+                lookups = []
+                width = 0
+                for categories in block["categories"]:
+                    lookups.append({category: offset + width + i for i, category in enumerate(categories)})
+                    width += len(categories)
+                self._blocks.append((block, offset, lookups))
+            offset += width
+
+        if offset != self.n_features:
+            raise ValueError(f"Compiled blocks produce {offset} features, expected {self.n_features}.")
+
+    def _as_columns(self, features):
+        # accepts a single record dict, a list of record dicts, or a DataFrame
+        if isinstance(features, dict):
+            return {column: [features[column]] for column in self.columns}, 1
+        if hasattr(features, "columns"):
+            return {column: self._frame_column(column, features[column]) for column in self.columns}, len(features)
+        return {column: [record[column] for record in features] for column in self.columns}, len(features)
+
+    def _frame_column(self, column, values):
+        # categorical columns stay Series so the one-hot block can work on their codes, and numeric
+        # ones become float arrays, reading the pd.NA of nullable integer columns as NaN
+        if hasattr(values, "cat"):
+            return values
+        if column in self._numeric_columns and values.dtype.kind in "iuf":
+            return values.to_numpy(dtype=np.float64, na_value=np.nan)
+        return values.tolist()
+
+    @staticmethod
+    def _onehot_codes(transformed, values, lookup, fill, handle_unknown, column):
+        # output column per category code, with a trailing -1 that code -1 (missing) indexes
+        categories = values.cat.categories
+        positions = np.array([lookup.get(category, -1) for category in categories] + [-1], dtype=np.int64)
+        codes = values.cat.codes.to_numpy()
+        row_positions = positions[codes]
+        if fill is not None:
+            row_positions[codes == -1] = lookup.get(fill, -1)
+        known = row_positions != -1
+        if handle_unknown == "error" and not known.all():
+            code = codes[np.argmin(known)]
+            value = categories[code] if code != -1 else np.nan
+            raise ValueError(f"Found unknown category {value!r} in column '{column}'.")
+        rows = np.flatnonzero(known)
+        transformed[rows, row_positions[rows]] = 1.0
+
+    def transform(self, features):
+        columns, n_rows = self._as_columns(features)
+        transformed = np.zeros((n_rows, self.n_features), dtype=np.float64)
+
+        for block, offset, lookups in self._blocks:
+            if lookups is None:
+                width = len(block["columns"])
+                values = np.array([columns[column] for column in block["columns"]], dtype=np.float64).T
+                if block["fill"] is not None:
+                    values = np.where(np.isnan(values), block["fill"], values)
+                values -= block["mean"]
+                values /= block["scale"]
+                transformed[:, offset:offset + width] = values
+                continue
+
+            for j, (column, lookup) in enumerate(zip(block["columns"], lookups)):
+                if not isinstance(columns[column], list):
+                    fill = None if block["fill"] is None else block["fill"][j]
+                    self._onehot_codes(transformed, columns[column], lookup, fill, block["handle_unknown"], column)
+                    continue
+                for i, value in enumerate(columns[column]):
+                    if _is_missing(value) and block["fill"] is not None:
+                        value = block["fill"][j]
+                    index = lookup.get(value)
+                    if index is None:
+                        if block["handle_unknown"] == "error":
+                            raise ValueError(f"Found unknown category {value!r} in column '{column}'.")
+                        continue
+                    transformed[i, index] = 1.0
+
+        return transformed
+
+
+def _flatten_trees(trees):
+    # concatenate every tree's node arrays, shifting child indices by each tree's offset
+    children_left, children_right, feature, threshold, value, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        tree_ = tree.tree_
+        if tree_.n_outputs != 1:
+            raise ValueError("Only single-output trees are supported.")
+        left = tree_.children_left.astype(np.int64)
+        right = tree_.children_right.astype(np.int64)
+        children_left.append(np.where(left == -1, -1, left + offset))
+        children_right.append(np.where(right == -1, -1, right + offset))
+        feature.append(tree_.feature.astype(np.int64))
+        threshold.append(tree_.threshold.astype(np.float64))
+        value.append(tree_.value[:, 0, 0].astype(np.float64))
+        roots.append(offset)
+        offset += tree_.node_count
+        max_depth = max(max_depth, tree_.max_depth)
+
+    return {"children_left": np.concatenate(children_left),
+            "children_right": np.concatenate(children_right),
+            "feature": np.concatenate(feature),
+            "threshold": np.concatenate(threshold),
+            "value": np.concatenate(value),
+            "roots": np.asarray(roots, dtype=np.int64),
+            "max_depth": max_depth}
+
+
+def compile_model(model):
+    """Export a fitted LinearRegression, DecisionTree, RandomForest, GradientBoosting
+    or AdaBoost regressor to plain params. Raises ValueError for anything else."""
+    kind = type(model).__name__
+
+    if kind == "LinearRegression":
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        if coef.ndim != 1:
+            raise ValueError("Only single-output linear models are supported.")
+        return {"kind": "linear", "coef": coef, "intercept": float(model.intercept_)}
+
+    if kind == "DecisionTreeRegressor":
+        return {"kind": "trees", "aggregate": "sum", "init": 0.0, "scale": 1.0,
+                "trees": _flatten_trees([model])}
+
+    if kind == "RandomForestRegressor":
+        return {"kind": "trees", "aggregate": "mean", "init": 0.0, "scale": 1.0,
+                "trees": _flatten_trees(model.estimators_)}
+
+    if kind == "GradientBoostingRegressor":
+        if isinstance(model.init_, str):
+            init = 0.0  # init="zero"
+        elif hasattr(model.init_, "constant_"):
+            init = float(np.ravel(model.init_.constant_)[0])
+        else:
+            raise ValueError("Only constant (DummyRegressor) or zero init estimators are supported.")
+        return {"kind": "trees", "aggregate": "sum", "init": init, "scale": float(model.learning_rate),
+                "trees": _flatten_trees(model.estimators_[:, 0])}
+
+    if kind == "AdaBoostRegressor":
+        if any(type(estimator).__name__ != "DecisionTreeRegressor" for estimator in model.estimators_):
+            raise ValueError("Only decision tree AdaBoost base estimators are supported.")
+        n_estimators = len(model.estimators_)
+        return {"kind": "trees", "aggregate": "weighted_median", "init": 0.0, "scale": 1.0,
+                "weights": np.asarray(model.estimator_weights_[:n_estimators], dtype=np.float64),
+                "trees": _flatten_trees(model.estimators_)}
+
+    raise ValueError(f"Model type {kind} cannot be compiled.")
+
+
+class CompiledModel:
+    """NumPy-only evaluator for params produced by `compile_model`."""
+    def __init__(self, params):
+        self.params = params
+        self.kind = params["kind"]
+
+    @staticmethod
+    def _dense(X):
+        return X.toarray() if hasattr(X, "toarray") else X
+
+    def _leaf_values(self, X):
+        # walk every (row, tree) pair one level per iteration until all reach a leaf
+        trees = self.params["trees"]
+        children_left, children_right = trees["children_left"], trees["children_right"]
+        feature, threshold = trees["feature"], trees["threshold"]
+
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(self._dense(X), dtype=np.float32)
+        nodes = np.tile(trees["roots"], (X.shape[0], 1))
+        rows = np.arange(X.shape[0])[:, None]
+
+        for _ in range(trees["max_depth"]):
+            left = children_left[nodes]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = X[rows, feature[nodes]] <= threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, children_right[nodes]), nodes)
+
+        return trees["value"][nodes]
+
+    def predict(self, X):
+        if self.kind == "linear":
+            if hasattr(X, "toarray"):
+                return np.asarray(X @ self.params["coef"], dtype=np.float64) + self.params["intercept"]
+            return np.asarray(X, dtype=np.float64) @ self.params["coef"] + self.params["intercept"]
+
+        leaf_values = self._leaf_values(X)
+        aggregate = self.params["aggregate"]
+
+        if aggregate == "weighted_median":
+            # same weighted median as AdaBoostRegressor._get_median_predict
+            n_rows = leaf_values.shape[0]
+            sorted_idx = np.argsort(leaf_values, axis=1)
+            weight_cdf = np.cumsum(self.params["weights"][sorted_idx], axis=1, dtype=np.float64)
+            median_or_above = weight_cdf >= 0.5 * weight_cdf[:, -1][:, np.newaxis]
+            median_idx = median_or_above.argmax(axis=1)
+            median_estimators = sorted_idx[np.arange(n_rows), median_idx]
+            return leaf_values[np.arange(n_rows), median_estimators]
+
+        # accumulate stage by stage, in the same order as sklearn
+        prediction = np.full(leaf_values.shape[0], self.params["init"], dtype=np.float64)
+        scale = self.params["scale"]
+        for stage in range(leaf_values.shape[1]):
+            prediction += scale * leaf_values[:, stage]
+        if aggregate == "mean":
+            prediction /= leaf_values.shape[1]
+        return prediction
+
+
+def compile_with_parity(model, X):
+    """`compile_model(model)` if the compiled params reproduce `model.predict(X)`, else None.
+
+    This is the parity check between the sklearn and compiled predictions.
+    """
+    try:
+        params = compile_model(model)
+        compiled_prediction = CompiledModel(params).predict(X)
+        expected = np.asarray(model.predict(X), dtype=np.float64).ravel()
+        # models fitted on float32 features carry float32 coefficients
+        tolerance = 1e-9 if getattr(X, "dtype", np.float64) == np.float64 else 1e-5
+        if not np.allclose(compiled_prediction, expected, rtol=tolerance, atol=tolerance):
+            max_error = float(np.max(np.abs(compiled_prediction - expected)))
+            logging.info(f"Compiled model differs from sklearn (max abs error {max_error}); not exporting it.")
+            return None
+    except ValueError as err:
+        logging.info(f"Model cannot be compiled ({err}); serving will use sklearn.")
+        return None
+    return params
+
+
+def export_compiled_model(model, X, compiled_path):
+    """Save `compile_model(model)` to `compiled_path` if it reproduces `model.predict(X)`.
+
+    On a parity mismatch (or an unsupported model) any stale compiled artifact is
+    removed so serving falls back to the sklearn model.
+    """
+    params = compile_with_parity(model, X)
+    if params is None:
+        if os.path.exists(compiled_path):
+            os.remove(compiled_path)
+        return None
+
+    save_compiled(params, compiled_path)
+    logging.info("Compiled model successfully saved.")
+    return compiled_path
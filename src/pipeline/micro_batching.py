@@ -0,0 +1,122 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+# logging
+from src.logger import logging
+
+
+@dataclass
+class MicroBatcherConfig:
+    max_latency_ms: float = 5.0   # longest a request waits for others to join its batch
+    max_batch_size: int = 64      # rows that flush a batch immediately
+    result_timeout: float = 30.0  # seconds a request waits for its prediction
+
+
+class MicroBatcher:
+    """Coalesces single-record predictions into vectorized PredictPipeline calls.
+
+    Request threads submit a record and block on a Future. A background worker
+    collects records until either `max_batch_size` rows are queued or the oldest
+    one has waited `max_latency_ms`, runs one `predict_batch`, and resolves each
+    Future with its own prediction.
+    """
+    def __init__(self, pipeline, config=None):
+        self.pipeline = pipeline
+        self.batcher_config = MicroBatcherConfig() if config is None else config
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+        self._metrics = {"requests": 0, "batches": 0, "rows": 0, "errors": 0,
+                         "max_batch_size": 0, "max_queue_depth": 0,
+                         "batch_size_counts": {}}
+
+    def _ensure_worker(self):
+        # the worker thread does not survive a fork, so each WSGI worker process starts its own
+        if self._worker is not None and self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid() and self._worker.is_alive():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._worker.start()
+            logging.info(f"Micro-batcher started (max_latency_ms={self.batcher_config.max_latency_ms}, "
+                         f"max_batch_size={self.batcher_config.max_batch_size}).")
+
+    def submit(self, record):
+        """Queue one record (a dict of raw features) and return a Future for its prediction."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((record, future))
+
+        with self._lock:
+            self._metrics["requests"] += 1
+            self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], self._queue.qsize())
+
+        return future
+
+    def predict(self, record):
+        return self.submit(record).result(timeout=self.batcher_config.result_timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batcher_config.max_latency_ms / 1000
+
+        while len(batch) < self.batcher_config.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run_one_by_one(self, batch):
+        for record, future in batch:
+            try:
+                prediction = self.pipeline.predict_batch([record])[0]
+            except Exception as err:
+                with self._lock:
+                    self._metrics["errors"] += 1
+                future.set_exception(err)
+            else:
+                future.set_result(prediction)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            records = [record for record, _ in batch]
+
+            try:
+                predictions = self.pipeline.predict_batch(records)
+            except Exception as err:
+                # one bad record must not fail the requests batched with it, so score them one by one
+                logging.info(f"Micro-batch of {len(batch)} records failed ({err}), scoring them one at a time.")
+                self._run_one_by_one(batch)
+            else:
+                for (_, future), prediction in zip(batch, predictions):
+                    future.set_result(prediction)
+
+            with self._lock:
+                size = len(batch)
+                self._metrics["batches"] += 1
+                self._metrics["rows"] += size
+                self._metrics["max_batch_size"] = max(self._metrics["max_batch_size"], size)
+                counts = self._metrics["batch_size_counts"]
+                counts[size] = counts.get(size, 0) + 1
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["batch_size_counts"] = dict(self._metrics["batch_size_counts"])
+        metrics["queue_depth"] = self._queue.qsize()
+        metrics["mean_batch_size"] = metrics["rows"] / metrics["batches"] if metrics["batches"] else 0.0
+        return metrics
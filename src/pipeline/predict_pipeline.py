@@ -1,7 +1,181 @@
-
 import os
-import joblib
-import pandas as pd
+import sys
+import time
+import hashlib
+import threading
+import functools
+from dataclasses import dataclass
+
+# logging and exception
+from src.logger import logging
+from src.exception import CustomException
+from src.instrumentation import stage
+
+# sklearn-free fast path
+from src.pipeline.compiled_inference import CompiledPreprocessor, CompiledModel, load_compiled, compile_preprocessor
+from src.pipeline.prediction_cache import PredictionCache, normalize_features, build_table
+from src.components.dataset_schema import FEATURE_COLUMNS, NUMERIC_FEATURE_COLUMNS, CATEGORIES, apply_schema
+
+# pandas and joblib are imported where they are needed, so a server running on the compiled
+# artifacts starts without them
+
+@dataclass
+class PredictPipelineConfig:
+    model_path: str = os.path.join("artifacts", "regressor.joblib")
+    preprocessor_path: str = os.path.join("artifacts", "preprocessor.joblib")
+    compiled_preprocessor_path: str = os.path.join("artifacts", "compiled_preprocessor.joblib")
+    compiled_model_path: str = os.path.join("artifacts", "compiled_regressor.joblib")
+    # written by training once the preprocessor and model above are all replaced
+    manifest_path: str = os.path.join("artifacts", "serving_manifest.json")
+    # seconds between file signature checks, 0 checks on every access
+    reload_check_interval: float = 1.0
+    # map compiled artifacts read-only instead of reading them, so worker processes share their pages
+    mmap_artifacts: bool = os.environ.get("MMAP_ARTIFACTS", "1") == "1"
+
+
+class ModelRegistry:
+    """Process-wide cache of pickled artifacts.
+
+    Each artifact is loaded once per process and keyed by its path plus the
+    file's (mtime, size) signature. When a retrain rewrites the file, the next
+    access loads the new version and swaps it in atomically; requests already
+    holding the old object keep using it until they finish.
+    """
+    def __init__(self, reload_check_interval=1.0):
+        self.reload_check_interval = reload_check_interval
+        self._lock = threading.Lock()
+        self._path_locks = {}
+        self._entries = {}
+        self._stats = {}
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _content_hash(path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _path_lock(self, path):
+        with self._lock:
+            if path not in self._path_locks:
+                self._path_locks[path] = threading.Lock()
+                self._stats[path] = {"loads": 0, "hits": 0, "reloads": 0, "failed_reloads": 0,
+                                     "total_load_seconds": 0.0, "last_load_seconds": None,
+                                     "content_hash": None}
+            return self._path_locks[path]
+
+    def _is_fresh(self, path, entry, now):
+        if now - entry["checked_at"] < self.reload_check_interval:
+            return True
+        try:
+            signature = self._signature(path)
+        except OSError:
+            # the file is being replaced; get() keeps the loaded version if it cannot reload
+            return False
+        if signature == entry["signature"]:
+            entry["checked_at"] = now
+            return True
+        return False
+
+    def _count(self, stats, **increments):
+        # request threads update the counters concurrently, and stats() reads them under the same lock
+        with self._lock:
+            for key, increment in increments.items():
+                stats[key] += increment
+
+    @staticmethod
+    def _joblib_load(path):
+        import joblib
+        return joblib.load(path)
+
+    def get(self, path, build=None, loader=None):
+        """Return the cached artifact at `path`, (re)loading it if the file changed.
+
+        `loader` reads the file (joblib.load by default). `build`, if given, is applied to the
+        loaded object once per load and its result is cached.
+        """
+        path = os.path.abspath(path)
+        path_lock = self._path_lock(path)
+        stats = self._stats[path]
+
+        entry = self._entries.get(path)
+        if entry is not None and self._is_fresh(path, entry, time.monotonic()):
+            self._count(stats, hits=1)
+            return entry["artifact"]
+
+        with path_lock:
+            # another thread may have (re)loaded the artifact while we waited
+            entry = self._entries.get(path)
+            if entry is not None and self._is_fresh(path, entry, time.monotonic()):
+                self._count(stats, hits=1)
+                return entry["artifact"]
+
+            try:
+                signature = self._signature(path)
+                with stage("artifact_load", path=path, bytes=signature[1]):
+                    start = time.perf_counter()
+                    artifact = (loader or self._joblib_load)(path)
+                    if build is not None:
+                        artifact = build(artifact)
+                    content_hash = self._content_hash(path)
+                    load_seconds = time.perf_counter() - start
+            except Exception as err:
+                if entry is None:
+                    raise
+                # e.g. a writer that does not replace the file atomically: keep serving the loaded
+                # version and retry at the next signature check
+                self._count(stats, failed_reloads=1)
+                entry["checked_at"] = time.monotonic()
+                logging.info(f"Reloading artifact {path} failed ({err}); serving the previously loaded version.")
+                return entry["artifact"]
+
+            self._entries[path] = {"artifact": artifact,
+                                   "signature": signature,
+                                   "content_hash": content_hash,
+                                   "checked_at": time.monotonic()}
+
+            with self._lock:
+                stats["loads"] += 1
+                stats["reloads"] += int(entry is not None)
+                stats["total_load_seconds"] += load_seconds
+                stats["last_load_seconds"] = load_seconds
+                stats["content_hash"] = content_hash
+            logging.info(f"Loaded artifact {path} in {load_seconds:.4f}s (load #{stats['loads']}).")
+
+            return artifact
+
+    def version(self, path):
+        """Content hash of the currently cached artifact, or None if not loaded."""
+        entry = self._entries.get(os.path.abspath(path))
+        return None if entry is None else entry["content_hash"]
+
+    def stats(self):
+        with self._lock:
+            return {path: dict(stats) for path, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+# raw input columns expected by the fitted preprocessor
+feature_columns = FEATURE_COLUMNS
+numeric_feature_columns = NUMERIC_FEATURE_COLUMNS
+
+# shared by every PredictPipeline in this worker process
+model_registry = ModelRegistry(reload_check_interval=PredictPipelineConfig.reload_check_interval)
+prediction_cache = PredictionCache()
+
 
 class CustomData:
     def __init__(self, gender,
@@ -11,7 +185,7 @@ class CustomData:
                  test_preparation_course,
                  reading_score,
                  writing_score):
-        
+
         self.gender = gender
         self.lunch = lunch
         self.reading_score = reading_score
@@ -21,6 +195,8 @@ class CustomData:
         self.parental_level_of_education = parental_level_of_education
 
     def get_data_as_df(self):
+        import pandas as pd
+
         data = {
             "gender": [self.gender],
             "race_ethnicity": [self.race_ethnicity],
@@ -31,23 +207,272 @@ class CustomData:
             "writing_score": [self.writing_score]
         }
 
-        df_data = pd.DataFrame(data=data)
+        df_data = apply_schema(pd.DataFrame(data=data))
 
         return df_data
-    
+
+    def get_data_as_dict(self):
+        return {column: getattr(self, column) for column in feature_columns}
+
 
 class PredictPipeline:
-    def __init__(self, ):
-        self.model = joblib.load(os.path.join("artifacts", "regressor.joblib"))
-        self.preprocessor = joblib.load(os.path.join("artifacts", "preprocessor.joblib"))
+    def __init__(self, registry=None, cache=None):
+        self.predict_config = PredictPipelineConfig()
+        self.registry = model_registry if registry is None else registry
+        self.cache = prediction_cache if cache is None else cache
+
+    @property
+    def _compiled_loader(self):
+        return functools.partial(load_compiled, mmap=self.predict_config.mmap_artifacts)
+
+    def warm(self):
+        """Load the artifacts the predict path uses, e.g. in a server's master process before it forks."""
+        artifacts = self.artifacts()
+        if self.cache.enabled and self.cache.cache_config.precompute:
+            version = artifacts["version"]
+            if self.cache.claim_table_build(version):
+                self.precompute(version)
+        return self.registry.stats()
 
+    # artifacts are resolved through the registry on every request so a retrain is picked up
+    def artifacts(self):
+        """The preprocessor and model of one training run, loaded and swapped as a unit.
+
+        The registry entry is keyed on the serving manifest, which training writes once every
+        artifact is replaced, so a retrain in progress never pairs a new preprocessor with the
+        old model. Without a manifest the entry is keyed on the artifact training writes last
+        (the compiled model, or the sklearn model when there is none). A request takes one
+        snapshot and passes it to transform and predict_transformed.
+        """
+        config = self.predict_config
+        if os.path.exists(config.manifest_path):
+            return self.registry.get(config.manifest_path, loader=self._load_manifest_artifacts)
+        key_path = config.compiled_model_path if os.path.exists(config.compiled_model_path) else config.model_path
+        return self.registry.get(key_path, loader=lambda _: self._load_artifacts())
+
+    def _load_manifest_artifacts(self, manifest_path):
+        import json
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        return self._load_artifacts(manifest)
+
+    def _load_artifacts(self, manifest=None):
+        # compiled artifacts are preferred; the sklearn objects are only unpickled without them
+        config = self.predict_config
+        paths = {"compiled_preprocessor": config.compiled_preprocessor_path, "preprocessor": config.preprocessor_path,
+                 "compiled_model": config.compiled_model_path, "model": config.model_path}
+        if manifest is None:
+            present = {name for name, path in paths.items() if os.path.exists(path)}
+        else:
+            present = {name for name in paths if manifest.get(name) is not None}
+        used = [("compiled_preprocessor" if "compiled_preprocessor" in present else "preprocessor"),
+                ("compiled_model" if "compiled_model" in present else "model")]
+
+        artifacts = dict.fromkeys(paths)
+        version = []
+        for name in used:
+            path = paths[name]
+            content_hash = ModelRegistry._content_hash(path)
+            if manifest is not None and content_hash != manifest[name]["sha256"]:
+                # a retrain is replacing the files; the registry keeps serving the loaded unit
+                raise ValueError(f"{path} does not match the serving manifest (a retrain may be in progress).")
+            if name.startswith("compiled_"):
+                build = CompiledPreprocessor if name == "compiled_preprocessor" else CompiledModel
+                artifacts[name] = build(self._compiled_loader(path))
+            else:
+                artifacts[name] = ModelRegistry._joblib_load(path)
+            version.append(content_hash)
+        artifacts["version"] = tuple(version)
+        return artifacts
+
+    @property
+    def model(self):
+        return self.artifacts()["model"]
+
+    @property
+    def preprocessor(self):
+        return self.artifacts()["preprocessor"]
+
+    @property
+    def compiled_preprocessor(self):
+        return self.artifacts()["compiled_preprocessor"]
+
+    @property
+    def compiled_model(self):
+        return self.artifacts()["compiled_model"]
+
+    def model_version(self, artifacts=None):
+        """Content hashes of the preprocessor and model that predictions currently come from."""
+        return (self.artifacts() if artifacts is None else artifacts)["version"]
+
+    def lookup(self, record, artifacts=None):
+        """Return (cache_key, prediction) for a raw record dict; prediction is None on a miss.
+
+        Pass the key to `remember` once the prediction is computed.
+        """
+        if not self.cache.enabled:
+            return None, None
+        version = self.model_version(artifacts)
+        if self.cache.cache_config.precompute and self.cache.claim_table_build(version):
+            # a new model version: rebuild the table in the background, the LRU serves meanwhile
+            threading.Thread(target=self.precompute, args=(version,), name="prediction-precompute",
+                             daemon=True).start()
+        features = normalize_features(record, feature_columns, numeric_feature_columns)
+        return (features, version), self.cache.get(features, version)
+
+    def remember(self, cache_key, prediction):
+        if cache_key is not None:
+            self.cache.put(cache_key[0], cache_key[1], prediction)
+
+    def precompute(self, version):
+        """Fill the cache with a prediction for every combination of known categories and integer
+        scores, if that input space is no larger than `precompute_max_points`."""
+        import pandas as pd
+
+        cache_config = self.cache.cache_config
+        try:
+            artifacts = self.artifacts()
+            if artifacts["version"] != version:
+                logging.info("Artifacts changed before precomputing predictions, skipping the stale version.")
+                return None
+            compiled_preprocessor = artifacts["compiled_preprocessor"]
+            params = compiled_preprocessor.params if compiled_preprocessor is not None \
+                else compile_preprocessor(artifacts["preprocessor"])
+            categories = {column: block_categories for block in params["blocks"] if block["kind"] == "onehot"
+                          for column, block_categories in zip(block["columns"], block["categories"])}
+            axes = [cache_config.score_range if column in numeric_feature_columns
+                    else {category: i for i, category in enumerate(categories[column])}
+                    for column in feature_columns]
+
+            n_points = 1
+            for axis in axes:
+                n_points *= len(axis) if isinstance(axis, dict) else axis[1] - axis[0] + 1
+            if n_points > cache_config.precompute_max_points:
+                logging.info(f"Input space of {n_points} points exceeds precompute_max_points "
+                             f"({cache_config.precompute_max_points}), not precomputing predictions.")
+                return None
+
+            def predict_chunk(columns):
+                return self._predict_array(pd.DataFrame(dict(zip(feature_columns, columns))), artifacts)
+
+            with stage("prediction_precompute", rows=n_points):
+                table = build_table(version, axes, predict_chunk, cache_config.precompute_chunk_rows)
+            self.cache.set_table(table)
+            logging.info(f"Precomputed {n_points} predictions ({table.table.nbytes} bytes).")
+            return table
+
+        except Exception as err:
+            # the cache still works without the table
+            logging.info(f"Precomputing predictions failed: {err}")
+            return None
+
+    def transform(self, features, artifacts=None):
+        # the compiled preprocessor skips pandas/ColumnTransformer overhead and matches sklearn exactly
+        artifacts = self.artifacts() if artifacts is None else artifacts
+        compiled_preprocessor = artifacts["compiled_preprocessor"]
+        if compiled_preprocessor is not None:
+            return compiled_preprocessor.transform(features)
+        return artifacts["preprocessor"].transform(features)
+
+    def predict_transformed(self, transformed_data, artifacts=None):
+        # with both compiled artifacts present, serving never unpickles (or imports) scikit-learn
+        artifacts = self.artifacts() if artifacts is None else artifacts
+        model = artifacts["compiled_model"]
+        if model is None:
+            model = artifacts["model"]
+        return model.predict(transformed_data).ravel()
+
+    def _predict_array(self, features, artifacts=None):
+        artifacts = self.artifacts() if artifacts is None else artifacts
+        return self.predict_transformed(self.transform(features, artifacts), artifacts)
 
     def predict(self, features):
-        transformed_data = self.preprocessor.transform(features)
-        prediction = self.model.predict(transformed_data).ravel()
+        try:
+            prediction = self._predict_array(features)
+
+            return int(prediction[0])
+
+        except Exception as err:
+            raise CustomException(err, sys)
+
+    def transform_record(self, record, artifacts=None):
+        """Transform a single raw record dict, building a DataFrame only when the sklearn preprocessor is needed."""
+        artifacts = self.artifacts() if artifacts is None else artifacts
+        if artifacts["compiled_preprocessor"] is None:
+            import pandas as pd
+            record = pd.DataFrame({column: [record[column]] for column in feature_columns})
+        return self.transform(record, artifacts)
+
+    def predict_record(self, record):
+        """Predict a single raw record dict without building a DataFrame when the compiled path is available."""
+        try:
+            artifacts = self.artifacts()
+            cache_key, prediction = self.lookup(record, artifacts)
+            if prediction is not None:
+                return prediction
+
+            prediction = int(self.predict_transformed(self.transform_record(record, artifacts), artifacts)[0])
+            self.remember(cache_key, prediction)
+
+            return prediction
+
+        except Exception as err:
+            raise CustomException(err, sys)
+
+    @staticmethod
+    def records_to_df(records, max_rows=None):
+        """Build a feature frame from a list of dicts, a DataFrame, or a CSV path/file object.
+
+        With `max_rows`, raises BatchTooLarge for larger batches; CSV input is read only up to
+        one row past the limit.
+        """
+        import pandas as pd
+
+        if isinstance(records, pd.DataFrame):
+            df_data = records
+        elif isinstance(records, (list, tuple)):
+            df_data = pd.DataFrame.from_records(records)
+        else:
+            df_data = pd.read_csv(records, nrows=None if max_rows is None else max_rows + 1)
+        if max_rows is not None and len(df_data) > max_rows:
+            raise BatchTooLarge(f"Batch exceeds the maximum of {max_rows} records.")
+
+        if len(df_data) == 0:
+            # an empty batch has nothing to validate and predicts to an empty list
+            return pd.DataFrame(columns=feature_columns)
+
+        missing = [column for column in feature_columns if column not in df_data.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+
+        # values the fitted preprocessor would reject; missing values are imputed, so they pass
+        for column in feature_columns:
+            values = df_data[column]
+            if column in numeric_feature_columns:
+                numbers = pd.to_numeric(values, errors="coerce")
+                invalid = values.notna() & (numbers.isna() | numbers.isin([float("inf"), float("-inf")]))
+                expected = "finite numbers"
+            else:
+                invalid = values.notna() & ~values.isin(CATEGORIES[column])
+                expected = f"one of {CATEGORIES[column]}"
+            if invalid.any():
+                raise ValueError(f"Feature '{column}' has invalid values {values[invalid].unique()[:5].tolist()} "
+                                 f"(expected {expected}).")
+
+        return df_data[feature_columns]
+
+    def predict_batch(self, records):
+        try:
+            df_data = self.records_to_df(records)
+            if len(df_data) == 0:
+                return []
 
-        return int(prediction[0])
-    
+            # one vectorized transform and predict over the whole batch; not a stage record, since
+            # this runs per request (the services time it with their phase metrics)
+            predictions = self._predict_array(df_data)
 
+            return predictions.astype(int).tolist()
 
-        
\ No newline at end of file
+        except Exception as err:
+            raise CustomException(err, sys)
@@ -0,0 +1,216 @@
+# Cache of single-record predictions keyed on normalized feature values.
+# Entries belong to one model version (the content hashes of the artifacts that produced them),
+# so the first lookup after a retrain drops everything cached for the previous model.
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+
+# logging
+from src.logger import logging
+
+
+@dataclass
+class PredictionCacheConfig:
+    enabled: bool = os.environ.get("PREDICTION_CACHE", "1") == "1"
+    max_entries: int = int(os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", 100_000))
+    max_bytes: int = int(os.environ.get("PREDICTION_CACHE_MAX_BYTES", 64 * 1024 ** 2))
+    # seconds an entry stays valid, 0 keeps it until it is evicted or the model changes
+    ttl_seconds: float = float(os.environ.get("PREDICTION_CACHE_TTL", 0))
+    # precompute a dense table over every input combination when there are at most this many
+    precompute: bool = os.environ.get("PREDICTION_CACHE_PRECOMPUTE", "0") == "1"
+    precompute_max_points: int = int(os.environ.get("PREDICTION_CACHE_PRECOMPUTE_MAX_POINTS", 5_000_000))
+    score_range: tuple = (0, 100)
+    precompute_chunk_rows: int = 65536
+
+
+# OrderedDict node, entry tuple and bookkeeping per cached key
+_ENTRY_OVERHEAD = 160
+
+
+def _entry_bytes(features, prediction):
+    return (_ENTRY_OVERHEAD + sys.getsizeof(features) + sys.getsizeof(prediction)
+            + sum(sys.getsizeof(value) for value in features))
+
+
+def normalize_features(record, columns, numeric_columns):
+    """Hashable tuple of a record's features, or None when the record cannot be cached.
+
+    Numeric features become floats, so 72, 72.0 and "72" (which the preprocessor reads
+    identically) share one entry. Missing or unparseable values are left to the pipeline.
+    """
+    features = []
+    try:
+        for column in columns:
+            value = record[column]
+            if column in numeric_columns:
+                value = float(value)
+            if isinstance(value, float) and value != value:
+                return None
+            hash(value)
+            features.append(value)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return tuple(features)
+
+
+class PrecomputedTable:
+    """Dense array of predictions over every combination of known categories and integer scores."""
+    def __init__(self, version, axes, table):
+        self.version = version
+        # per feature: a category -> index dict, or the (low, high) integer score range
+        self.axes = axes
+        self.table = table
+
+    def lookup(self, features):
+        index = []
+        for value, axis in zip(features, self.axes):
+            if isinstance(axis, dict):
+                position = axis.get(value)
+                if position is None:
+                    return None
+            else:
+                low, high = axis
+                if not (low <= value <= high) or not value.is_integer():
+                    return None
+                position = int(value) - low
+            index.append(position)
+        return int(self.table[tuple(index)])
+
+
+class PredictionCache:
+    """Thread-safe LRU of predictions with an optional TTL and entry/byte caps.
+
+    Callers pass the current model version with every lookup; a version change clears the
+    cache (and drops a precomputed table built for another version).
+    """
+    def __init__(self, config=None):
+        self.cache_config = PredictionCacheConfig() if config is None else config
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # features -> (prediction, expires_at, size)
+        self._bytes = 0
+        self._version = None
+        self._table = None
+        self._table_claimed = None  # version a table build was started for
+        self._stats = {"hits": 0, "table_hits": 0, "misses": 0, "uncacheable": 0,
+                       "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return self.cache_config.enabled
+
+    def _check_version(self, version):
+        if version == self._version:
+            return
+        if self._version is not None:
+            self._stats["invalidations"] += 1
+            logging.info(f"Prediction cache invalidated after a model change ({len(self._entries)} entries dropped).")
+        self._entries.clear()
+        self._bytes = 0
+        self._version = version
+        if self._table is not None and self._table.version != version:
+            self._table = None
+
+    def get(self, features, version):
+        if features is None:
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return None
+
+        with self._lock:
+            self._check_version(version)
+            if self._table is not None:
+                prediction = self._table.lookup(features)
+                if prediction is not None:
+                    self._stats["table_hits"] += 1
+                    return prediction
+
+            entry = self._entries.get(features)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            prediction, expires_at, size = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[features]
+                self._bytes -= size
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(features)
+            self._stats["hits"] += 1
+            return prediction
+
+    def put(self, features, version, prediction):
+        config = self.cache_config
+        if features is None:
+            return
+        size = _entry_bytes(features, prediction)
+        expires_at = time.monotonic() + config.ttl_seconds if config.ttl_seconds > 0 else None
+
+        with self._lock:
+            # a prediction made with a model that has since been replaced is not worth keeping
+            if version != self._version:
+                return
+            previous = self._entries.pop(features, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[features] = (prediction, expires_at, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > config.max_entries or self._bytes > config.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def claim_table_build(self, version):
+        """True exactly once per model version, for the caller that should build its table."""
+        with self._lock:
+            if self._table_claimed == version:
+                return False
+            self._table_claimed = version
+            return True
+
+    def set_table(self, table):
+        with self._lock:
+            self._check_version(table.version)
+            self._table = table
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["table_hits"] + stats["misses"]
+            stats.update({"entries": len(self._entries), "bytes": self._bytes,
+                          "table_points": 0 if self._table is None else int(self._table.table.size),
+                          "table_bytes": 0 if self._table is None else int(self._table.table.nbytes),
+                          "hit_rate": (stats["hits"] + stats["table_hits"]) / lookups if lookups else None})
+            return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._table = None
+            self._table_claimed = None
+
+
+def build_table(version, axes, predict_chunk, chunk_rows):
+    """Evaluate `predict_chunk(columns)` over the full product of `axes` into a PrecomputedTable.
+
+    `predict_chunk` receives a list of per-axis arrays, one array of column values per axis in
+    axis order, and returns one prediction per row.
+    """
+    values = [list(axis) if isinstance(axis, dict) else np.arange(axis[0], axis[1] + 1, dtype=np.float64)
+              for axis in axes]
+    shape = tuple(len(axis_values) for axis_values in values)
+    table = np.empty(int(np.prod(shape)), dtype=np.int32)
+    object_values = [np.asarray(axis_values, dtype=object) if isinstance(axis, dict) else axis_values
+                     for axis, axis_values in zip(axes, values)]
+
+    for start in range(0, table.size, chunk_rows):
+        index = np.unravel_index(np.arange(start, min(start + chunk_rows, table.size)), shape)
+        columns = [axis_values[positions] for axis_values, positions in zip(object_values, index)]
+        table[start:start + len(index[0])] = np.asarray(predict_chunk(columns)).astype(int)
+
+    return PrecomputedTable(version, axes, table.reshape(shape))
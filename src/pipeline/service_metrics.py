@@ -0,0 +1,243 @@
+# In-process metrics for the prediction service, rendered in the Prometheus text
+# exposition format (version 0.0.4) without depending on prometheus_client.
+# Metrics are per process: with several WSGI workers each one reports its own.
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# latency buckets in seconds, finer than Prometheus' defaults because a compiled prediction takes microseconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # metrics without labels are used directly
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines += child.render(self.name, self.labelnames, key)
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, [('le', _format_value(float(bound)))])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class MetricsRegistry:
+    """Holds metrics plus collector callbacks that refresh gauges from other components at scrape time."""
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+service_metrics = MetricsRegistry()
+
+requests_total = service_metrics.register(Counter(
+    "prediction_requests_total", "HTTP requests handled, by endpoint, method and status code.",
+    ("endpoint", "method", "status")))
+requests_in_flight = service_metrics.register(Gauge(
+    "prediction_requests_in_flight", "HTTP requests currently being handled."))
+request_seconds = service_metrics.register(Histogram(
+    "prediction_request_seconds", "End-to-end request latency in seconds.", ("endpoint",)))
+phase_seconds = service_metrics.register(Histogram(
+    "prediction_phase_seconds", "Request latency split by phase (parse, cache, transform, predict, render) in seconds.",
+    ("endpoint", "phase")))
+predicted_rows_total = service_metrics.register(Counter(
+    "prediction_rows_total", "Rows scored, by endpoint.", ("endpoint",)))
+artifact_loads = service_metrics.register(Gauge(
+    "prediction_artifact_loads", "Times each artifact was loaded by the model registry (first load plus reloads).",
+    ("artifact",)))
+artifact_reloads = service_metrics.register(Gauge(
+    "prediction_artifact_reloads", "Times each artifact was reloaded after its file changed.", ("artifact",)))
+artifact_load_seconds = service_metrics.register(Gauge(
+    "prediction_artifact_load_seconds", "Total seconds spent loading each artifact.", ("artifact",)))
+prediction_cache_lookups = service_metrics.register(Gauge(
+    "prediction_cache_lookups", "Prediction cache lookups, by result (hit, table_hit, miss, uncacheable).",
+    ("result",)))
+prediction_cache_entries = service_metrics.register(Gauge(
+    "prediction_cache_entries", "Predictions held in the LRU cache."))
+prediction_cache_bytes = service_metrics.register(Gauge(
+    "prediction_cache_bytes", "Estimated bytes held by the LRU cache plus the precomputed table."))
+prediction_cache_hit_ratio = service_metrics.register(Gauge(
+    "prediction_cache_hit_ratio", "Share of cacheable lookups answered from the cache."))
+
+
+def registry_collector(registry):
+    """Collector that mirrors a ModelRegistry's load statistics into the artifact gauges."""
+    def collect():
+        for path, stats in registry.stats().items():
+            artifact_loads.labels(artifact=path).set(stats["loads"])
+            artifact_reloads.labels(artifact=path).set(stats["reloads"])
+            artifact_load_seconds.labels(artifact=path).set(stats["total_load_seconds"])
+    return collect
+
+
+def cache_collector(cache):
+    """Collector that mirrors a PredictionCache's statistics into the cache gauges."""
+    def collect():
+        stats = cache.stats()
+        for result, key in (("hit", "hits"), ("table_hit", "table_hits"), ("miss", "misses"),
+                            ("uncacheable", "uncacheable")):
+            prediction_cache_lookups.labels(result=result).set(stats[key])
+        prediction_cache_entries.set(stats["entries"])
+        prediction_cache_bytes.set(stats["bytes"] + stats["table_bytes"])
+        prediction_cache_hit_ratio.set(stats["hit_rate"] or 0.0)
+    return collect
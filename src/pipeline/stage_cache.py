@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import platform
+import joblib
+from dataclasses import dataclass, asdict, is_dataclass
+
+# logging and exception
+from src.logger import logging
+from src.exception import CustomException
+
+@dataclass
+class StageCacheConfig:
+    cache_dir: str = os.path.join("artifacts", "cache")
+    report_path: str = os.path.join("artifacts", "cache", "report.json")
+    max_entries_per_stage: int = 3
+    max_bytes: int = 2 * 1024 ** 3
+
+
+def _describe(value):
+    # stable, JSON-friendly description of configs, estimators and parameter distributions
+    if is_dataclass(value):
+        return _describe(asdict(value))
+    if isinstance(value, dict):
+        return {str(key): _describe(val) for key, val in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_describe(val) for val in value]
+    if hasattr(value, "get_params"):  # sklearn estimators
+        return {"class": type(value).__name__, "params": _describe(value.get_params(deep=False))}
+    if hasattr(value, "dist") and hasattr(value, "args"):  # frozen scipy.stats distributions
+        return {"dist": value.dist.name, "args": _describe(value.args), "kwds": _describe(value.kwds)}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def path_hash(path):
+    """Hash of a file, or of every file (and its relative name) under a directory."""
+    if not os.path.isdir(path):
+        return file_hash(path)
+    digest = hashlib.sha256()
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode())
+            digest.update(file_hash(file_path).encode())
+    return digest.hexdigest()
+
+
+def code_version(*modules):
+    """Hash of the given modules' source files plus the interpreter and library versions."""
+    digest = hashlib.sha256(platform.python_version().encode())
+    for name in ("numpy", "pandas", "sklearn"):
+        library = sys.modules.get(name)
+        digest.update(f"{name}={getattr(library, '__version__', None)}".encode())
+    for module in modules:
+        with open(inspect.getsourcefile(module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """Content-addressed cache of training stage artifacts.
+
+    Each stage is fingerprinted from its input data hashes, config, estimator
+    params, code version and the upstream stage's fingerprint, so a change in
+    any stage invalidates everything after it. A hit copies the stage's cached
+    artifacts back into place instead of rerunning it. Entries are evicted
+    least-recently-used per stage and by total size.
+    """
+    def __init__(self, config=None):
+        self.cache_config = StageCacheConfig() if config is None else config
+        self.report = []
+
+    def fingerprint(self, stage, upstream=None, files=(), configs=(), modules=(), **extra):
+        payload = {"stage": stage,
+                   "upstream": upstream,
+                   "files": {path: path_hash(path) for path in files},
+                   "configs": _describe(list(configs)),
+                   "code": code_version(*modules),
+                   "extra": _describe(extra)}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _entry_dir(self, stage, fingerprint):
+        return os.path.join(self.cache_config.cache_dir, stage, fingerprint)
+
+    def _record(self, stage, fingerprint, hit, seconds):
+        self.report.append({"stage": stage, "fingerprint": fingerprint[:12],
+                            "status": "hit" if hit else "miss", "seconds": round(seconds, 4)})
+        logging.info(f"Stage cache {'hit' if hit else 'miss'} for {stage} ({fingerprint[:12]}).")
+
+    def restore(self, stage, fingerprint):
+        """Copy a cached stage's artifacts back into place.
+
+        Returns (True, result) on a hit, where result is the stage's cached return value,
+        and (False, None) on a miss.
+        """
+        start = time.perf_counter()
+        entry_dir = self._entry_dir(stage, fingerprint)
+        manifest_path = os.path.join(entry_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            self._record(stage, fingerprint, False, time.perf_counter() - start)
+            return False, None
+
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+            for cached_name, destination in manifest["files"].items():
+                os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+                source = os.path.join(entry_dir, cached_name)
+                if os.path.isdir(source):
+                    shutil.rmtree(destination, ignore_errors=True)
+                    shutil.copytree(source, destination)
+                else:
+                    # copyfile gives the restored artifact a fresh mtime so serving reloads it, and
+                    # the rename swaps it in whole
+                    shutil.copyfile(source, destination + ".tmp")
+                    os.replace(destination + ".tmp", destination)
+
+            result = None
+            if manifest["has_result"]:
+                result = joblib.load(os.path.join(entry_dir, "result.joblib"))
+
+            manifest["last_used"] = time.time()
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f, indent=2)
+
+        except Exception as err:
+            # a damaged entry is treated as a miss and dropped
+            logging.info(f"Discarding unreadable cache entry {entry_dir}: {err}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            self._record(stage, fingerprint, False, time.perf_counter() - start)
+            return False, None
+
+        self._record(stage, fingerprint, True, time.perf_counter() - start)
+        return True, result
+
+    def store(self, stage, fingerprint, files=(), result=None):
+        try:
+            entry_dir = self._entry_dir(stage, fingerprint)
+            tmp_dir = entry_dir + ".tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+
+            manifest = {"stage": stage, "fingerprint": fingerprint, "files": {},
+                        "has_result": result is not None, "created": time.time(), "last_used": time.time()}
+            for i, path in enumerate(files):
+                if not os.path.exists(path):
+                    continue
+                cached_name = f"{i}_{os.path.basename(path)}"
+                if os.path.isdir(path):
+                    shutil.copytree(path, os.path.join(tmp_dir, cached_name))
+                else:
+                    shutil.copyfile(path, os.path.join(tmp_dir, cached_name))
+                manifest["files"][cached_name] = path
+            if result is not None:
+                joblib.dump(result, os.path.join(tmp_dir, "result.joblib"))
+
+            with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=2)
+
+            # publish the entry only once it is complete
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+
+            self.evict()
+
+        except Exception as err:
+            raise CustomException(err, sys)
+
+    @staticmethod
+    def _size(entry_dir):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(entry_dir) for name in names)
+
+    def evict(self):
+        entries = []
+        cache_dir = self.cache_config.cache_dir
+        for stage in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+            stage_dir = os.path.join(cache_dir, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for fingerprint in os.listdir(stage_dir):
+                entry_dir = os.path.join(stage_dir, fingerprint)
+                manifest_path = os.path.join(entry_dir, "manifest.json")
+                if not os.path.exists(manifest_path):
+                    continue
+                with open(manifest_path) as f:
+                    last_used = json.load(f)["last_used"]
+                entries.append({"stage": stage, "dir": entry_dir, "last_used": last_used,
+                                "size": self._size(entry_dir)})
+
+        # least recently used first
+        entries.sort(key=lambda entry: entry["last_used"])
+        per_stage = {}
+        for entry in entries:
+            per_stage[entry["stage"]] = per_stage.get(entry["stage"], 0) + 1
+        total_bytes = sum(entry["size"] for entry in entries)
+
+        for entry in entries:
+            over_count = per_stage[entry["stage"]] > self.cache_config.max_entries_per_stage
+            over_size = total_bytes > self.cache_config.max_bytes
+            if not (over_count or over_size):
+                continue
+            shutil.rmtree(entry["dir"], ignore_errors=True)
+            per_stage[entry["stage"]] -= 1
+            total_bytes -= entry["size"]
+            logging.info(f"Evicted stage cache entry {entry['dir']}.")
+
+    def save_report(self):
+        os.makedirs(os.path.dirname(self.cache_config.report_path), exist_ok=True)
+        with open(self.cache_config.report_path, "w") as f:
+            json.dump(self.report, f, indent=2)
+        return self.report
@@ -1,26 +1,119 @@
-
+import os
+import sys
+from src.components import data_ingestion, data_transformation, dataset_schema, datastore, streaming, \
+                           model_searching, model_selection, parallel_search, trial_store
+from src import models_configs
+from src.pipeline import compiled_inference
+from src.pipeline.compiled_inference import save_serving_manifest
 from src.components.data_ingestion import DataIngestion
 from src.components.data_transformation import DataTransformation
 from src.components.model_searching import ModelSearching
+from src.components.incremental_training import IncrementalTraining
+from src.pipeline.stage_cache import StageCache
+from src.logger import logging
+from src.instrumentation import instrumented
 
 class TrainingPipeline:
     def __init__(self):
         self.ingestion_pipeline = DataIngestion()
         self.transformation_pipeline = DataTransformation()
         self.search_pipeline = ModelSearching()
+        self.stage_cache = StageCache()
+        self.incremental_pipeline = IncrementalTraining()
+
+    @instrumented("training_pipeline")
+    def initiate_model_training(self, n_iter=30, n_jobs=None, search_mode=None, use_cache=True):
+        cache = self.stage_cache
+        cache.report = []
 
-    def initiate_model_training(self, n_iter=30):
         # ingesting data
-        train_data_path, test_data_path = self.ingestion_pipeline.initiate_ingestion()
+        ingestion_config = self.ingestion_pipeline.ingestion_config
+        # rows appended to the source after this point are left for incremental training
+        source_offset = os.path.getsize(ingestion_config.source_data_path)
+        ingestion_fingerprint = cache.fingerprint("ingestion",
+                                                  files=[ingestion_config.source_data_path],
+                                                  configs=[ingestion_config],
+                                                  # the schema types the data, datastore writes it and streaming splits it
+                                                  modules=[data_ingestion, dataset_schema, datastore, streaming])
+        hit, _ = cache.restore("ingestion", ingestion_fingerprint) if use_cache else (False, None)
+        if hit:
+            train_data_path, test_data_path = self.ingestion_pipeline.output_paths()
+        else:
+            train_data_path, test_data_path = self.ingestion_pipeline.initiate_ingestion()
+            cache.store("ingestion", ingestion_fingerprint, files=self.ingestion_pipeline.artifact_paths())
 
         # transforming data
-        transformed_train_data, transformed_test_data = self.transformation_pipeline.initiate_transformation(train_data_path, test_data_path)
+        transformation_config = self.transformation_pipeline.tranformation_config
+        transformation_fingerprint = cache.fingerprint("transformation",
+                                                       upstream=ingestion_fingerprint,
+                                                       configs=[transformation_config],
+                                                       modules=[data_transformation, dataset_schema, datastore, streaming,
+                                                                compiled_inference])
+        hit, transformed_data = cache.restore("transformation", transformation_fingerprint) if use_cache else (False, None)
+        # streaming transformation outputs are memory-mapped files, so cache the files rather than the frames
+        streamed = transformation_config.chunk_size is not None
+        if hit:
+            transformed_train_data, transformed_test_data = self.transformation_pipeline.load_transformed_data() if streamed else transformed_data
+        else:
+            transformed_train_data, transformed_test_data = self.transformation_pipeline.initiate_transformation(train_data_path, test_data_path)
+            transformation_files = [transformation_config.preprocessor_path, transformation_config.compiled_preprocessor_path]
+            if streamed:
+                transformation_files += [transformation_config.transformed_train_path, transformation_config.transformed_test_path]
+            cache.store("transformation", transformation_fingerprint, files=transformation_files,
+                        result=None if streamed else (transformed_train_data, transformed_test_data))
 
         # model training and evaluation
-        best_score = self.search_pipeline.initiate_model_search(transformed_train_data, transformed_test_data, n_iter=n_iter)
+        search_config = self.search_pipeline.model_config
+        selection_config = self.search_pipeline.selection.selection_config
+        search_fingerprint = cache.fingerprint("search",
+                                               upstream=transformation_fingerprint,
+                                               # the worker count and the trial store and manifest locations do not change the results
+                                               configs=[{key: value for key, value in vars(search_config).items()
+                                                         if key not in ("n_jobs", "trial_store_path", "manifest_path")},
+                                                        selection_config],
+                                               modules=[model_searching, model_selection, parallel_search, trial_store, models_configs, compiled_inference],
+                                               estimators=self.search_pipeline.seeded_estimators(),
+                                               n_iter=n_iter,
+                                               search_mode=search_mode or search_config.search_mode)
+        hit, best_score = cache.restore("search", search_fingerprint) if use_cache else (False, None)
+        if not hit:
+            best_score = self.search_pipeline.initiate_model_search(transformed_train_data, transformed_test_data, n_iter=n_iter, n_jobs=n_jobs, search_mode=search_mode)
+            cache.store("search", search_fingerprint,
+                        files=[search_config.model_path, search_config.compiled_model_path,
+                               search_config.metrics_path, search_config.search_result_path,
+                               selection_config.leaderboard_path],
+                        result=best_score)
+
+        # publish the preprocessor and model as one serving unit, now that both are in place
+        save_serving_manifest(search_config.manifest_path,
+                              preprocessor=transformation_config.preprocessor_path,
+                              compiled_preprocessor=transformation_config.compiled_preprocessor_path,
+                              model=search_config.model_path,
+                              compiled_model=search_config.compiled_model_path)
+
+        report = cache.save_report()
+        logging.info(f"Stage cache report: {report}")
+
+        # record what this training covered, so the next update reads only appended rows
+        self.incremental_pipeline.initialize_state(ingestion_config.source_data_path, source_offset,
+                                                   train_data_path, test_data_path)
         print(best_score)
 
+    @instrumented("incremental_training_pipeline")
+    def initiate_incremental_training(self, n_iter=30, n_jobs=None, search_mode=None):
+        """Update the deployed preprocessor and model from rows appended to the source dataset,
+        falling back to a full training when the update is not possible or degrades the model."""
+        result = self.incremental_pipeline.initiate_incremental_training()
+        if result["status"] == "full_search_required":
+            logging.info(f"Running a full training instead ({result['reason']}).")
+            self.initiate_model_training(n_iter=n_iter, n_jobs=n_jobs, search_mode=search_mode)
+        print(result)
+        return result
+
 if __name__ == "__main__":
     training_pipeline = TrainingPipeline()
-    training_pipeline.initiate_model_training(n_iter=30)
+    if "--incremental" in sys.argv[1:]:
+        training_pipeline.initiate_incremental_training(n_iter=30)
+    else:
+        training_pipeline.initiate_model_training(n_iter=30)
 
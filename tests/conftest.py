@@ -0,0 +1,37 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SOURCE_DATA_PATH = os.path.join(ROOT, "notebooks", "data", "stud.csv")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # the components write their artifacts relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def trained_workdir(tmp_path_factory):
+    """A directory holding the artifacts of a small training run (linear model) on stud.csv."""
+    from sklearn.linear_model import LinearRegression
+    from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+    from src.components.data_transformation import DataTransformation, features_and_label
+    from src.components.model_searching import ModelSearchingConfig
+    from src.pipeline.compiled_inference import dump_joblib, export_compiled_model
+
+    workdir = tmp_path_factory.mktemp("trained")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(workdir)
+        train_path, test_path = DataIngestion(DataIngestionConfig(source_data_path=SOURCE_DATA_PATH)).initiate_ingestion()
+        train_data, test_data = DataTransformation().initiate_transformation(train_path, test_path)
+        (Xtrain, ytrain), (Xtest, _) = features_and_label(train_data), features_and_label(test_data)
+        model = LinearRegression().fit(Xtrain, ytrain)
+        config = ModelSearchingConfig()
+        dump_joblib(model, config.model_path)
+        export_compiled_model(model, Xtest, config.compiled_model_path)
+    return workdir
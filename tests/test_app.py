@@ -0,0 +1,46 @@
+import pytest
+
+from app import app
+
+RECORD = {"gender": "female", "race_ethnicity": "group B", "parental_level_of_education": "bachelor's degree",
+          "lunch": "standard", "test_preparation_course": "none", "reading_score": 72, "writing_score": 74}
+
+
+@pytest.fixture
+def client(trained_workdir, monkeypatch):
+    monkeypatch.chdir(trained_workdir)
+    return app.test_client()
+
+
+def test_batch_predicts_valid_records(client):
+    response = client.post("/predict/batch", json={"records": [RECORD, dict(RECORD, reading_score="80")]})
+    assert response.status_code == 200
+    assert response.get_json()["count"] == 2
+
+
+@pytest.mark.parametrize("bad", [{"gender": "alien"}, {"reading_score": "abc"}])
+def test_batch_rejects_invalid_values_with_json_error(client, bad):
+    response = client.post("/predict/batch", json=[RECORD, dict(RECORD, **bad)])
+    assert response.status_code == 400
+    assert list(bad)[0] in response.get_json()["error"]
+
+
+def test_empty_batch_returns_no_predictions(client):
+    response = client.post("/predict/batch", json={"records": []})
+    assert response.status_code == 200
+    assert response.get_json() == {"predictions": [], "count": 0}
+
+
+def test_oversized_batches_are_rejected_before_parsing(client, monkeypatch):
+    import io
+    monkeypatch.setitem(app.config, "MAX_BATCH_SIZE", 2)
+    response = client.post("/predict/batch", json=[RECORD] * 3)
+    assert response.status_code == 413
+
+    rows = ",".join(RECORD) + "\n" + "\n".join(",".join(str(value) for value in RECORD.values()) for _ in range(3))
+    response = client.post("/predict/batch", data={"file": (io.BytesIO(rows.encode()), "batch.csv")})
+    assert response.status_code == 413
+
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 100)
+    response = client.post("/predict/batch", json=[RECORD])
+    assert response.status_code == 413 and "bytes" in response.get_json()["error"]
@@ -0,0 +1,64 @@
+import os
+import json
+import asyncio
+import pytest
+
+from asgi_app import PredictionApp, AsyncServerConfig, BadRequest, parse_record, _predict_one
+
+RECORD = {"gender": "female", "race_ethnicity": "group B", "parental_level_of_education": "bachelor's degree",
+          "lunch": "standard", "test_preparation_course": "none", "reading_score": 72, "writing_score": 74}
+
+
+@pytest.fixture
+def process_app(trained_workdir, monkeypatch):
+    # the workers load the trained artifacts relative to the working directory
+    monkeypatch.chdir(trained_workdir)
+    app = PredictionApp(AsyncServerConfig(pool="process", max_workers=1, max_queue=4))
+    app.start()
+    yield app
+    app.stop()
+
+
+async def post(app, path, payload):
+    messages = [{"type": "http.request", "body": json.dumps(payload).encode(), "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app({"type": "http", "method": "POST", "path": path}, receive, send)
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+def test_process_pool_survives_a_failing_record(process_app):
+    async def scenario():
+        good = parse_record(RECORD)
+        # bypasses parse_record, so the worker itself raises
+        with pytest.raises(Exception, match="alien"):
+            await process_app.run_prediction(_predict_one, dict(good, gender="alien"))
+        return await process_app.run_prediction(_predict_one, good)
+
+    assert isinstance(asyncio.run(scenario()), int)
+
+
+def test_process_pool_is_replaced_after_a_worker_dies(process_app):
+    async def scenario():
+        with pytest.raises(BadRequest) as crashed:
+            await process_app.run_prediction(os._exit, 1)
+        status, body = await post(process_app, "/predict", RECORD)
+        return crashed.value.status, status, body
+
+    crashed_status, status, body = asyncio.run(scenario())
+    assert crashed_status == 503
+    assert status == 200 and isinstance(body["prediction"], int)
+
+
+def test_unknown_category_is_rejected_with_422(process_app):
+    status, body = asyncio.run(post(process_app, "/predict", dict(RECORD, gender="alien")))
+    assert status == 422
+    assert "gender" in body["error"]
+    status, _ = asyncio.run(post(process_app, "/predict", RECORD))
+    assert status == 200
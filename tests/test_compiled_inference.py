@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+from sklearn.ensemble import RandomForestRegressor, AdaBoostRegressor, GradientBoostingRegressor
+
+from conftest import SOURCE_DATA_PATH
+from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+from src.components.data_transformation import DataTransformation, features_and_label
+from src.pipeline.compiled_inference import compile_model, CompiledModel
+
+ESTIMATORS = {
+    "Linear Regression": LinearRegression(),
+    "Decision Tree": DecisionTreeRegressor(random_state=0),
+    "Random Forest": RandomForestRegressor(n_estimators=20, max_features="sqrt", random_state=0),
+    "Gradient Boosting": GradientBoostingRegressor(n_estimators=30, subsample=0.8, random_state=0),
+    "AdaBoost Regressor": AdaBoostRegressor(n_estimators=30, loss="square", random_state=0),
+}
+
+
+@pytest.fixture(scope="module")
+def transformed_data(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("compiled_inference")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(workdir)
+        train_path, test_path = DataIngestion(DataIngestionConfig(source_data_path=SOURCE_DATA_PATH)).initiate_ingestion()
+        train_data, test_data = DataTransformation().initiate_transformation(train_path, test_path)
+    return features_and_label(train_data), features_and_label(test_data)
+
+
+@pytest.mark.parametrize("name", list(ESTIMATORS))
+def test_compiled_model_matches_sklearn(transformed_data, name):
+    (Xtrain, ytrain), (Xtest, _) = transformed_data
+    model = ESTIMATORS[name].fit(Xtrain, ytrain)
+
+    compiled = CompiledModel(compile_model(model))
+
+    for X in (Xtrain, Xtest, Xtest[:1]):
+        np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from conftest import SOURCE_DATA_PATH
+from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+from src.components.data_transformation import DataTransformation, features_and_label
+from src.components.datastore import read_dataset
+from src.components.dataset_schema import read_dtypes, apply_schema
+
+
+def ingest(workdir, monkeypatch, split_mode):
+    monkeypatch.chdir(workdir)
+    config = DataIngestionConfig(source_data_path=SOURCE_DATA_PATH, split_mode=split_mode)
+    train_path, test_path = DataIngestion(config).initiate_ingestion()
+    frames = [apply_schema(read_dataset(path, dtype=read_dtypes())).reset_index(drop=True)
+              for path in (train_path, test_path)]
+    transformed = [features_and_label(data) for data in DataTransformation().initiate_transformation(train_path, test_path)]
+    return frames, transformed
+
+
+def test_split_modes_give_identical_train_and_test_data(workdir, monkeypatch):
+    (workdir / "indices").mkdir()
+    (workdir / "copies").mkdir()
+    index_frames, index_transformed = ingest(workdir / "indices", monkeypatch, "indices")
+    copy_frames, copy_transformed = ingest(workdir / "copies", monkeypatch, "copies")
+
+    for index_frame, copy_frame in zip(index_frames, copy_frames):
+        pd.testing.assert_frame_equal(index_frame, copy_frame)
+    for (index_X, index_y), (copy_X, copy_y) in zip(index_transformed, copy_transformed):
+        np.testing.assert_array_equal(index_X, copy_X)
+        np.testing.assert_array_equal(index_y, copy_y)
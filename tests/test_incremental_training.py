@@ -0,0 +1,34 @@
+import os
+import shutil
+import joblib
+import pytest
+
+from conftest import SOURCE_DATA_PATH
+from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+from src.components.incremental_training import IncrementalTraining
+from src.pipeline.compiled_inference import dump_joblib
+
+
+@pytest.fixture
+def incremental(trained_workdir, tmp_path, monkeypatch):
+    shutil.copytree(trained_workdir / "artifacts", tmp_path / "artifacts")
+    monkeypatch.chdir(tmp_path)
+    train_path, test_path = DataIngestion(DataIngestionConfig(source_data_path=SOURCE_DATA_PATH)).output_paths()
+    return IncrementalTraining(), (SOURCE_DATA_PATH, os.path.getsize(SOURCE_DATA_PATH), train_path, test_path)
+
+
+def test_unchanged_training_keeps_the_state_without_reading_data(incremental, monkeypatch):
+    training, args = incremental
+    state = training.initialize_state(*args)
+
+    def fail(source):
+        raise AssertionError("training data was read")
+    monkeypatch.setattr(training, "_iter_frames", fail)
+    assert training.initialize_state(*args)["model_fingerprint"] == state["model_fingerprint"]
+
+    # a different model invalidates the state
+    model = joblib.load(training.incremental_config.model_path)
+    model.intercept_ += 1.0
+    dump_joblib(model, training.incremental_config.model_path)
+    with pytest.raises(Exception, match="training data was read"):
+        training.initialize_state(*args)
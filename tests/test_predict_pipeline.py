@@ -0,0 +1,63 @@
+import os
+import copy
+import shutil
+import pytest
+
+from src.pipeline.predict_pipeline import PredictPipeline, ModelRegistry, PredictPipelineConfig
+from src.pipeline.prediction_cache import PredictionCache, PredictionCacheConfig
+from src.pipeline.compiled_inference import load_compiled, save_compiled, save_serving_manifest
+
+RECORD = {"gender": "female", "race_ethnicity": "group B", "parental_level_of_education": "bachelor's degree",
+          "lunch": "standard", "test_preparation_course": "none", "reading_score": 72, "writing_score": 74}
+
+
+def publish(config):
+    save_serving_manifest(config.manifest_path, preprocessor=config.preprocessor_path,
+                          compiled_preprocessor=config.compiled_preprocessor_path,
+                          model=config.model_path, compiled_model=config.compiled_model_path)
+
+
+@pytest.fixture
+def pipeline(trained_workdir, tmp_path, monkeypatch):
+    shutil.copytree(trained_workdir / "artifacts", tmp_path / "artifacts")
+    monkeypatch.chdir(tmp_path)
+    publish(PredictPipelineConfig())
+    return PredictPipeline(registry=ModelRegistry(reload_check_interval=0),
+                           cache=PredictionCache(PredictionCacheConfig(enabled=False)))
+
+
+def test_preprocessor_and_model_are_swapped_together(pipeline):
+    config = pipeline.predict_config
+    before = pipeline.predict_batch([RECORD])
+    version = pipeline.model_version()
+
+    # a retrain has replaced the preprocessor but not yet the model: keep serving the old pair
+    params = load_compiled(config.compiled_preprocessor_path)
+    shifted = copy.deepcopy(params)
+    for block in shifted["blocks"]:
+        if block["kind"] == "numeric":
+            block["mean"] = block["mean"] + 10
+    save_compiled(shifted, config.compiled_preprocessor_path)
+    assert pipeline.predict_batch([RECORD]) == before
+    assert pipeline.model_version() == version
+
+    # a fresh process refuses files that do not match the manifest
+    with pytest.raises(ValueError, match="manifest"):
+        PredictPipeline(registry=ModelRegistry()).artifacts()
+
+    # the retrain publishes the new pair
+    publish(config)
+    assert pipeline.model_version() != version
+    assert pipeline.predict_batch([RECORD]) != before
+
+
+def test_registry_counts_hits_under_concurrency(pipeline):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pipeline.artifacts()
+    registry = pipeline.registry
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: pipeline.artifacts(), range(2000)))
+    stats = registry.stats()[os.path.abspath(pipeline.predict_config.manifest_path)]
+    assert stats["loads"] == 1
+    assert stats["hits"] == 2000